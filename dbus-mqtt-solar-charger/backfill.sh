@@ -0,0 +1,31 @@
+#!/bin/bash
+SCRIPT_DIR=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
+SERVICE_NAME=$(basename $SCRIPT_DIR)
+
+if [ -z "$1" ]; then
+    echo "Usage: $0 <CSV or JSON lines file> [config section of the solar charger]"
+    exit 1
+fi
+
+echo
+echo "Backfilling the history of $SERVICE_NAME from \"$1\"..."
+
+# the running driver would overwrite the history file with its own history
+pid=$(pgrep -f "python $SCRIPT_DIR/$SERVICE_NAME.py")
+if [ -n "$pid" ]; then
+    svc -d /service/$SERVICE_NAME
+    pkill -f "python $SCRIPT_DIR/$SERVICE_NAME.py" > /dev/null 2>&1
+fi
+
+if [ -n "$2" ]; then
+    python $SCRIPT_DIR/$SERVICE_NAME.py --backfill "$1" --device "$2"
+else
+    python $SCRIPT_DIR/$SERVICE_NAME.py --backfill "$1"
+fi
+
+if [ -n "$pid" ]; then
+    svc -u /service/$SERVICE_NAME
+fi
+echo "done."
+
+echo
@@ -1,25 +1,75 @@
 #!/usr/bin/env python
 
+from time import localtime, mktime, monotonic, perf_counter, sleep, time
+
+# measure the startup time, before importing anything else
+startup_time = perf_counter()
+
 from gi.repository import GLib  # pyright: ignore[reportMissingImports]
 import platform
 import logging
 import sys
 import os
-from time import sleep, time
 import json
+import queue
+import csv
+import mmap
+import zlib
+import socket
+import struct
 import configparser  # for config/ini file
 import _thread
+import signal
+import subprocess
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime
 
 # import external packages
 sys.path.insert(1, os.path.join(os.path.dirname(__file__), "ext"))
 import paho.mqtt.client as mqtt
+from paho.mqtt import __version__ as paho_version
+from paho.mqtt.matcher import MQTTMatcher
 
 # import Victron Energy packages
 sys.path.insert(1, os.path.join(os.path.dirname(__file__), "ext", "velib_python"))
+import dbus  # noqa: E402 # pyright: ignore[reportMissingImports]
+import dbus.service  # noqa: E402 # pyright: ignore[reportMissingImports]
 from vedbus import VeDbusService  # noqa: E402
 from ve_utils import get_vrm_portal_id  # noqa: E402
 
 
+# startup report, enabled with the command line argument --startup-report
+startup_report = "--startup-report" in sys.argv
+startup_phases = []
+startup_last = startup_time
+
+
+def startup_phase(name):
+    global startup_last
+    now = perf_counter()
+    startup_phases.append((name, now - startup_last))
+    startup_last = now
+
+
+def print_startup_report():
+    print("Startup report:")
+    for name, duration in startup_phases:
+        print("  %-20s %8.1f ms" % (name, duration * 1000))
+    print("  %-20s %8.1f ms" % ("total", (startup_last - startup_time) * 1000))
+
+
+startup_phase("imports")
+
+# supervisor mode, this process is a worker and receives its messages from the supervisor on a socket
+worker_index = int(sys.argv[sys.argv.index("--worker") + 1]) if "--worker" in sys.argv else None
+worker_fd = int(sys.argv[sys.argv.index("--worker-fd") + 1]) if "--worker-fd" in sys.argv else None
+
+# backfill mode, aggregates a log file to the daily history of a solar charger and exits, see backfill.sh
+backfill_file = sys.argv[sys.argv.index("--backfill") + 1] if "--backfill" in sys.argv else None
+backfill_key = sys.argv[sys.argv.index("--device") + 1] if "--device" in sys.argv else None
+
 # get values from config.ini file
 try:
     config_file = (os.path.dirname(os.path.realpath(__file__))) + "/config.ini"
@@ -45,42 +95,288 @@ except Exception:
     sys.exit()
 
 
+# maximum number of trackers of a solar charger, limits the paths a faulty payload can register
+MAX_TRACKERS = 32
+
+
 # Get logging level from config.ini
 # ERROR = shows errors only
 # WARNING = shows ERROR and warnings
 # INFO = shows WARNING and running functions
 # DEBUG = shows INFO and data/values
-if "DEFAULT" in config and "logging" in config["DEFAULT"]:
-    if config["DEFAULT"]["logging"] == "DEBUG":
-        logging.basicConfig(level=logging.DEBUG)
-    elif config["DEFAULT"]["logging"] == "INFO":
-        logging.basicConfig(level=logging.INFO)
-    elif config["DEFAULT"]["logging"] == "ERROR":
-        logging.basicConfig(level=logging.ERROR)
-    else:
-        logging.basicConfig(level=logging.WARNING)
+def get_logging_level(config):
+    if "DEFAULT" in config and "logging" in config["DEFAULT"]:
+        if config["DEFAULT"]["logging"] == "DEBUG":
+            return logging.DEBUG
+        elif config["DEFAULT"]["logging"] == "INFO":
+            return logging.INFO
+        elif config["DEFAULT"]["logging"] == "ERROR":
+            return logging.ERROR
+    return logging.WARNING
+
+
+if worker_index is None:
+    logging.basicConfig(level=get_logging_level(config))
 else:
-    logging.basicConfig(level=logging.WARNING)
+    logging.basicConfig(level=get_logging_level(config), format="%(levelname)s:worker " + str(worker_index) + ":%(message)s")
 
 
 # get timeout
-if "DEFAULT" in config and "timeout" in config["DEFAULT"]:
-    timeout = int(config["DEFAULT"]["timeout"])
-else:
-    timeout = 60
+def get_timeout(section):
+    if "timeout" in section:
+        return int(section["timeout"])
+    return 60
 
 
 # get history days
-if "DEFAULT" in config and "history_days" in config["DEFAULT"]:
-    history_days = int(config["DEFAULT"]["history_days"])
-else:
-    history_days = 0
+def get_history_days(section):
+    if "history_days" in section:
+        return int(section["history_days"])
+    return 0
+
+
+# get path timeout
+def get_path_timeout(section):
+    if "path_timeout" in section:
+        return int(section["path_timeout"])
+    return 0
+
+
+# get number of trackers, which are registered from the start
+def get_trackers(section):
+    if "trackers" in section:
+        return min(int(section["trackers"]), MAX_TRACKERS)
+    return 4
+
+
+# get source timeout
+def get_source_timeout(section):
+    if "source_timeout" in section:
+        return int(section["source_timeout"])
+    return 60
+
+
+# get if the history of today is calculated from the live values
+def get_calculate_history(section):
+    if "calculate_history" in section:
+        return section["calculate_history"] == "1"
+    return False
+
+
+# get the paths, which are kept as time series of the recent samples
+def get_timeseries_paths(section):
+    if "timeseries_paths" in section:
+        return ["/" + path.strip().strip("/") for path in section["timeseries_paths"].split(",") if path.strip()]
+    return []
+
+
+# get number of worker processes
+def get_workers(config):
+    if "DEFAULT" in config and "workers" in config["DEFAULT"]:
+        return int(config["DEFAULT"]["workers"])
+    return 0
+
+
+def get_worker_index(key, workers):
+    """
+    Return the worker, which owns a solar charger. Depends only on the config section or topic,
+    so that adding or removing a solar charger does not move the others to another worker.
+    The single solar charger of a config without [DEVICE_*] sections belongs to the first worker.
+    """
+    if key == "DEFAULT":
+        return 0
+    return zlib.crc32(key.encode()) % workers
+
+
+# get snapshot interval
+def get_snapshot_interval(config):
+    if "DEFAULT" in config and "snapshot_interval" in config["DEFAULT"]:
+        return int(config["DEFAULT"]["snapshot_interval"])
+    return 300
+
+
+def get_input_socket(config):
+    if "DEFAULT" in config and "input_socket" in config["DEFAULT"]:
+        return config["DEFAULT"]["input_socket"]
+    return ""
+
+
+def get_http_port(config):
+    if "DEFAULT" in config and "http_port" in config["DEFAULT"]:
+        return int(config["DEFAULT"]["http_port"])
+    return 0
+
+
+def get_http_address(config):
+    if "DEFAULT" in config and "http_address" in config["DEFAULT"]:
+        return config["DEFAULT"]["http_address"]
+    return "127.0.0.1"
+
+
+def get_device_settings(config):
+    """
+    Return the settings of all devices. Each [DEVICE_*] section describes one solar charger and inherits
+    the values of the [DEFAULT] section. Without device sections, [DEFAULT] and the topic of [MQTT]
+    describe a single solar charger.
+    """
+    sections = [section for section in config.sections() if section.startswith("DEVICE")]
+
+    if len(sections) == 0:
+        # with auto-discovery the [MQTT] topic is optional
+        if "topic" not in config["MQTT"] and any(section.startswith("DISCOVERY") for section in config.sections()):
+            return {}
+        device_settings = {"DEFAULT": get_settings(config["DEFAULT"], config["MQTT"]["topic"])}
+
+    else:
+        device_settings = {}
+        for section in sections:
+            device_settings[section] = get_settings(config[section], config[section]["topic"])
+
+        device_instances = [settings["device_instance"] for settings in device_settings.values()]
+        if len(device_instances) != len(set(device_instances)):
+            raise ValueError("The device_instance of each [DEVICE_*] section has to be unique")
+
+        topics = [topic for settings in device_settings.values() for topic in settings["topics"]]
+        if len(topics) != len(set(topics)):
+            raise ValueError("The topic of each [DEVICE_*] section has to be unique")
+
+    # a worker owns only its part of the solar chargers
+    if worker_index is not None:
+        workers = get_workers(config)
+        device_settings = {key: settings for key, settings in device_settings.items() if get_worker_index(key, workers) == worker_index}
+
+    return device_settings
+
+
+def get_discovery_settings(config):
+    """
+    Return the settings of all [DISCOVERY_*] sections by topic pattern. A solar charger is created for each
+    topic, which matches the pattern. The sections inherit the values of the [DEFAULT] section.
+    With workers the device_instance_range is split, each worker discovers solar chargers in its own part.
+    """
+    workers = get_workers(config)
+    discovery_settings = {}
+    for section in config.sections():
+        if not section.startswith("DISCOVERY"):
+            continue
+
+        settings = get_settings(config[section], config[section]["topic"])
+        settings["section"] = section
+        settings["device_instance_range"] = int(config[section]["device_instance_range"]) if "device_instance_range" in config[section] else 100
+
+        if "+" not in settings["topic"] and "#" not in settings["topic"]:
+            raise ValueError("The topic of [%s] has to contain a + or # wildcard" % section)
+        if settings["topic"] in discovery_settings:
+            raise ValueError("The topic of each [DISCOVERY_*] section has to be unique")
+
+        if workers > 0:
+            instance_range = settings["device_instance_range"] // workers
+            if instance_range == 0:
+                raise ValueError("The device_instance_range of [%s] has to be at least the number of workers" % section)
+            if worker_index is not None:
+                settings["device_instance"] += worker_index * instance_range
+                settings["device_instance_range"] = instance_range
+
+        discovery_settings[settings["topic"]] = settings
+
+    return discovery_settings
+
+
+def get_settings(section, topic):
+    # multiple topics separated by comma are the sources of an aggregated solar charger
+    topics = [source.strip() for source in topic.split(",")]
+    if len(topics) > MAX_TRACKERS:
+        raise ValueError('The topic "%s" contains more than %i sources' % (topic, MAX_TRACKERS))
+
+    return {
+        "device_name": section["device_name"],
+        "device_instance": int(section["device_instance"]),
+        "topic": topic,
+        "topics": topics,
+        "timeout": get_timeout(section),
+        "history_days": get_history_days(section),
+        "path_timeout": get_path_timeout(section),
+        "source_timeout": get_source_timeout(section),
+        "trackers": get_trackers(section),
+        "calculate_history": get_calculate_history(section),
+        "timeseries_paths": get_timeseries_paths(section),
+    }
+
+
+try:
+    device_settings = get_device_settings(config)
+    discovery_settings = get_discovery_settings(config)
+except Exception as e:
+    print("ERROR:The device configuration in the config.ini is not valid: %s" % repr(e))
+    print("ERROR:The driver restarts in 60 seconds.")
+    sleep(60)
+    sys.exit()
+
+snapshot_interval = get_snapshot_interval(config)
+workers = get_workers(config)
+
+driver_path = os.path.dirname(os.path.realpath(__file__))
+
+startup_phase("config")
 
 
 # set variables
 connected = 0
-last_changed = 0
-last_updated = 0
+mqtt_client = None
+scheduler = None
+startup_reported = False
+
+# all solar chargers, by config section and by MQTT topic
+devices = {}
+devices_by_topic = {}
+
+# topic patterns of the auto-discovery, only looked up for topics without a solar charger
+discovery_matcher = MQTTMatcher()
+for pattern, settings in discovery_settings.items():
+    discovery_matcher[pattern] = settings
+
+# MQTT and the local inputs may discover the same solar charger at the same time
+discovery_lock = threading.Lock()
+
+# seconds to collect history changes, before they are published on D-Bus
+HISTORY_PUBLISH_DELAY = 5
+
+# longest interval in seconds between two messages, which is integrated to the yield, longer intervals are data gaps
+INTEGRATION_MAX_INTERVAL = 60
+
+# longest interval in seconds between two logged samples, which is integrated by the backfill, data loggers usually
+# write less often than the publisher sends its messages
+BACKFILL_MAX_INTERVAL = 900
+
+# samples, which are read and aggregated at once by the backfill, limits the memory used for large log files
+BACKFILL_CHUNK_SIZE = 65536
+
+# slots of the time series: the last value of each second of the last hour and the mean of each minute of 7 days
+TIMESERIES_SECONDS = 3600
+TIMESERIES_MINUTES = 7 * 24 * 60
+
+# MQTT brokers and the timer, which checks if the primary broker is reachable again
+brokers = None
+fallback_timer = None
+
+# serializes the threads, which replace the connection of the MQTT client: the fallback timer and the reload
+mqtt_client_lock = threading.Lock()
+
+# Unix socket and HTTP server for local publishers, see input_socket and http_port in the config.sample.ini
+local_input = None
+http_input = None
+
+# TLS context, which is kept across reconnects, the TLS sessions by broker and the handshake metrics
+tls_context = None
+tls_context_settings = None
+tls_sessions = {}
+tls_handshakes = {"full": [0, 0.0], "resumed": [0, 0.0]}
+
+# paho-mqtt versions, whose private Client._ssl_wrap_socket is replaced by TlsSessionClient
+TLS_SESSION_PAHO_VERSIONS = ("2.1.",)
+
+# settings of the [MQTT] section, which need a new MQTT connection, if changed
+MQTT_CONNECTION_KEYS = ("broker_address", "broker_port", "keepalive", "broker_fallback_interval", "tls_enabled", "tls_path_to_ca", "tls_insecure", "username", "password", "multiplexer_socket")
 
 
 # formatting
@@ -108,230 +404,1950 @@ def _kwh(p, v):
     return str("%i" % v) + "kWh"
 
 
-solar_charger_dict = {
-    # general data
-    "/NrOfTrackers": {"value": None, "textformat": _n},
-    "/Pv/V": {"value": None, "textformat": _v},
-    "/Pv/0/V": {"value": None, "textformat": _v},
-    "/Pv/1/V": {"value": None, "textformat": _v},
-    "/Pv/2/V": {"value": None, "textformat": _v},
-    "/Pv/3/V": {"value": None, "textformat": _v},
-    "/Pv/0/P": {"value": None, "textformat": _w},
-    "/Pv/1/P": {"value": None, "textformat": _w},
-    "/Pv/2/P": {"value": None, "textformat": _w},
-    "/Pv/3/P": {"value": None, "textformat": _w},
-    "/Yield/Power": {"value": None, "textformat": _w},
-    # external control
-    "/Link/NetworkMode": {"value": None, "textformat": _s},
-    "/Link/BatteryCurrent": {"value": None, "textformat": _a},
-    "/Link/ChargeCurrent": {"value": None, "textformat": _a},
-    "/Link/ChargeVoltage": {"value": None, "textformat": _v},
-    "/Link/NetworkStatus": {"value": None, "textformat": _s},
-    "/Link/TemperatureSense": {"value": None, "textformat": _n},
-    "/Link/TemperatureSenseActive": {"value": None, "textformat": _n},
-    "/Link/VoltageSense": {"value": None, "textformat": _n},
-    "/Link/VoltageSenseActive": {"value": None, "textformat": _n},
-    # settings
-    "/Settings/BmsPresent": {"value": None, "textformat": _n},
-    "/Settings/ChargeCurrentLimit": {"value": None, "textformat": _n},
-    # other paths
-    "/Dc/0/Voltage": {"value": None, "textformat": _v},
-    "/Dc/0/Current": {"value": None, "textformat": _a},
-    "/Yield/User": {"value": None, "textformat": _kwh},
-    "/Yield/System": {"value": None, "textformat": _kwh},
-    "/Load/State": {"value": None, "textformat": _n},
-    "/Load/I": {"value": None, "textformat": _a},
-    "/ErrorCode": {"value": 0, "textformat": _n},
-    "/State": {"value": 0, "textformat": _n},
-    "/Mode": {"value": None, "textformat": _n},
-    "/MppOperationMode": {"value": None, "textformat": _n},
-    "/DeviceOffReason": {"value": None, "textformat": _s},
-    "/Relay/0/State": {"value": None, "textformat": _n},
-    # alarms
-    "/Alarms/LowVoltage": {"value": None, "textformat": _n},
-    "/Alarms/HighVoltage": {"value": None, "textformat": _n},
-    # history
-    "/History/Overall/DaysAvailable": {"value": history_days, "textformat": _n},
-    "/History/Overall/MaxPvVoltage": {"value": None, "textformat": _n},
-    "/History/Overall/MaxBatteryVoltage": {"value": None, "textformat": _n},
-    "/History/Overall/MinBatteryVoltage": {"value": None, "textformat": _n},
-    "/History/Overall/LastError1": {"value": None, "textformat": _n},
-    "/History/Overall/LastError2": {"value": None, "textformat": _n},
-    "/History/Overall/LastError3": {"value": None, "textformat": _n},
-    "/History/Overall/LastError4": {"value": None, "textformat": _n},
+def _ms(p, v):
+    return str("%.1f" % v) + "ms"
+
+
+def get_paths(history_days, trackers):
+    """
+    Return the paths of a solar charger with their initial values. The daily history is not included, it is stored in
+    the HistoryStore.
+    """
+    paths = {
+        # general data
+        "/NrOfTrackers": {"value": None, "textformat": _n},
+        "/Pv/V": {"value": None, "textformat": _v},
+        "/Yield/Power": {"value": None, "textformat": _w},
+        # external control
+        "/Link/NetworkMode": {"value": None, "textformat": _s},
+        "/Link/BatteryCurrent": {"value": None, "textformat": _a},
+        "/Link/ChargeCurrent": {"value": None, "textformat": _a},
+        "/Link/ChargeVoltage": {"value": None, "textformat": _v},
+        "/Link/NetworkStatus": {"value": None, "textformat": _s},
+        "/Link/TemperatureSense": {"value": None, "textformat": _n},
+        "/Link/TemperatureSenseActive": {"value": None, "textformat": _n},
+        "/Link/VoltageSense": {"value": None, "textformat": _n},
+        "/Link/VoltageSenseActive": {"value": None, "textformat": _n},
+        # settings
+        "/Settings/BmsPresent": {"value": None, "textformat": _n},
+        "/Settings/ChargeCurrentLimit": {"value": None, "textformat": _n},
+        # other paths
+        "/Dc/0/Voltage": {"value": None, "textformat": _v},
+        "/Dc/0/Current": {"value": None, "textformat": _a},
+        "/Yield/User": {"value": None, "textformat": _kwh},
+        "/Yield/System": {"value": None, "textformat": _kwh},
+        "/Load/State": {"value": None, "textformat": _n},
+        "/Load/I": {"value": None, "textformat": _a},
+        "/ErrorCode": {"value": 0, "textformat": _n},
+        "/State": {"value": 0, "textformat": _n},
+        "/Mode": {"value": None, "textformat": _n},
+        "/MppOperationMode": {"value": None, "textformat": _n},
+        "/DeviceOffReason": {"value": None, "textformat": _s},
+        "/Relay/0/State": {"value": None, "textformat": _n},
+        # alarms
+        "/Alarms/LowVoltage": {"value": None, "textformat": _n},
+        "/Alarms/HighVoltage": {"value": None, "textformat": _n},
+        # history
+        "/History/Overall/DaysAvailable": {"value": history_days, "textformat": _n},
+        "/History/Overall/MaxPvVoltage": {"value": None, "textformat": _n},
+        "/History/Overall/MaxBatteryVoltage": {"value": None, "textformat": _n},
+        "/History/Overall/MinBatteryVoltage": {"value": None, "textformat": _n},
+        "/History/Overall/LastError1": {"value": None, "textformat": _n},
+        "/History/Overall/LastError2": {"value": None, "textformat": _n},
+        "/History/Overall/LastError3": {"value": None, "textformat": _n},
+        "/History/Overall/LastError4": {"value": None, "textformat": _n},
+    }
+
+    for tracker in range(trackers):
+        paths.update(get_tracker_paths(tracker))
+
+    return paths
+
+
+def get_tracker_paths(tracker):
+    """
+    Return the paths of a tracker, without its daily history.
+    """
+    return {
+        "/Pv/" + str(tracker) + "/V": {"value": None, "textformat": _v},
+        "/Pv/" + str(tracker) + "/P": {"value": None, "textformat": _w},
+    }
+
+
+# values of the daily history with their formatting, the path of a value is "/History/Daily/<day>/<name>"
+HISTORY_DAILY_PREFIX = "/History/Daily/"
+HISTORY_COLUMNS = {
+    "Yield": _w,
+    "Consumption": _kwh,
+    "MaxPower": _w,
+    "MaxPvVoltage": _v,
+    "MinBatteryVoltage": _v,
+    "MaxBatteryVoltage": _v,
+    "MaxBatteryCurrent": _a,
+    "TimeInBulk": _n,
+    "TimeInAbsorption": _n,
+    "TimeInFloat": _n,
+    "LastError1": _n,
+    "LastError2": _n,
+    "LastError3": _n,
+    "LastError4": _n,
 }
 
+# values of the daily history, which are published as integers
+INTEGER_HISTORY_COLUMNS = {"TimeInBulk", "TimeInAbsorption", "TimeInFloat", "LastError1", "LastError2", "LastError3", "LastError4"}
 
-# create history keys
-if history_days > 0:
-    for day in range(history_days):
-        solar_charger_dict.update(
-            {
-                # history daily
-                "/History/Daily/" + str(day) + "/Yield": {"value": None, "textformat": _w},
-                "/History/Daily/" + str(day) + "/Consumption": {"value": None, "textformat": _kwh},
-                "/History/Daily/" + str(day) + "/MaxPower": {"value": None, "textformat": _w},
-                "/History/Daily/" + str(day) + "/MaxPvVoltage": {"value": None, "textformat": _v},
-                "/History/Daily/" + str(day) + "/MinBatteryVoltage": {"value": None, "textformat": _v},
-                "/History/Daily/" + str(day) + "/MaxBatteryVoltage": {"value": None, "textformat": _v},
-                "/History/Daily/" + str(day) + "/MaxBatteryCurrent": {"value": None, "textformat": _a},
-                "/History/Daily/" + str(day) + "/TimeInBulk": {"value": None, "textformat": _n},
-                "/History/Daily/" + str(day) + "/TimeInAbsorption": {"value": None, "textformat": _n},
-                "/History/Daily/" + str(day) + "/TimeInFloat": {"value": None, "textformat": _n},
-                "/History/Daily/" + str(day) + "/LastError1": {"value": None, "textformat": _n},
-                "/History/Daily/" + str(day) + "/LastError2": {"value": None, "textformat": _n},
-                "/History/Daily/" + str(day) + "/LastError3": {"value": None, "textformat": _n},
-                "/History/Daily/" + str(day) + "/LastError4": {"value": None, "textformat": _n},
-                "/History/Daily/" + str(day) + "/Pv/0/Yield": {"value": None, "textformat": _kwh},
-                "/History/Daily/" + str(day) + "/Pv/0/MaxPower": {"value": None, "textformat": _w},
-                "/History/Daily/" + str(day) + "/Pv/0/MaxVoltage": {"value": None, "textformat": _v},
-                "/History/Daily/" + str(day) + "/Pv/1/Yield": {"value": None, "textformat": _kwh},
-                "/History/Daily/" + str(day) + "/Pv/1/MaxPower": {"value": None, "textformat": _w},
-                "/History/Daily/" + str(day) + "/Pv/1/MaxVoltage": {"value": None, "textformat": _v},
-                "/History/Daily/" + str(day) + "/Pv/2/Yield": {"value": None, "textformat": _kwh},
-                "/History/Daily/" + str(day) + "/Pv/2/MaxPower": {"value": None, "textformat": _w},
-                "/History/Daily/" + str(day) + "/Pv/2/MaxVoltage": {"value": None, "textformat": _v},
-                "/History/Daily/" + str(day) + "/Pv/3/Yield": {"value": None, "textformat": _kwh},
-                "/History/Daily/" + str(day) + "/Pv/3/MaxPower": {"value": None, "textformat": _w},
-                "/History/Daily/" + str(day) + "/Pv/3/MaxVoltage": {"value": None, "textformat": _v},
-            }
+
+def get_history_tracker_columns(tracker):
+    return {
+        "Pv/" + str(tracker) + "/Yield": _kwh,
+        "Pv/" + str(tracker) + "/MaxPower": _w,
+        "Pv/" + str(tracker) + "/MaxVoltage": _v,
+    }
+
+
+# daily history values with the time in a charger state, by /State value
+STATE_HISTORY_COLUMNS = {
+    3: "TimeInBulk",
+    4: "TimeInAbsorption",
+    5: "TimeInFloat",
+}
+STATE_COLUMNS = {name: state for state, name in STATE_HISTORY_COLUMNS.items()}
+
+# history paths of the overall extrema of the voltages, which can be reset on D-Bus
+OVERALL_VOLTAGE_PATHS = ("/History/Overall/MaxPvVoltage", "/History/Overall/MaxBatteryVoltage", "/History/Overall/MinBatteryVoltage")
+
+# history paths of the last errors, the most recent first
+OVERALL_ERROR_PATHS = tuple("/History/Overall/LastError" + str(index) for index in range(1, 5))
+DAILY_ERROR_PATHS = tuple("/History/Daily/0/LastError" + str(index) for index in range(1, 5))
+
+# paths of a tracker and the names of its daily history values, used by the history calculation for each message
+HISTORY_TRACKER_PATHS = [
+    (
+        "/Pv/" + str(tracker) + "/P",
+        "/Pv/" + str(tracker) + "/V",
+        "Pv/" + str(tracker) + "/Yield",
+        "Pv/" + str(tracker) + "/MaxPower",
+        "Pv/" + str(tracker) + "/MaxVoltage",
+    )
+    for tracker in range(MAX_TRACKERS)
+]
+
+
+def is_history_path(path):
+    return path.startswith("/History/")
+
+
+def is_snapshot_path(path):
+    return (path.startswith("/History/") and path != "/History/Overall/DaysAvailable") or path == "/Yield/User" or path == "/Yield/System"
+
+
+def get_number(value):
+    return value if type(value) is int or type(value) is float else None
+
+
+def get_day(timestamp):
+    """
+    Return the local day of the timestamp as day number, so that the difference of two days is the number of days.
+    """
+    return date.fromtimestamp(timestamp).toordinal()
+
+
+def get_next_midnight(timestamp):
+    day = localtime(timestamp)
+    return mktime((day.tm_year, day.tm_mon, day.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+
+class EnergyIntegrator:
+    """
+    Integrates a power in W over the monotonic message timestamps to an energy in kWh with the trapezoidal rule.
+    Intervals longer than INTEGRATION_MAX_INTERVAL are data gaps and are not integrated. Negative power is counted
+    as 0.
+    """
+
+    __slots__ = ("last_time", "last_power")
+
+    def __init__(self):
+        self.last_time = 0
+        self.last_power = None
+
+    def add(self, timestamp, power):
+        """
+        Add a sample and return the energy in kWh since the last sample.
+        """
+        if power is not None and power < 0:
+            power = 0
+
+        # a sample older than the last one, e.g. of a late batch of the HTTP input, is not integrated again
+        if timestamp < self.last_time:
+            return 0
+
+        energy = 0
+        interval = timestamp - self.last_time
+        if power is not None and self.last_power is not None and 0 < interval <= INTEGRATION_MAX_INTERVAL:
+            energy = (self.last_power + power) * interval / 7200000
+
+        self.last_time = timestamp
+        self.last_power = power
+        return energy
+
+
+class HistoryStore:
+    """
+    Daily history as a ring of days with one typed array per value, e.g. "Yield" or "Pv/1/MaxPower", and one slot per
+    day. Day 0 is today at the head of the ring, so starting a new day only moves the head and clears the slots of the
+    new days, independent of history_days. Missing values are stored as NaN.
+    """
+
+    EMPTY = array("d", [float("nan")])
+
+    def __init__(self, days, trackers):
+        self.days = days
+        self.head = 0
+        self.columns = {}
+        self.textformats = {}
+        # names of the values of today by path, which are looked up most often
+        self.today = {}
+        self.add_columns(HISTORY_COLUMNS)
+        for tracker in range(trackers):
+            self.add_columns(get_history_tracker_columns(tracker))
+
+    def add_columns(self, columns):
+        """
+        Add the values, which are not stored yet, empty for all days. Returns the names of the added values.
+        """
+        added = []
+        for name, textformat in columns.items():
+            if name not in self.columns:
+                self.columns[name] = self.EMPTY * self.days
+                self.textformats[name] = textformat
+                self.today[HISTORY_DAILY_PREFIX + "0/" + name] = name
+                added.append(name)
+        return added
+
+    def get_slot(self, path):
+        """
+        Return the day and the name of the value of a daily history path or None, if the path is not stored.
+        """
+        name = self.today.get(path)
+        if name is not None:
+            return (0, name) if self.days != 0 else None
+
+        if path.startswith(HISTORY_DAILY_PREFIX):
+            day, _, name = path[len(HISTORY_DAILY_PREFIX) :].partition("/")
+            if day.isdigit() and int(day) < self.days and name in self.columns:
+                return int(day), name
+        return None
+
+    def get(self, day, name):
+        value = self.columns[name][(self.head + day) % self.days]
+        if value != value:
+            return None
+        if name in INTEGER_HISTORY_COLUMNS and value.is_integer():
+            return int(value)
+        return value
+
+    def set(self, day, name, value):
+        self.columns[name][(self.head + day) % self.days] = float("nan") if value is None else value
+
+    def rotate(self, days):
+        """
+        Start the number of new days by moving the head back. Only the slots of the new days are cleared.
+        """
+        if self.days == 0:
+            return
+
+        days = min(days, self.days)
+        self.head = (self.head - days) % self.days
+        for day in range(days):
+            slot = (self.head + day) % self.days
+            for column in self.columns.values():
+                column[slot] = float("nan")
+
+    def resize(self, days):
+        """
+        Change the number of days, the days which are still stored keep their values.
+        """
+        kept = min(days, self.days)
+        for name, column in self.columns.items():
+            resized = self.EMPTY * days
+            for day in range(kept):
+                resized[day] = column[(self.head + day) % self.days]
+            self.columns[name] = resized
+        self.head = 0
+        self.days = days
+
+    def get_paths(self, days, names=None):
+        """
+        Return the D-Bus paths of the days with their values and formatting, of all values or only of the names.
+        """
+        return {
+            HISTORY_DAILY_PREFIX + str(day) + "/" + name: {"value": self.get(day, name), "textformat": self.textformats[name]}
+            for day in days
+            for name in (self.columns if names is None else names)
+        }
+
+    def get_values(self):
+        """
+        Return the values of all days by path.
+        """
+        return {path: data["value"] for path, data in self.get_paths(range(self.days)).items()}
+
+    def get_rows(self):
+        """
+        Return a copy of the history as one row per slot of the ring, with the values in the order of the columns.
+        """
+        count = len(self.columns)
+        rows = self.EMPTY * (self.days * count)
+        for index, column in enumerate(self.columns.values()):
+            rows[index::count] = column
+        return rows
+
+    def load_rows(self, head, names, rows):
+        """
+        Replace the history with rows of another history ring, e.g. of the history file. Days, which do not fit, and
+        values, which are not stored, are skipped.
+        """
+        count = len(names)
+        kept = min(self.days, len(rows) // count) if count != 0 else 0
+        for name in self.columns:
+            self.columns[name] = self.EMPTY * self.days
+        for index, name in enumerate(names):
+            if name in self.columns and kept != 0:
+                column = rows[index::count]
+                self.columns[name][:kept] = (column[head:] + column[:head])[:kept]
+        self.head = 0
+
+
+class HistoryFile:
+    """
+    Daily history file with a fixed layout, which is memory-mapped and updated in place.
+    The file consists of two banks with the same size, which are written alternately, so that a power loss during a
+    write leaves the other bank intact. Each bank contains (little endian):
+    - header: magic, version, generation, timestamp, days, number of values, head of the ring, CRC32 of the data
+    - CRC32 of the header and the names
+    - names of the values, NAME_SIZE bytes each
+    - data: one row per slot of the history ring with one double per value, NaN for missing values
+    Only the rows, which changed since the bank was written last, are written. A changed layout, e.g. after adding a
+    tracker, writes a new file, which replaces the old one atomically.
+    """
+
+    MAGIC = b"MQSCHIST"
+    VERSION = 1
+    HEADER = struct.Struct("<8sIIqIIII")
+    HEADER_CRC = struct.Struct("<I")
+    NAME_SIZE = 32
+
+    def __init__(self, path):
+        self.path = path
+        self.mmap = None
+        # days and names of the mapped file, the bank written last and its generation
+        self.layout = None
+        self.bank = 0
+        self.generation = 0
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+            self.layout = None
+
+    def _map(self):
+        with open(self.path, "r+b") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0)
+
+    def _read_bank(self, bank):
+        """
+        Return the header values, the names and the offset of the data of a bank, or None, if the bank is not valid.
+        """
+        size = len(self.mmap) // 2
+        offset = bank * size
+        if size < self.HEADER.size + self.HEADER_CRC.size:
+            return None
+
+        magic, version, generation, timestamp, days, count, head, data_crc = self.HEADER.unpack_from(self.mmap, offset)
+        if magic != self.MAGIC or version != self.VERSION:
+            return None
+
+        names_offset = offset + self.HEADER.size + self.HEADER_CRC.size
+        data_offset = names_offset + self.NAME_SIZE * count
+        data_end = data_offset + 8 * days * count
+        if data_end > offset + size or (days != 0 and head >= days):
+            return None
+
+        (header_crc,) = self.HEADER_CRC.unpack_from(self.mmap, offset + self.HEADER.size)
+        if zlib.crc32(self.mmap[names_offset:data_offset], zlib.crc32(self.mmap[offset : offset + self.HEADER.size])) != header_crc:
+            return None
+        if zlib.crc32(self.mmap[data_offset:data_end]) != data_crc:
+            return None
+
+        names = [self.mmap[index : index + self.NAME_SIZE].rstrip(b"\0").decode() for index in range(names_offset, data_offset, self.NAME_SIZE)]
+        return generation, timestamp, days, head, names, data_offset
+
+    def load(self):
+        """
+        Map the file and return the timestamp, the head, the names and the rows of the newest valid bank.
+        Returns None, if the file does not exist. Raises ValueError, if no bank is valid.
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        self.close()
+        if os.path.getsize(self.path) == 0:
+            raise ValueError("empty file")
+        self._map()
+
+        banks = [(bank, self._read_bank(bank)) for bank in (0, 1)]
+        banks = [(header[0], bank, header) for bank, header in banks if header is not None]
+        if not banks:
+            raise ValueError("no valid bank, the file is damaged or of another version")
+
+        self.generation, self.bank, (_, timestamp, days, head, names, data_offset) = max(banks)
+        self.layout = (days, names)
+
+        rows = array("d")
+        rows.frombytes(self.mmap[data_offset : data_offset + 8 * days * len(names)])
+        return timestamp, head, names, rows
+
+    def _pack_bank(self, generation, timestamp, head, names, rows):
+        days = len(rows) // len(names)
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, generation, timestamp, days, len(names), head, zlib.crc32(rows))
+        names = b"".join(name.encode().ljust(self.NAME_SIZE, b"\0")[: self.NAME_SIZE] for name in names)
+        return header, self.HEADER_CRC.pack(zlib.crc32(names, zlib.crc32(header))), names
+
+    def write(self, timestamp, head, names, rows):
+        """
+        Write the history to the bank, which was not written last, and flush it. Returns the number of written rows.
+        """
+        days = len(rows) // len(names)
+        self.generation += 1
+
+        # a new layout needs a new file with both banks
+        if self.mmap is None or self.layout != (days, names):
+            bank = b"".join(self._pack_bank(self.generation, timestamp, head, names, rows)) + rows.tobytes()
+            self.close()
+            with open(self.path + ".tmp", "wb") as f:
+                f.write(bank + bank)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.path + ".tmp", self.path)
+            self._map()
+            self.layout = (days, names)
+            self.bank = 0
+            return days
+
+        bank = 1 - self.bank
+        offset = bank * (len(self.mmap) // 2)
+        header, header_crc, _ = self._pack_bank(self.generation, timestamp, head, names, rows)
+        data_offset = offset + len(header) + len(header_crc) + self.NAME_SIZE * len(names)
+
+        # the data is written first, if the header is written without it, the CRC of the data does not match
+        data = memoryview(rows).cast("B")
+        row_size = 8 * len(names)
+        written = 0
+        for start in range(0, len(data), row_size):
+            end = start + row_size
+            if self.mmap[data_offset + start : data_offset + end] != data[start:end]:
+                self.mmap[data_offset + start : data_offset + end] = data[start:end]
+                written += 1
+        self.mmap[offset : offset + len(header) + len(header_crc)] = header + header_crc
+        self.mmap.flush()
+
+        self.bank = bank
+        return written
+
+
+def get_backfill_columns(trackers):
+    """
+    Return the daily history values, which the backfill aggregates, with the logged path they are aggregated from and
+    the aggregation: "energy" integrates a power to kWh, "max" and "min" keep the extrema and "time" sums up the
+    seconds in a charger state. A value, which is aggregated from multiple paths, is listed once for each path.
+    """
+    columns = [
+        ("Yield", "Yield/Power", "energy"),
+        ("MaxPower", "Yield/Power", "max"),
+        ("MaxPvVoltage", "Pv/V", "max"),
+        ("MaxBatteryVoltage", "Dc/0/Voltage", "max"),
+        ("MinBatteryVoltage", "Dc/0/Voltage", "min"),
+        ("MaxBatteryCurrent", "Dc/0/Current", "max"),
+    ]
+    columns.extend((name, "State", "time") for name in STATE_HISTORY_COLUMNS.values())
+    for tracker in range(trackers):
+        tracker = str(tracker)
+        columns.extend(
+            [
+                ("Pv/" + tracker + "/Yield", "Pv/" + tracker + "/P", "energy"),
+                ("Pv/" + tracker + "/MaxPower", "Pv/" + tracker + "/P", "max"),
+                ("Pv/" + tracker + "/MaxVoltage", "Pv/" + tracker + "/V", "max"),
+                ("MaxPvVoltage", "Pv/" + tracker + "/V", "max"),
+            ]
         )
+    return columns
 
 
-def elaborateData(items, key_root, level=0):
-    global solar_charger_dict
+def is_backfill_path(path):
+    """
+    Return True, if the backfill reads the logged path, e.g. "Dc/0/Voltage" or "Pv/1/P".
+    """
+    if path in ("Yield/Power", "Pv/V", "Dc/0/Voltage", "Dc/0/Current", "State"):
+        return True
+    parts = path.split("/")
+    return len(parts) == 3 and parts[0] == "Pv" and parts[1].isdigit() and int(parts[1]) < MAX_TRACKERS and parts[2] in ("P", "V")
 
-    for key_1, data_1 in items.items():
-        key = key_root + "/" + key_1
-        if type(data_1) is dict:
-            elaborateData(data_1, key, level=level + 1)
 
+def parse_backfill_timestamp(value):
+    """
+    Return the Unix timestamp of a logged timestamp, which is a number or an ISO 8601 date and time. Times without a
+    time zone are local times.
+    """
+    if type(value) is int or type(value) is float:
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00")).timestamp()
+
+
+def flatten_backfill_sample(items, key_root="", sample=None):
+    """
+    Return the logged values of a JSON sample by path, nested objects like in the MQTT payload are joined with "/".
+    """
+    if sample is None:
+        sample = {}
+    for key, value in items.items():
+        path = key_root + key
+        if type(value) is dict:
+            flatten_backfill_sample(value, path + "/", sample)
+        elif is_backfill_path(path):
+            sample[path] = get_number(value)
+    return sample
+
+
+def read_backfill_chunks(file):
+    """
+    Read the samples of a CSV or a JSON lines file and yield them in chunks of BACKFILL_CHUNK_SIZE samples, as the list
+    of the timestamps and the lists of the values by path. Missing values are NaN.
+    A CSV file has a header line with the column "timestamp" and the paths of the values, e.g. "Pv/0/P". Each line of
+    a JSON lines file is an object with the key "timestamp" and the values like in the MQTT payload.
+    """
+    nan = float("nan")
+
+    with open(file, "r", newline="") as f:
+        first = f.read(1)
+        f.seek(0)
+
+        if first == "{":
+            timestamps = []
+            columns = {}
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    sample = json.loads(line)
+                    timestamp = parse_backfill_timestamp(sample.pop("timestamp"))
+                    sample = flatten_backfill_sample(sample)
+                except Exception as e:
+                    raise ValueError("line %i: %s" % (number, repr(e)))
+
+                for path, values in columns.items():
+                    value = sample.pop(path, None)
+                    values.append(nan if value is None else value)
+                # paths, which are logged for the first time, are missing in the samples before
+                for path, value in sample.items():
+                    columns[path] = [nan] * len(timestamps) + [nan if value is None else value]
+                timestamps.append(timestamp)
+
+                if len(timestamps) == BACKFILL_CHUNK_SIZE:
+                    yield timestamps, columns
+                    timestamps = []
+                    columns = {path: [] for path in columns}
+
+            if timestamps:
+                yield timestamps, columns
+            return
+
+        reader = csv.reader(f)
+        header = [name.strip().strip("/") for name in next(reader, [])]
+        if "timestamp" not in header:
+            raise ValueError('line 1: the column "timestamp" is missing')
+        time_index = header.index("timestamp")
+        indexes = [(index, path) for index, path in enumerate(header) if is_backfill_path(path)]
+
+        timestamps = []
+        columns = {path: [] for _, path in indexes}
+        for number, row in enumerate(reader, 2):
+            if not row:
+                continue
+            try:
+                timestamps.append(parse_backfill_timestamp(row[time_index]))
+                for index, path in indexes:
+                    value = row[index].strip() if index < len(row) else ""
+                    columns[path].append(float(value) if value else nan)
+            except Exception as e:
+                raise ValueError("line %i: %s" % (number, repr(e)))
+
+            if len(timestamps) == BACKFILL_CHUNK_SIZE:
+                yield timestamps, columns
+                timestamps = []
+                columns = {path: [] for path in columns}
+
+        if timestamps:
+            yield timestamps, columns
+
+
+class DailyAggregator:
+    """
+    Aggregates logged samples to the daily history with the rules of the history calculation: powers are integrated
+    with the trapezoidal rule, an interval counts to the day of its end and to the charger state at its start, and
+    intervals longer than BACKFILL_MAX_INTERVAL are data gaps. Without Yield/Power the sum of the tracker powers is
+    used. The samples are added in chunks in chronological order, the last sample of a chunk is kept for the interval
+    to the next chunk, so the memory does not depend on the number of samples.
+    Each chunk is aggregated in one vectorized pass with NumPy, if it is installed, otherwise with plain Python.
+    """
+
+    def __init__(self):
+        # NumPy is only imported for the backfill, it is not installed on Venus OS by default
+        try:
+            import numpy
+
+            self.numpy = numpy
+        except ImportError:
+            self.numpy = None
+
+        # aggregated values by name by day number, the time and the values of the last sample
+        self.days = {}
+        self.last_time = None
+        self.last_values = {}
+        self.samples = 0
+        self.trackers = 0
+
+    def split_days(self, timestamps):
+        """
+        Return the index of the first sample and the day number of each day in the chronological timestamps.
+        """
+        starts = [0]
+        days = [get_day(timestamps[0])]
+        midnight = get_next_midnight(timestamps[0])
+        while midnight <= timestamps[-1]:
+            index = bisect_left(timestamps, midnight)
+            starts.append(index)
+            days.append(get_day(timestamps[index]))
+            midnight = get_next_midnight(timestamps[index])
+        return starts, days
+
+    def add(self, timestamps, columns):
+        """
+        Aggregate a chunk of samples, see read_backfill_chunks(). Raises ValueError, if the samples are not in
+        chronological order.
+        """
+        if not timestamps:
+            return
+
+        trackers = [int(path.split("/")[1]) + 1 for path in columns if path.startswith("Pv/") and path != "Pv/V"]
+        self.trackers = min(max(trackers + [self.trackers]), MAX_TRACKERS)
+
+        if self.numpy is not None:
+            self._add_numpy(timestamps, columns)
         else:
-            if key in solar_charger_dict and (type(data_1) is str or type(data_1) is int or type(data_1) is float):
-                solar_charger_dict[key]["value"] = data_1
+            self._add_python(timestamps, columns)
+        self.samples += len(timestamps)
+
+    def _merge(self, days, name, kind, results):
+        for day, result in zip(days, results):
+            if result != result:
+                continue
+            values = self.days.setdefault(day, {})
+            current = values.get(name)
+            if current is None:
+                values[name] = result
+            elif kind == "energy" or kind == "time":
+                values[name] = current + result
+            elif kind == "max":
+                values[name] = max(current, result)
+            else:
+                values[name] = min(current, result)
+
+    def _add_numpy(self, timestamps, columns):
+        numpy = self.numpy
+        nan = float("nan")
+
+        times = numpy.array(timestamps, dtype=float)
+        intervals = numpy.diff(times, prepend=nan if self.last_time is None else self.last_time)
+        if (intervals < 0).any():
+            raise ValueError("the samples are not in chronological order")
+        intervals[~(intervals <= BACKFILL_MAX_INTERVAL)] = 0
+
+        starts, days = self.split_days(timestamps)
+        arrays = {path: numpy.array(values, dtype=float) for path, values in columns.items()}
+
+        # the yield of the solar charger is the sum of the tracker powers, if it was not logged
+        tracker_powers = [values for path, values in arrays.items() if path.startswith("Pv/") and path.endswith("/P")]
+        if tracker_powers:
+            tracker_powers = numpy.vstack(tracker_powers)
+            total = numpy.where(numpy.isnan(tracker_powers).all(axis=0), nan, numpy.nansum(tracker_powers, axis=0))
+            power = arrays.get("Yield/Power")
+            arrays["Yield/Power"] = total if power is None else numpy.where(numpy.isnan(power), total, power)
+
+        for name, path, kind in get_backfill_columns(self.trackers):
+            values = arrays.get(path)
+            if values is None:
+                continue
+
+            if kind == "max":
+                results = numpy.fmax.reduceat(values, starts)
+            elif kind == "min":
+                results = numpy.fmin.reduceat(values, starts)
+            elif kind == "energy":
+                values = numpy.maximum(numpy.concatenate(([self.last_values.get(path, nan)], values)), 0)
+                energy = numpy.nan_to_num((values[:-1] + values[1:]) * intervals / 7200000)
+                results = numpy.add.reduceat(energy, starts)
+            else:
+                previous = numpy.concatenate(([self.last_values.get(path, nan)], values[:-1]))
+                results = numpy.add.reduceat(numpy.where(previous == STATE_COLUMNS[name], intervals, 0), starts)
+
+            self._merge(days, name, kind, results.tolist())
+
+        self.last_time = timestamps[-1]
+        self.last_values = {path: float(values[-1]) for path, values in arrays.items()}
+
+    def _add_python(self, timestamps, columns):
+        nan = float("nan")
+
+        previous = timestamps[0] - 1 if self.last_time is None else self.last_time
+        intervals = []
+        for timestamp in timestamps:
+            interval = timestamp - previous
+            if interval < 0:
+                raise ValueError("the samples are not in chronological order")
+            intervals.append(interval if interval <= BACKFILL_MAX_INTERVAL else 0)
+            previous = timestamp
+        if self.last_time is None:
+            intervals[0] = 0
+
+        starts, days = self.split_days(timestamps)
+        ends = starts[1:] + [len(timestamps)]
+
+        # the yield of the solar charger is the sum of the tracker powers, if it was not logged
+        columns = dict(columns)
+        tracker_powers = [values for path, values in columns.items() if path.startswith("Pv/") and path.endswith("/P")]
+        if tracker_powers:
+            total = [sum(value for value in powers if value == value) if any(value == value for value in powers) else nan for powers in zip(*tracker_powers)]
+            power = columns.get("Yield/Power")
+            columns["Yield/Power"] = total if power is None else [total[index] if value != value else value for index, value in enumerate(power)]
+
+        for name, path, kind in get_backfill_columns(self.trackers):
+            values = columns.get(path)
+            if values is None:
+                continue
+
+            if kind == "max":
+                results = [max((value for value in values[start:end] if value == value), default=nan) for start, end in zip(starts, ends)]
+            elif kind == "min":
+                results = [min((value for value in values[start:end] if value == value), default=nan) for start, end in zip(starts, ends)]
+            elif kind == "energy":
+                values = [0 if value < 0 else value for value in [self.last_values.get(path, nan)] + values]
+                energy = [(last + value) * interval / 7200000 for last, value, interval in zip(values, values[1:], intervals)]
+                results = [sum(value for value in energy[start:end] if value == value) for start, end in zip(starts, ends)]
             else:
-                logging.warning('Received key "' + str(key) + '" with value "' + str(data_1) + '" is not valid')
+                state = STATE_COLUMNS[name]
+                previous = [self.last_values.get(path, nan)] + values[:-1]
+                time_in_state = [interval if last == state else 0 for last, interval in zip(previous, intervals)]
+                results = [sum(time_in_state[start:end]) for start, end in zip(starts, ends)]
+
+            self._merge(days, name, kind, results)
+
+        self.last_time = timestamps[-1]
+        self.last_values = {path: values[-1] for path, values in columns.items()}
+
+
+class TimeSeries:
+    """
+    Recent samples of one value in two rings of typed arrays with a fixed size: the last value of each second of the
+    last hour and the mean of each minute of the last 7 days. A slot is addressed by its second or minute, so adding a
+    sample is O(1). Each slot has a stamp with its second or minute, so slots of an older round of the ring or without
+    sample are skipped. Needs 12 bytes per slot, about 160 KiB per value.
+    """
+
+    __slots__ = ("seconds", "second_stamps", "minutes", "minute_stamps", "minute", "minute_sum", "minute_count")
+
+    def __init__(self):
+        self.seconds = array("d", [0]) * TIMESERIES_SECONDS
+        self.second_stamps = array("I", [0]) * TIMESERIES_SECONDS
+        self.minutes = array("d", [0]) * TIMESERIES_MINUTES
+        self.minute_stamps = array("I", [0]) * TIMESERIES_MINUTES
+
+        # the minute, which is still collecting samples for its mean
+        self.minute = 0
+        self.minute_sum = 0.0
+        self.minute_count = 0
+
+    def add(self, timestamp, value):
+        second = int(timestamp)
+        slot = second % TIMESERIES_SECONDS
+        self.seconds[slot] = value
+        self.second_stamps[slot] = second
+
+        minute = second // 60
+        if minute != self.minute:
+            if self.minute_count != 0:
+                slot = self.minute % TIMESERIES_MINUTES
+                self.minutes[slot] = self.minute_sum / self.minute_count
+                self.minute_stamps[slot] = self.minute
+            self.minute = minute
+            self.minute_sum = 0.0
+            self.minute_count = 0
+        self.minute_sum += value
+        self.minute_count += 1
+
+    def get(self, now, seconds):
+        """
+        Return the samples of the last seconds before now as list of (timestamp, value). Up to an hour the last value
+        of each second is returned, otherwise the mean of each minute, up to 7 days.
+        """
+        now = int(now)
+        if seconds <= TIMESERIES_SECONDS:
+            stamps = self.second_stamps
+            return [(second, self.seconds[second % TIMESERIES_SECONDS]) for second in range(now - seconds + 1, now + 1) if stamps[second % TIMESERIES_SECONDS] == second]
+
+        last = now // 60
+        first = last - min(seconds, TIMESERIES_MINUTES * 60) // 60 + 1
+        stamps = self.minute_stamps
+        samples = [(minute * 60, self.minutes[minute % TIMESERIES_MINUTES]) for minute in range(first, last + 1) if stamps[minute % TIMESERIES_MINUTES] == minute]
+        if first <= self.minute <= last and self.minute_count != 0:
+            samples.append((self.minute * 60, self.minute_sum / self.minute_count))
+        return samples
+
+
+class TimeSeriesExport(dbus.service.Object):
+    """
+    D-Bus object /TimeSeries of a solar charger, which returns the recent samples of its time series, e.g.
+    dbus -y com.victronenergy.solarcharger.mqtt_solarcharger_100 /TimeSeries GetSamples /Yield/Power 600
+    """
+
+    def __init__(self, bus, device):
+        dbus.service.Object.__init__(self, bus, "/TimeSeries")
+        self._device = device
+
+    @dbus.service.method("com.victronenergy.TimeSeries", out_signature="as")
+    def GetPaths(self):
+        return self._device.get_timeseries_paths()
+
+    @dbus.service.method("com.victronenergy.TimeSeries", in_signature="si", out_signature="a(dd)")
+    def GetSamples(self, path, seconds):
+        samples = self._device.get_timeseries(str(path), int(seconds))
+        if samples is None:
+            raise ValueError('"%s" is not in timeseries_paths' % path)
+        return samples
+
+
+def get_dbus_connection():
+    """
+    Each D-Bus service exports its own object paths, so multiple services in one process need private connections.
+    VeDbusService exports the root object "/" on its connection, which cannot be shared by two services. The connection
+    is closed, when the service is unregistered.
+    """
+    return dbus.SessionBus(private=True) if "DBUS_SESSION_BUS_ADDRESS" in os.environ else dbus.SystemBus(private=True)
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel with a resolution of 1 second, driven by a single GLib timer.
+    Scheduling, rescheduling and cancelling a timer is O(1), finding the next expiry and
+    advancing the wheel do not depend on the number of timers.
+    4 levels with 64 slots each cover about 194 days, later timers expire at the end of the span.
+    """
+
+    SLOT_BITS = 6
+    SLOTS = 1 << SLOT_BITS
+    LEVELS = 4
+
+    def __init__(self, now):
+        self._tick = int(now)
+        self._wheels = [[{} for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+        # key: (expires, level, slot)
+        self._timers = {}
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def schedule(self, key, expires, callback):
+        """Schedule the callback for the timestamp expires. An existing timer with the same key is replaced."""
+        self.cancel(key)
+        self._insert(key, max(int(expires), self._tick + 1), callback)
+
+    def cancel(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            self._wheels[timer[1]][timer[2]].pop(key, None)
+
+    def _insert(self, key, expires, callback):
+        delta = expires - self._tick
+        for level in range(self.LEVELS):
+            if delta < 1 << (self.SLOT_BITS * (level + 1)):
+                break
+        else:
+            expires = self._tick + (1 << (self.SLOT_BITS * self.LEVELS)) - 1
+        slot = (expires >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)
+        self._wheels[level][slot][key] = callback
+        self._timers[key] = (expires, level, slot)
+
+    def next_expiry(self):
+        """Return the next tick where a timer expires or has to be moved to a lower level, None if empty."""
+        if not self._timers:
+            return None
+
+        next_tick = None
+        for level in range(self.LEVELS):
+            shift = self.SLOT_BITS * level
+            base = self._tick >> shift
+            for offset in range(1, self.SLOTS + 1):
+                if self._wheels[level][(base + offset) & (self.SLOTS - 1)]:
+                    tick = (base + offset) << shift
+                    if next_tick is None or tick < next_tick:
+                        next_tick = tick
+                    break
+        return next_tick
+
+    def advance(self, now):
+        """Fire all timers, which expired until now. Empty ticks are skipped."""
+        target = int(now)
+        while self._tick < target:
+            next_tick = self.next_expiry()
+            if next_tick is None or next_tick > target:
+                self._tick = target
+                break
+            self._tick = next_tick
+
+            # move timers from higher levels down, starting with the highest level
+            for level in range(self.LEVELS - 1, 0, -1):
+                shift = self.SLOT_BITS * level
+                if self._tick & ((1 << shift) - 1) == 0:
+                    slot = (self._tick >> shift) & (self.SLOTS - 1)
+                    timers = self._wheels[level][slot]
+                    self._wheels[level][slot] = {}
+                    for key, callback in timers.items():
+                        self._insert(key, self._timers.pop(key)[0], callback)
+
+            # the timers are taken one by one, a callback may cancel or reschedule the other timers of the slot
+            timers = self._wheels[0][self._tick & (self.SLOTS - 1)]
+            while timers:
+                key = next(iter(timers))
+                callback = timers.pop(key)
+                del self._timers[key]
+                callback(key)
+
+
+class Scheduler:
+    """
+    Runs the timer wheel on a single GLib timer, which is only armed for the next expiry.
+    """
+
+    def __init__(self):
+        self._wheel = TimerWheel(time())
+        self._timer_id = None
+        self._timer_tick = None
+        self._advancing = False
+        self._wakeups = 0
+        self._wakeups_since = time()
+
+    def __contains__(self, key):
+        return key in self._wheel
+
+    def schedule(self, key, expires, callback):
+        self._wheel.schedule(key, expires, callback)
+
+        # only an earlier expiry needs the GLib timer to be re-armed
+        tick = max(int(expires), int(time()) + 1)
+        if not self._advancing and (self._timer_id is None or tick < self._timer_tick):
+            self._arm_timer(tick)
+
+    def cancel(self, key):
+        # an armed GLib timer is kept, it re-arms itself for the next expiry when it fires
+        self._wheel.cancel(key)
+
+    def _arm_timer(self, tick):
+        if self._timer_id is not None:
+            GLib.source_remove(self._timer_id)
+            self._timer_id = None
+
+        if tick is not None:
+            self._timer_tick = tick
+            self._timer_id = GLib.timeout_add_seconds(max(1, tick - int(time())), self._on_timer)
+
+    def _on_timer(self):
+        self._timer_id = None
+        self.count_wakeup()
+
+        # timers scheduled by the callbacks are considered when arming the timer afterwards
+        self._advancing = True
+        try:
+            self._wheel.advance(time())
+        finally:
+            self._advancing = False
+
+        self._arm_timer(self._wheel.next_expiry())
+        return False
+
+    def count_wakeup(self):
+        self._wakeups += 1
+        now = time()
+        if now - self._wakeups_since >= 60:
+            logging.debug("Scheduler: %.1f wakeups per minute, %i timers" % (self._wakeups * 60 / (now - self._wakeups_since), len(self._wheel)))
+            self._wakeups = 0
+            self._wakeups_since = now
+
+
+class SolarCharger:
+    """
+    One emulated solar charger: the received values, its D-Bus service and its timers.
+    Values are written by the MQTT thread and published on D-Bus by the GLib main loop.
+    """
+
+    def __init__(self, key, settings):
+        self.key = key
+        self.settings = settings
+        self.service = None
+
+        # received values and the paths changed since the last D-Bus update, protected by lock
+        self.lock = threading.Lock()
+        self.trackers = settings["trackers"]
+        self.paths = get_paths(settings["history_days"], self.trackers)
+        self.history = HistoryStore(settings["history_days"], self.trackers)
+        self._history_shifted = False
+        self.timeseries = {path: TimeSeries() for path in settings["timeseries_paths"]}
+        self._new_paths = {}
+        self.pending_paths = set()
+        self.stale_paths = set()
+        # paths, which the driver calculates instead of receiving them. They are not invalidated by path_timeout,
+        # since they keep their value, e.g. the yield at night
+        self.calculated_paths = set()
+        self._pending_history = set()
+        self._update_requested = False
+        self._init_sources(settings["topics"])
+
+        # the timeout starts with the driver, so that a device without data is detected
+        self.last_changed = time()
+
+        self.snapshot_file = driver_path + ("/snapshot.json" if key == "DEFAULT" else "/snapshot_" + key + ".json")
+        self.history_file = HistoryFile(driver_path + ("/history.bin" if key == "DEFAULT" else "/history_" + key + ".bin"))
+        self.snapshot_dirty = False
+        self.last_snapshot = 0
+
+        # yield counters and history calculated from the live values
+        self.next_midnight = get_next_midnight(time())
+        self.yield_integrator = EnergyIntegrator()
+        self.tracker_integrators = [EnergyIntegrator() for _ in range(MAX_TRACKERS)]
+        self.consumption_integrator = EnergyIntegrator()
+        self._last_state = None
+        self._last_state_time = 0
+        self._state_time_fraction = 0
+        self._last_error = 0
+
+    @property
+    def name(self):
+        return self.settings["device_name"]
+
+    def add_trackers(self, trackers):
+        """
+        Add the paths of the trackers, which are not registered yet. They are added on D-Bus with the next update.
+        Has to be called with the lock held or before the solar charger is used.
+        """
+        if trackers <= self.trackers:
+            return
+
+        for tracker in range(self.trackers, trackers):
+            paths = get_tracker_paths(tracker)
+            self.paths.update(paths)
+            self._new_paths.update(paths)
+            names = self.history.add_columns(get_history_tracker_columns(tracker))
+            self._new_paths.update(self.history.get_paths(range(self.history.days), names))
+
+        logging.info("%s: Number of trackers increased from %i to %i" % (self.name, self.trackers, trackers))
+        self.trackers = trackers
+
+    def _init_sources(self, topics):
+        """
+        An aggregated solar charger maps each source topic to a tracker and sums up power and current of the
+        sources, which are not stale. Has to be called with the lock held or before the solar charger is used.
+        """
+        if len(topics) == 1:
+            self.sources = None
+            return
+
+        self.add_trackers(len(topics))
+        self.sources = [{"power": 0, "current": 0, "last": 0, "fresh": False} for _ in topics]
+        self.source_index = {topic: index for index, topic in enumerate(topics)}
+        self.sources_power = 0
+        self.sources_current = 0
+        self._updated_sources = set()
+
+    def load_history_file(self):
+        """
+        Restore the daily history from the history file. Returns True, if the history was restored.
+        """
+        try:
+            start = perf_counter()
+            history = self.history_file.load()
+            if history is None:
+                return False
+
+            timestamp, head, names, rows = history
+            with self.lock:
+                # trackers, which were added by the received data
+                trackers = [int(name.split("/")[1]) + 1 for name in names if name.startswith("Pv/")]
+                if trackers:
+                    self.add_trackers(min(max(trackers), MAX_TRACKERS))
+
+                self.history.load_rows(head, names, rows)
+
+                # the history file may be from a previous day
+                if self.settings["calculate_history"]:
+                    days = get_day(time()) - get_day(timestamp)
+                    if days > 0:
+                        self.shift_history(days)
+
+                # only the values of today can be refreshed by live data, the previous days are final
+                if self.history.days != 0:
+                    self.stale_paths.update(path for path, name in self.history.today.items() if self.history.get(0, name) is not None)
+
+            logging.info("%s: History: restored %i days in %.3f ms" % (self.name, len(rows) // len(names), (perf_counter() - start) * 1000))
+            return True
+
+        except Exception as e:
+            logging.warning('%s: History: could not load "%s", starting without it: %s' % (self.name, self.history_file.path, e))
+            return False
+
+    def load_snapshot(self):
+        """
+        Restore history and yield counters from the last snapshot and the history file.
+        Restored values are marked as stale until they are refreshed by live data, the number of stale values is
+        published on /Snapshot/StaleValues.
+        """
+        if snapshot_interval == 0:
+            return
+
+        history_restored = self.load_history_file()
+        if not os.path.exists(self.snapshot_file):
+            return
 
+        try:
+            with open(self.snapshot_file, "r") as f:
+                snapshot = json.load(f)
+
+            restored = 0
+            with self.lock:
+                # trackers, which were added by the received data
+                trackers = [int(path.split("/Pv/")[1].split("/")[0]) + 1 for path in snapshot["values"] if path not in self.paths and "/Pv/" in path]
+                if trackers:
+                    self.add_trackers(min(max(trackers), MAX_TRACKERS))
+
+                for path, value in snapshot["values"].items():
+                    if not is_snapshot_path(path):
+                        continue
+                    # snapshots of older versions also contain the daily history
+                    slot = self.history.get_slot(path)
+                    if slot is not None:
+                        if history_restored or get_number(value) is None:
+                            continue
+                        self.history.set(*slot, value)
+                        if slot[0] == 0:
+                            self.stale_paths.add(path)
+                    elif path in self.paths:
+                        self.paths[path]["value"] = value
+                        self.stale_paths.add(path)
+                    else:
+                        continue
+                    restored += 1
+
+                # the snapshot may be from a previous day
+                if self.settings["calculate_history"] and not history_restored:
+                    days = get_day(time()) - get_day(snapshot["timestamp"])
+                    if days > 0:
+                        self.shift_history(days)
+
+            self.last_snapshot = int(time())
+            logging.info("%s: Snapshot: restored %i values from %i seconds ago, marked as stale until refreshed" % (self.name, restored, self.last_snapshot - int(snapshot["timestamp"])))
+
+        except Exception as e:
+            logging.warning('%s: Snapshot: could not load "%s", starting without it: %s' % (self.name, self.snapshot_file, e))
+
+    def save_snapshot(self, force=False):
+        """
+        Write the snapshot and the history file, if values changed since the last write and the snapshot interval
+        elapsed. The snapshot is replaced atomically and the history file has two banks, so a power loss never leaves
+        a partial snapshot or history behind.
+        """
+        if snapshot_interval == 0 or not self.snapshot_dirty:
+            return
 
-# MQTT requests
-def on_disconnect(client, userdata, flags, reason_code, properties):
-    global connected
-    logging.warning("MQTT client: Got disconnected")
-    if reason_code != 0:
-        logging.warning("MQTT client: Unexpected MQTT disconnection. Will auto-reconnect")
-    else:
-        logging.warning("MQTT client: reason_code value:" + str(reason_code))
+        now = int(time())
+        if not force and (now - self.last_snapshot) < snapshot_interval:
+            return
 
-    while connected == 0:
-        try:
-            logging.warning(f"MQTT client: Trying to reconnect to broker {config['MQTT']['broker_address']} on port {config['MQTT']['broker_port']}")
-            client.connect(host=config["MQTT"]["broker_address"], port=int(config["MQTT"]["broker_port"]))
-            connected = 1
-        except Exception as err:
-            logging.error(f"MQTT client: Error in retrying to connect with broker ({config['MQTT']['broker_address']}:{config['MQTT']['broker_port']}): {err}")
-            logging.error("MQTT client: Retrying in 15 seconds")
-            connected = 0
-            sleep(15)
+        with self.lock:
+            snapshot = {
+                "timestamp": now,
+                "values": {path: data["value"] for path, data in self.paths.items() if data["value"] is not None and is_snapshot_path(path)},
+            }
+            history = (self.history.head, list(self.history.columns), self.history.get_rows()) if self.history.days != 0 else None
+            self.snapshot_dirty = False
 
+        if history is not None:
+            try:
+                written = self.history_file.write(now, *history)
+                logging.debug('%s: History: wrote %i changed days to "%s"' % (self.name, written, self.history_file.path))
 
-def on_connect(client, userdata, flags, reason_code, properties):
-    global connected
-    if reason_code == 0:
-        logging.info("MQTT client: Connected to MQTT broker!")
-        connected = 1
-        client.subscribe(config["MQTT"]["topic"])
-    else:
-        logging.error("MQTT client: Failed to connect, return code %d\n", reason_code)
+            except Exception as e:
+                self.snapshot_dirty = True
+                logging.error('%s: History: could not write "%s": %s' % (self.name, self.history_file.path, e))
 
+        try:
+            with open(self.snapshot_file + ".tmp", "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.snapshot_file + ".tmp", self.snapshot_file)
 
-def on_message(client, userdata, msg):
-    try:
-        global solar_charger_dict, last_changed
+            self.last_snapshot = now
+            logging.debug("%s: Snapshot: wrote %i values" % (self.name, len(snapshot["values"])))
 
-        # get JSON from topic
-        if msg.topic == config["MQTT"]["topic"]:
-            if msg.payload != "" and msg.payload != b"":
-                jsonpayload = json.loads(msg.payload)
-
-                last_changed = int(time())
-
-                if (
-                    ("Pv" in jsonpayload and "V" in jsonpayload["Pv"] and "Yield" in jsonpayload and "Power" in jsonpayload["Yield"])
-                    or (
-                        "Pv" in jsonpayload
-                        and "0" in jsonpayload["Pv"]
-                        and "V" in jsonpayload["Pv"]["0"]
-                        and "P" in jsonpayload["Pv"]["0"]
-                        and "1" in jsonpayload["Pv"]
-                        and "V" in jsonpayload["Pv"]["1"]
-                        and "P" in jsonpayload["Pv"]["1"]
-                    )
-                    and "Dc" in jsonpayload
-                    and "0" in jsonpayload["Dc"]
-                    and "Current" in jsonpayload["Dc"]["0"]
-                    and "Voltage" in jsonpayload["Dc"]["0"]
-                ):
-                    # save JSON data into solar_charger_dict
-                    elaborateData(jsonpayload, "")
-
-                    # ------ calculate possible values if missing -----
-                    nr_of_trackers = 0
-                    yield_power = 0
-                    if "Pv" in jsonpayload and "0" in jsonpayload["Pv"] and "P" in jsonpayload["Pv"]["0"]:
-                        nr_of_trackers += 1
-                        yield_power += jsonpayload["Pv"]["0"]["P"]
-                    if "Pv" in jsonpayload and "1" in jsonpayload["Pv"] and "P" in jsonpayload["Pv"]["1"]:
-                        nr_of_trackers += 1
-                        yield_power += jsonpayload["Pv"]["1"]["P"]
-                    if "Pv" in jsonpayload and "2" in jsonpayload["Pv"] and "P" in jsonpayload["Pv"]["2"]:
-                        nr_of_trackers += 1
-                        yield_power += jsonpayload["Pv"]["2"]["P"]
-                    if "Pv" in jsonpayload and "3" in jsonpayload["Pv"] and "P" in jsonpayload["Pv"]["3"]:
+        except Exception as e:
+            self.snapshot_dirty = True
+            logging.error('%s: Snapshot: could not write "%s": %s' % (self.name, self.snapshot_file, e))
+
+    def elaborate_data(self, items, key_root, level=0):
+        for key_1, data_1 in items.items():
+            key = key_root + "/" + key_1
+            if type(data_1) is dict:
+                self.elaborate_data(data_1, key, level=level + 1)
+
+            else:
+                if key in self.paths and (type(data_1) is str or type(data_1) is int or type(data_1) is float):
+                    if self.paths[key]["value"] != data_1 and is_snapshot_path(key):
+                        self.snapshot_dirty = True
+                    self.paths[key]["value"] = data_1
+                    self.stale_paths.discard(key)
+                    self.pending_paths.add(key)
+                # the daily history is stored in the history ring, which only holds numbers
+                elif (type(data_1) is int or type(data_1) is float) and self.history.get_slot(key) is not None:
+                    slot = self.history.get_slot(key)
+                    if self.history.get(*slot) != data_1:
+                        self.snapshot_dirty = True
+                    self.history.set(*slot, data_1)
+                    self.stale_paths.discard(key)
+                    self.pending_paths.add(key)
+                else:
+                    logging.warning('Received key "' + str(key) + '" with value "' + str(data_1) + '" is not valid')
+
+    def process_payload(self, payload, topic, timestamp=None):
+        """
+        Validate the JSON payload and save it into the paths. timestamp is the time the sample was measured, if it
+        was sent by the publisher, otherwise the time of reception is used. Has to be called with the lock held.
+        """
+        if self.sources is not None:
+            return self.process_source_payload(payload, self.source_index[topic], timestamp)
+
+        # the HTTP input passes already decoded samples
+        jsonpayload = json.loads(payload) if isinstance(payload, (bytes, str)) else payload
+
+        self.last_changed = time()
+        age = get_sample_age(self.last_changed, timestamp)
+
+        if (
+            ("Pv" in jsonpayload and "V" in jsonpayload["Pv"] and "Yield" in jsonpayload and "Power" in jsonpayload["Yield"])
+            or (
+                "Pv" in jsonpayload
+                and "0" in jsonpayload["Pv"]
+                and "V" in jsonpayload["Pv"]["0"]
+                and "P" in jsonpayload["Pv"]["0"]
+                and "1" in jsonpayload["Pv"]
+                and "V" in jsonpayload["Pv"]["1"]
+                and "P" in jsonpayload["Pv"]["1"]
+            )
+            and "Dc" in jsonpayload
+            and "0" in jsonpayload["Dc"]
+            and "Current" in jsonpayload["Dc"]["0"]
+            and "Voltage" in jsonpayload["Dc"]["0"]
+        ):
+            # ------ calculate possible values if missing -----
+            # one pass over the trackers, trackers which are not registered yet are added
+            nr_of_trackers = 0
+            last_tracker = -1
+            yield_power = 0
+            if "Pv" in jsonpayload and type(jsonpayload["Pv"]) is dict:
+                for tracker, data in jsonpayload["Pv"].items():
+                    if tracker.isdigit() and int(tracker) < MAX_TRACKERS and type(data) is dict and "P" in data:
                         nr_of_trackers += 1
-                        yield_power += jsonpayload["Pv"]["3"]["P"]
+                        last_tracker = max(last_tracker, int(tracker))
+                        yield_power += data["P"]
+            self.add_trackers(last_tracker + 1)
 
-                    # calculate number of mppt trackers, if not set
-                    if "NrOfTrackers" not in jsonpayload and nr_of_trackers > 0:
-                        solar_charger_dict["/NrOfTrackers"]["value"] = nr_of_trackers
-                    else:
-                        solar_charger_dict["/NrOfTrackers"]["value"] = 1
+            # save JSON data into the paths
+            self.elaborate_data(jsonpayload, "")
 
-                    # calculate total power, if multiple trackers set, but total yield power not
-                    if "Yield" not in jsonpayload or ("Yield" in jsonpayload and "Power" not in jsonpayload["Yield"]):
-                        solar_charger_dict["/Yield/Power"]["value"] = yield_power
+            # calculate number of mppt trackers, if not set
+            if "NrOfTrackers" not in jsonpayload:
+                self.paths["/NrOfTrackers"]["value"] = nr_of_trackers if nr_of_trackers > 0 else 1
 
-                    # set state, if not set
-                    if "State" not in jsonpayload:
-                        if solar_charger_dict["/Yield/Power"]["value"] > 0:
-                            solar_charger_dict["/State"]["value"] = 3
-                        else:
-                            solar_charger_dict["/State"]["value"] = 0
+            # calculate total power, if multiple trackers set, but total yield power not
+            if "Yield" not in jsonpayload or ("Yield" in jsonpayload and "Power" not in jsonpayload["Yield"]):
+                self.paths["/Yield/Power"]["value"] = yield_power
 
+            # set state, if not set
+            if "State" not in jsonpayload:
+                if self.paths["/Yield/Power"]["value"] > 0:
+                    self.paths["/State"]["value"] = 3
                 else:
-                    logging.warning("Received JSON doesn't contain minimum required values")
-                    logging.warning('Example: {"Pv": { "V": 0.0 }, "Yield": {"Power": 0.0 }, "Dc": { "0": { "Voltage": 0.0, "Current": 0.0 } } }')
-                    logging.warning("OR")
-                    logging.warning('Example: { "Pv": { "0": { "V": 0.0, "P": 0.0 }, "1": { "V": 0.0, "P": 0.0 } }, "Yield": { "Power": 142.4 }, "Dc": { "0": { "Voltage": 0.0, "Current": 0.0 } } }')
-                    logging.debug("MQTT payload: " + str(msg.payload)[1:])
+                    self.paths["/State"]["value"] = 0
 
-            else:
-                logging.warning("Received message was empty and therefore it was ignored")
-                logging.debug("MQTT payload: " + str(msg.payload)[1:])
+            self.pending_paths.update(("/NrOfTrackers", "/Yield/Power", "/State"))
 
-    except TypeError as e:
-        logging.error("Received message is not valid. Check the README and sample payload. %s" % e)
-        logging.debug("MQTT payload: " + str(msg.payload)[1:])
+            self.calculate_values(self.last_changed - age, jsonpayload["Yield"] if "Yield" in jsonpayload and type(jsonpayload["Yield"]) is dict else {}, age)
+            return True
 
-    except ValueError as e:
-        logging.error("Received message is not a valid JSON. Check the README and sample payload. %s" % e)
-        logging.debug("MQTT payload: " + str(msg.payload)[1:])
+        else:
+            logging.warning("Received JSON doesn't contain minimum required values")
+            logging.warning('Example: {"Pv": { "V": 0.0 }, "Yield": {"Power": 0.0 }, "Dc": { "0": { "Voltage": 0.0, "Current": 0.0 } } }')
+            logging.warning("OR")
+            logging.warning('Example: { "Pv": { "0": { "V": 0.0, "P": 0.0 }, "1": { "V": 0.0, "P": 0.0 } }, "Yield": { "Power": 142.4 }, "Dc": { "0": { "Voltage": 0.0, "Current": 0.0 } } }')
+            logging.debug("MQTT payload: " + str(payload)[1:])
+            return False
+
+    def process_source_payload(self, payload, index, timestamp=None):
+        """
+        Save the values of one source of an aggregated solar charger and update the sums.
+        Has to be called with the lock held.
+        """
+        jsonpayload = json.loads(payload) if isinstance(payload, (bytes, str)) else payload
+
+        if not ("Yield" in jsonpayload and "Power" in jsonpayload["Yield"] and "Dc" in jsonpayload and "0" in jsonpayload["Dc"] and "Current" in jsonpayload["Dc"]["0"] and "Voltage" in jsonpayload["Dc"]["0"]):
+            logging.warning('%s: Received JSON on topic "%s" doesn\'t contain minimum required values' % (self.name, self.settings["topics"][index]))
+            logging.warning('Example: {"Pv": { "V": 0.0 }, "Yield": {"Power": 0.0 }, "Dc": { "0": { "Voltage": 0.0, "Current": 0.0 } } }')
+            logging.debug("MQTT payload: " + str(payload)[1:])
+            return False
+
+        self.last_changed = time()
+
+        source = self.sources[index]
+        power = jsonpayload["Yield"]["Power"]
+        current = jsonpayload["Dc"]["0"]["Current"]
+
+        source.update({"power": power, "current": current, "last": self.last_changed, "fresh": True})
+        self._updated_sources.add(index)
+
+        tracker = "/Pv/" + str(index)
+        self.paths[tracker + "/V"]["value"] = jsonpayload["Pv"]["V"] if "Pv" in jsonpayload and "V" in jsonpayload["Pv"] else None
+        self.paths[tracker + "/P"]["value"] = power
+        self.paths["/Dc/0/Voltage"]["value"] = jsonpayload["Dc"]["0"]["Voltage"]
+        self.pending_paths.update((tracker + "/V", tracker + "/P", "/Dc/0/Voltage"))
+
+        self._set_source_sums()
+
+        # the yield counters of the sources are not summed up, they are calculated from the summed power
+        age = get_sample_age(self.last_changed, timestamp)
+        self.calculate_values(self.last_changed - age, {}, age)
+        return True
 
-    except Exception:
-        exception_type, exception_object, exception_traceback = sys.exc_info()
-        file = exception_traceback.tb_frame.f_code.co_filename
-        line = exception_traceback.tb_lineno
-        logging.error(f"Exception occurred: {repr(exception_object)} of type {exception_type} in {file} line #{line}")
-        logging.debug("MQTT payload: " + str(msg.payload)[1:])
+    def _set_source_sums(self):
+        # summed up again each time, adding and subtracting the changes would accumulate rounding errors,
+        # e.g. a power of 1e-13 W instead of 0 W, which is reported as bulk charging
+        fresh = [source for source in self.sources if source["fresh"]]
+        self.sources_power = sum(source["power"] for source in fresh)
+        self.sources_current = sum(source["current"] for source in fresh)
+
+        self.paths["/NrOfTrackers"]["value"] = len(self.sources)
+        self.paths["/Yield/Power"]["value"] = self.sources_power
+        self.paths["/Dc/0/Current"]["value"] = self.sources_current
+        self.paths["/State"]["value"] = 3 if self.sources_power > 0 else 0
+        self.pending_paths.update(("/NrOfTrackers", "/Yield/Power", "/Dc/0/Current", "/State"))
+
+    def _on_source_stale(self, key):
+        index = key[2]
+        with self.lock:
+            if self.sources is None or index >= len(self.sources) or not self.sources[index]["fresh"]:
+                return
+            if self.settings["source_timeout"] == 0 or time() - self.sources[index]["last"] < self.settings["source_timeout"]:
+                return
+
+            logging.warning('%s: No message on topic "%s" for %i seconds, removing it from the sum' % (self.name, self.settings["topics"][index], self.settings["source_timeout"]))
+
+            source = self.sources[index]
+            source["fresh"] = False
+
+            tracker = "/Pv/" + str(index)
+            self.paths[tracker + "/V"]["value"] = None
+            self.paths[tracker + "/P"]["value"] = None
+            self.pending_paths.update((tracker + "/V", tracker + "/P"))
+            self._set_source_sums()
+
+        self.request_update()
+
+    def calculate_values(self, now, received_yield, age=0):
+        """
+        Integrate the yield counters, which the publisher did not send in the Yield object of the payload, and
+        calculate the history of today, if enabled. now is the time of the sample, which was measured age seconds
+        ago. Has to be called with the lock held.
+        """
+        # intervals are measured on the monotonic clock, which is not changed by a time sync
+        timestamp = monotonic() - age
+
+        energy = self.yield_integrator.add(timestamp, get_number(self.paths["/Yield/Power"]["value"]))
+        if "User" not in received_yield:
+            self._add_calculated("/Yield/User", energy)
+        else:
+            self.calculated_paths.discard("/Yield/User")
+        if "System" not in received_yield:
+            self._add_calculated("/Yield/System", energy)
+        else:
+            self.calculated_paths.discard("/Yield/System")
+
+        if self.settings["calculate_history"]:
+            self.calculate_history(now, timestamp, energy)
+
+        # restored values, which the calculation continues, are refreshed with the first message
+        if self.stale_paths:
+            for path in list(self.stale_paths):
+                if (path == "/Yield/User" and "User" not in received_yield) or (path == "/Yield/System" and "System" not in received_yield):
+                    self.stale_paths.discard(path)
+                elif self.settings["calculate_history"] and is_history_path(path):
+                    self.stale_paths.discard(path)
+
+        for path, series in self.timeseries.items():
+            data = self.paths.get(path)
+            value = get_number(data["value"]) if data is not None else None
+            if value is not None:
+                series.add(now, value)
+
+    def get_timeseries_paths(self):
+        with self.lock:
+            return list(self.timeseries)
+
+    def get_timeseries(self, path, seconds):
+        """
+        Return the samples of the time series of the path of the last seconds or None, if the path has no time series.
+        Called from the GLib main loop.
+        """
+        with self.lock:
+            series = self.timeseries.get(path)
+            return series.get(time(), seconds) if series is not None else None
+
+    def calculate_history(self, now, timestamp, energy):
+        """
+        Update the overall history and the history of today from the live values, in one pass over the trackers.
+        now is the time of the message, timestamp its monotonic time and energy the yield since the last message.
+        Has to be called with the lock held.
+        """
+        paths = self.paths
+
+        # an error is recorded, when the error code changes to a value other than 0
+        error = paths["/ErrorCode"]["value"]
+        if error != self._last_error and type(error) is int and error != 0:
+            self._record_error(OVERALL_ERROR_PATHS, error)
+            if self.settings["history_days"] != 0:
+                self._record_error(DAILY_ERROR_PATHS, error)
+        self._last_error = error
+
+        # without daily history only the overall extrema are calculated
+        if self.settings["history_days"] == 0:
+            self._calculate_overall(self._get_max_pv_voltage(), get_number(paths["/Dc/0/Voltage"]["value"]))
+            return
+
+        if now >= self.next_midnight:
+            self.roll_over_history(now)
+
+        # the time since the last message counts to the state of the last message, in whole seconds
+        interval = timestamp - self._last_state_time
+        if self._last_state in STATE_HISTORY_COLUMNS and 0 < interval <= INTEGRATION_MAX_INTERVAL:
+            interval += self._state_time_fraction
+            seconds = int(interval)
+            self._state_time_fraction = interval - seconds
+            self._add_today(STATE_HISTORY_COLUMNS[self._last_state], seconds)
+        # like the EnergyIntegrator, an older sample does not count again
+        if interval >= 0:
+            self._last_state = paths["/State"]["value"]
+            self._last_state_time = timestamp
+
+        power = get_number(paths["/Yield/Power"]["value"])
+        if power is not None:
+            self._add_today("Yield", energy)
+            self._max_today("MaxPower", power)
+
+        max_pv_voltage = get_number(paths["/Pv/V"]["value"])
+
+        for tracker in range(self.trackers):
+            power_path, voltage_path, yield_name, max_power_name, max_voltage_name = HISTORY_TRACKER_PATHS[tracker]
+
+            power = get_number(paths[power_path]["value"])
+            tracker_energy = self.tracker_integrators[tracker].add(timestamp, power)
+            if power is not None:
+                self._add_today(yield_name, tracker_energy)
+                self._max_today(max_power_name, power)
+
+            voltage = get_number(paths[voltage_path]["value"])
+            if voltage is not None:
+                self._max_today(max_voltage_name, voltage)
+                if max_pv_voltage is None or voltage > max_pv_voltage:
+                    max_pv_voltage = voltage
+
+        self._max_today("MaxPvVoltage", max_pv_voltage)
+
+        battery_voltage = get_number(paths["/Dc/0/Voltage"]["value"])
+        self._max_today("MaxBatteryVoltage", battery_voltage)
+        self._min_today("MinBatteryVoltage", battery_voltage)
+        self._max_today("MaxBatteryCurrent", get_number(paths["/Dc/0/Current"]["value"]))
+
+        # the load output is supplied with the battery voltage
+        load_current = get_number(paths["/Load/I"]["value"])
+        load_power = load_current * battery_voltage if load_current is not None and battery_voltage is not None else None
+        consumption = self.consumption_integrator.add(timestamp, load_power)
+        if load_power is not None:
+            self._add_today("Consumption", consumption)
+
+        self._calculate_overall(max_pv_voltage, battery_voltage)
+
+    def _calculate_overall(self, max_pv_voltage, battery_voltage):
+        """
+        Update the overall extrema of the voltages. They are only marked as changed, if they moved.
+        Has to be called with the lock held.
+        """
+        self._max_calculated("/History/Overall/MaxPvVoltage", max_pv_voltage)
+        self._max_calculated("/History/Overall/MaxBatteryVoltage", battery_voltage)
+        self._min_calculated("/History/Overall/MinBatteryVoltage", battery_voltage)
+
+    def _get_max_pv_voltage(self):
+        max_pv_voltage = get_number(self.paths["/Pv/V"]["value"])
+        for tracker in range(self.trackers):
+            voltage = get_number(self.paths[HISTORY_TRACKER_PATHS[tracker][1]]["value"])
+            if voltage is not None and (max_pv_voltage is None or voltage > max_pv_voltage):
+                max_pv_voltage = voltage
+        return max_pv_voltage
+
+    def reset_overall_history(self):
+        """
+        Reset the overall extrema of the voltages, e.g. after the battery was replaced. Called from D-Bus.
+        """
+        with self.lock:
+            for path in OVERALL_VOLTAGE_PATHS:
+                if self.paths[path]["value"] is not None:
+                    self._set_calculated(path, None)
+
+        logging.info("%s: History: reset the overall extrema of the voltages" % self.name)
+        self.request_update()
+
+    def _record_error(self, error_paths, error):
+        """
+        Move the error to the front of the last distinct errors, shifting the others back in place.
+        A new error drops the oldest one. Has to be called with the lock held.
+        """
+        if self.get_value(error_paths[0]) == error:
+            return
+
+        # an error, which is already in the list, is only moved to the front
+        index = len(error_paths) - 1
+        for position, path in enumerate(error_paths):
+            if self.get_value(path) == error:
+                index = position
+                break
+
+        for position in range(index, 0, -1):
+            value = self.get_value(error_paths[position - 1])
+            if self.get_value(error_paths[position]) != value:
+                self._set_calculated(error_paths[position], value)
+        self._set_calculated(error_paths[0], error)
+
+    def has_path(self, path):
+        return path in self.paths or self.history.get_slot(path) is not None
+
+    def get_value(self, path):
+        """
+        Return the value of a path, the daily history is read from its slot in the history ring.
+        Has to be called with the lock held.
+        """
+        data = self.paths.get(path)
+        if data is not None:
+            return data["value"]
+        slot = self.history.get_slot(path)
+        if slot is None:
+            raise KeyError(path)
+        return self.history.get(*slot)
+
+    def set_value(self, path, value):
+        data = self.paths.get(path)
+        if data is not None:
+            data["value"] = value
+            return
+        slot = self.history.get_slot(path)
+        if slot is None:
+            raise KeyError(path)
+        self.history.set(*slot, value)
+
+    def _set_calculated(self, path, value):
+        self.set_value(path, value)
+        self.calculated_paths.add(path)
+        self.stale_paths.discard(path)
+        self.pending_paths.add(path)
+        self.snapshot_dirty = True
+
+    def _add_calculated(self, path, value):
+        current = self.get_value(path)
+        if current is None:
+            self._set_calculated(path, value)
+        elif value != 0:
+            self._set_calculated(path, current + value)
+
+    def _max_calculated(self, path, value):
+        if value is not None:
+            current = self.get_value(path)
+            if current is None or value > current:
+                self._set_calculated(path, value)
+
+    def _min_calculated(self, path, value):
+        if value is not None:
+            current = self.get_value(path)
+            if current is None or value < current:
+                self._set_calculated(path, value)
+
+    # the history of today is accessed directly in its slot of the history ring, missing values are NaN
+    def _set_today(self, name, value):
+        self.history.columns[name][self.history.head] = value
+        path = HISTORY_DAILY_PREFIX + "0/" + name
+        self.stale_paths.discard(path)
+        self.pending_paths.add(path)
+        self.snapshot_dirty = True
+
+    def _add_today(self, name, value):
+        current = self.history.columns[name][self.history.head]
+        if current != current:
+            self._set_today(name, value)
+        elif value != 0:
+            self._set_today(name, current + value)
+
+    def _max_today(self, name, value):
+        if value is not None:
+            current = self.history.columns[name][self.history.head]
+            if current != current or value > current:
+                self._set_today(name, value)
+
+    def _min_today(self, name, value):
+        if value is not None:
+            current = self.history.columns[name][self.history.head]
+            if current != current or value < current:
+                self._set_today(name, value)
+
+    def roll_over_history(self, now):
+        """
+        Start a new day of the history at local midnight. Has to be called with the lock held.
+        """
+        days = get_day(now) - get_day(self.next_midnight - 1)
+        self.next_midnight = get_next_midnight(now)
+        if days > 0:
+            self.shift_history(days)
+            logging.info("%s: History: started a new day" % self.name)
+
+    def shift_history(self, days):
+        """
+        Shift the daily history by the number of days, the days in front start empty. Only the head of the history
+        ring moves, all days are published with the next history update. Has to be called with the lock held.
+        """
+        self.history.rotate(days)
+        self._history_shifted = True
+        self.snapshot_dirty = True
+
+        # the restored values of today are now values of a previous day
+        if self.stale_paths:
+            self.stale_paths = {path for path in self.stale_paths if not path.startswith(HISTORY_DAILY_PREFIX)}
+
+    def _on_midnight(self, key):
+        with self.lock:
+            now = time()
+            if now >= self.next_midnight:
+                self.roll_over_history(now)
+
+        if self.service is not None:
+            self.request_update()
+        self.reschedule()
+
+    def request_update(self):
+        """
+        Called from the MQTT thread, when new data was received.
+        The D-Bus update itself runs in the GLib main loop.
+        """
+        if not self._update_requested:
+            self._update_requested = True
+            GLib.idle_add(self._update)
+
+    def register(self):
+        global startup_reported
+
+        if not startup_reported:
+            startup_phase("first data")
+
+        paths_dbus = {
+            "/UpdateIndex": {"value": 0, "textformat": _n},
+        }
+
+        # TLS handshakes of the MQTT connection, the same for all solar chargers of this process
+        if tls_context is not None:
+            for path, value in get_tls_handshake_values().items():
+                paths_dbus[path] = {"value": value, "textformat": _ms if path.endswith("Time") else _n}
+
+        with self.lock:
+            # number of values restored from the snapshot, which were not refreshed by live data yet
+            paths_dbus["/Snapshot/StaleValues"] = {"value": len(self.stale_paths), "textformat": _n}
+            paths_dbus.update(self.paths)
+            paths_dbus.update(self.history.get_paths(range(self.history.days)))
+            # the pending paths are kept, so that the update after the registration starts their stale deadlines
+            self._new_paths = {}
+            self._history_shifted = False
+
+            self.service = DbusMqttSolarChargerService(
+                servicename="com.victronenergy.solarcharger.mqtt_solarcharger_" + str(self.settings["device_instance"]),
+                deviceinstance=self.settings["device_instance"],
+                customname=self.settings["device_name"],
+                paths=paths_dbus,
+                onreset=self.reset_overall_history,
+                timeseries=self,
+                bus=get_dbus_connection() if len(devices) > 1 or discovery_settings else None,
+            )
+
+        logging.info('%s: Registered on D-Bus as "com.victronenergy.solarcharger.mqtt_solarcharger_%i"' % (self.name, self.settings["device_instance"]))
+
+        if not startup_reported:
+            startup_phase("D-Bus registration")
+            if startup_report:
+                print_startup_report()
+            startup_reported = True
+
+    def unregister(self):
+        if self.service is not None:
+            self.service.unregister()
+            self.service = None
+            logging.info("%s: Removed from D-Bus" % self.name)
+
+    def reschedule(self):
+        """
+        (Re)schedule the timeout and the snapshot write, e.g. after data arrived or the config changed.
+        """
+        if self.settings["timeout"] != 0:
+            scheduler.schedule((self.key, "timeout"), self.last_changed + self.settings["timeout"] + 1, self._on_timeout)
+        else:
+            scheduler.cancel((self.key, "timeout"))
+
+        if self.snapshot_dirty and snapshot_interval != 0:
+            if (self.key, "snapshot") not in scheduler:
+                scheduler.schedule((self.key, "snapshot"), self.last_snapshot + snapshot_interval, self._on_snapshot)
+        else:
+            scheduler.cancel((self.key, "snapshot"))
+
+        # the history starts a new day also without messages
+        if self.settings["calculate_history"] and self.settings["history_days"] != 0:
+            if (self.key, "midnight") not in scheduler:
+                scheduler.schedule((self.key, "midnight"), self.next_midnight, self._on_midnight)
+        else:
+            scheduler.cancel((self.key, "midnight"))
+
+    def cancel_timers(self):
+        for key in ("timeout", "snapshot", "history", "midnight"):
+            scheduler.cancel((self.key, key))
+        for index in range(len(self.settings["topics"])):
+            scheduler.cancel((self.key, "source", index))
+        for path in self.paths:
+            scheduler.cancel((self.key, "stale", path))
+
+    def _on_timeout(self, key):
+        if self.settings["timeout"] == 0 or (time() - self.last_changed) <= self.settings["timeout"]:
+            self.reschedule()
+            return
+
+        # a discovered solar charger is retired and created again, when its topic publishes again
+        if "discovery" in self.settings:
+            logging.warning("%s: No MQTT message received for %i seconds, retiring the discovered solar charger" % (self.name, self.settings["timeout"]))
+            remove_device(self.key)
+            return
+
+        # a single solar charger quits the driver, which is then restarted by the daemontools
+        if len(devices) == 1 and not discovery_settings:
+            logging.error("Driver stopped. Timeout of %i seconds exceeded, since no new MQTT message was received in this time." % self.settings["timeout"])
+            self.save_snapshot(force=True)
+            sys.exit()
+
+        # with multiple solar chargers only this one is removed until it receives data again
+        logging.error("%s: Timeout of %i seconds exceeded, since no new MQTT message was received in this time." % (self.name, self.settings["timeout"]))
+        self.save_snapshot(force=True)
+        self.unregister()
+
+    def _on_snapshot(self, key):
+        self.save_snapshot()
+        self.reschedule()
+
+    def _on_path_stale(self, key):
+        path = key[2]
+        if self.settings["path_timeout"] == 0 or self.service is None:
+            return
+
+        with self.lock:
+            # the deadline may be from before the driver calculated the value
+            if path in self.calculated_paths:
+                return
+            if path in self.paths:
+                self.paths[path]["value"] = None
+        logging.info('%s: Value of "%s" was not received for %i seconds, invalidating it' % (self.name, path, self.settings["path_timeout"]))
+        if self.service.publish(path, None):
+            self.service.increment_update_index()
+
+    def _publish_history(self, key):
+        if self.service is None:
+            return
+
+        paths = self._pending_history
+        self._pending_history = set()
+
+        changed = False
+        with self.lock:
+            # after a new day started, all days are published
+            values = self.history.get_values() if self._history_shifted else {}
+            self._history_shifted = False
+            values.update({path: self.get_value(path) for path in paths if self.has_path(path)})
+        for path, value in values.items():
+            changed |= self.service.publish(path, value)
+
+        if changed:
+            self.service.increment_update_index()
+
+    def _update(self):
+        self._update_requested = False
+        scheduler.count_wakeup()
+
+        # register on D-Bus with the first data
+        if self.service is None:
+            self.register()
+
+        with self.lock:
+            new_paths = self._new_paths
+            self._new_paths = {}
+            values = {path: self.get_value(path) for path in self.pending_paths if self.has_path(path)}
+            self.pending_paths.clear()
+            history_shifted = self._history_shifted
+            stale_values = len(self.stale_paths)
+            calculated_paths = set(self.calculated_paths)
+
+            if self.sources is not None:
+                updated_sources = {index: self.sources[index]["last"] for index in self._updated_sources}
+                self._updated_sources.clear()
+
+        # trackers added by the received data
+        if new_paths:
+            self.service.add_paths(new_paths)
+
+        now = time()
+
+        # a source, which stops publishing, is removed from the sums
+        if self.sources is not None and self.settings["source_timeout"] != 0:
+            for index, last in updated_sources.items():
+                scheduler.schedule((self.key, "source", index), last + self.settings["source_timeout"], self._on_source_stale)
+        changed = False
+        for path, value in values.items():
+            # history changes slowly and has many paths, publish it delayed in one go
+            if is_history_path(path):
+                self._pending_history.add(path)
+                continue
+
+            changed |= self.service.publish(path, value)
+
+            if self.settings["path_timeout"] != 0 and path not in calculated_paths:
+                scheduler.schedule((self.key, "stale", path), now + self.settings["path_timeout"], self._on_path_stale)
+
+        changed |= self.service.publish("/Snapshot/StaleValues", stale_values)
+
+        # a reconnect, which did a TLS handshake, is followed by new data
+        if tls_context is not None:
+            for path, value in get_tls_handshake_values().items():
+                changed |= self.service.publish(path, value)
+
+        if (self._pending_history or history_shifted) and (self.key, "history") not in scheduler:
+            scheduler.schedule((self.key, "history"), now + HISTORY_PUBLISH_DELAY, self._publish_history)
+
+        if changed:
+            self.service.increment_update_index()
+
+        if self.paths["/Yield/Power"]["value"] is not None:
+            logging.info(
+                "{}: {:.2f} W".format(
+                    self.name,
+                    self.paths["/Yield/Power"]["value"],
+                )
+            )
+
+        self.reschedule()
+        return False
+
+    def apply_settings(self, settings):
+        """
+        Apply changed settings without re-registering on D-Bus. Returns the list of changed settings.
+        """
+        changes = []
+
+        if settings["device_instance"] != self.settings["device_instance"]:
+            logging.warning("%s: Reload: changing device_instance requires a restart of the driver" % self.name)
+            settings["device_instance"] = self.settings["device_instance"]
+
+        if settings["device_name"] != self.settings["device_name"]:
+            if self.service is not None:
+                self.service.set_value("/CustomName", settings["device_name"])
+            changes.append("device_name")
+
+        # register or unregister only the history days that changed
+        old_history_days = self.settings["history_days"]
+        new_history_days = settings["history_days"]
+        if new_history_days != old_history_days:
+            with self.lock:
+                self.history.resize(new_history_days)
+                if new_history_days > old_history_days:
+                    if self.service is not None:
+                        self.service.add_paths(self.history.get_paths(range(old_history_days, new_history_days)))
+                else:
+                    paths = [HISTORY_DAILY_PREFIX + str(day) + "/" + name for day in range(new_history_days, old_history_days) for name in self.history.columns]
+                    if self.service is not None:
+                        self.service.remove_paths(paths)
+
+                self.paths["/History/Overall/DaysAvailable"]["value"] = new_history_days
+
+            if self.service is not None:
+                self.service.set_value("/History/Overall/DaysAvailable", new_history_days)
+            changes.append("history_days")
+
+        # time series of paths, which are kept, keep their samples
+        if settings["timeseries_paths"] != self.settings["timeseries_paths"]:
+            with self.lock:
+                self.timeseries = {path: self.timeseries.get(path) or TimeSeries() for path in settings["timeseries_paths"]}
+            changes.append("timeseries_paths")
+
+        for key in ("topic", "timeout", "path_timeout", "source_timeout", "trackers", "calculate_history"):
+            if settings[key] != self.settings[key]:
+                changes.append(key)
+
+        old_topics = self.settings["topics"]
+        self.settings = settings
+
+        # the sources of an aggregated solar charger start again
+        with self.lock:
+            if settings["topics"] != old_topics:
+                for index in range(len(old_topics)):
+                    scheduler.cancel((self.key, "source", index))
+                self._init_sources(settings["topics"])
+
+            # trackers are only added, removing them requires a restart of the driver
+            self.add_trackers(settings["trackers"])
+
+        if self._new_paths and self.service is not None:
+            self.request_update()
+
+        # a shorter timeout needs an earlier wakeup
+        self.reschedule()
+
+        return changes
 
 
 class DbusMqttSolarChargerService:
@@ -343,8 +2359,13 @@ class DbusMqttSolarChargerService:
         productname="MQTT Solar Charger",
         customname="MQTT Solar Charger",
         connection="MQTT Solar Charger service",
+        bus=None,
+        onreset=None,
+        timeseries=None,
     ):
-        self._dbusservice = VeDbusService(servicename, register=False)
+        self._dbusservice = VeDbusService(servicename, bus=bus, register=False)
+        self._bus = bus
+        self._registered = False
         self._paths = paths
 
         logging.debug("%s /DeviceInstance = %d" % (servicename, deviceinstance))
@@ -368,8 +2389,44 @@ class DbusMqttSolarChargerService:
 
         self._dbusservice.add_path("/Latency", None)
 
-        for path, settings in self._paths.items():
-            self._dbusservice.add_path(
+        # writing 1 resets the overall extrema of the voltages, which are calculated by the driver
+        self._onreset = onreset
+        self._dbusservice.add_path("/History/Overall/Reset", 0, writeable=True, onchangecallback=self._handlereset)
+
+        self.add_paths(self._paths)
+
+        # the recent samples of the time series are returned by a method of /TimeSeries
+        self._timeseries_export = TimeSeriesExport(self._dbusservice.dbusconn, timeseries) if timeseries is not None else None
+
+        # register VeDbusService after all paths where added
+        self._dbusservice.register()
+        self._registered = True
+
+    def unregister(self):
+        if self._timeseries_export is not None:
+            self._timeseries_export.remove_from_connection()
+            self._timeseries_export = None
+        # see VeDbusService, calling __del__ explicitly removes the service from D-Bus
+        self._dbusservice.__del__()
+
+        # a private connection is only used by this service
+        if self._bus is not None:
+            self._bus.close()
+            self._bus = None
+
+    def add_paths(self, paths):
+        if not self._registered:
+            self._add_paths(self._dbusservice, paths)
+            return
+
+        # clients like dbus-systemcalc only know the paths of the registration, the context of VeDbusService
+        # announces the added paths with ItemsChanged
+        with self._dbusservice as context:
+            self._add_paths(context, paths)
+
+    def _add_paths(self, service, paths):
+        for path, settings in paths.items():
+            service.add_path(
                 path,
                 settings["value"],
                 gettextcallback=settings["textformat"],
@@ -377,129 +2434,1331 @@ class DbusMqttSolarChargerService:
                 onchangecallback=self._handlechangedvalue,
             )
 
-        # register VeDbusService after all paths where added
-        self._dbusservice.register()
-
-        GLib.timeout_add(1000, self._update)  # pause 1000ms before the next request
-
-    def _update(self):
-        global solar_charger_dict, last_changed, last_updated
+    def remove_paths(self, paths):
+        for path in paths:
+            if path in self._dbusservice:
+                del self._dbusservice[path]
 
-        now = int(time())
+    def set_value(self, path, value):
+        self._dbusservice[path] = value
 
-        if last_changed != last_updated:
-            for setting, data in solar_charger_dict.items():
-                try:
-                    self._dbusservice[setting] = data["value"]
-
-                except TypeError as e:
-                    logging.error('Received key "' + setting + '" with value "' + str(data["value"]) + '" is not valid: ' + str(e))
-                    sys.exit()
-
-                except Exception:
-                    (
-                        exception_type,
-                        exception_object,
-                        exception_traceback,
-                    ) = sys.exc_info()
-                    file = exception_traceback.tb_frame.f_code.co_filename
-                    line = exception_traceback.tb_lineno
-                    logging.error(f"Exception occurred: {repr(exception_object)} of type {exception_type} in {file} line #{line}")
+    def publish(self, path, value):
+        """
+        Set the value on D-Bus. Returns True, if the value changed.
+        """
+        try:
+            if path in self._dbusservice and self._dbusservice[path] != value:
+                self._dbusservice[path] = value
+                return True
 
-            logging.info(
-                "Solar Charger: {:.2f} W".format(
-                    solar_charger_dict["/Yield/Power"]["value"],
-                )
-            )
+        except TypeError as e:
+            logging.error('Received key "' + path + '" with value "' + str(value) + '" is not valid: ' + str(e))
+            sys.exit()
 
-            last_updated = last_changed
+        except Exception:
+            (
+                exception_type,
+                exception_object,
+                exception_traceback,
+            ) = sys.exc_info()
+            file = exception_traceback.tb_frame.f_code.co_filename
+            line = exception_traceback.tb_lineno
+            logging.error(f"Exception occurred: {repr(exception_object)} of type {exception_type} in {file} line #{line}")
 
-        # quit driver if timeout is exceeded
-        if timeout != 0 and (now - last_changed) > timeout:
-            logging.error("Driver stopped. Timeout of %i seconds exceeded, since no new MQTT message was received in this time." % timeout)
-            sys.exit()
+        return False
 
+    def increment_update_index(self):
         # increment UpdateIndex - to show that new data is available
         index = self._dbusservice["/UpdateIndex"] + 1  # increment index
         if index > 255:  # maximum value of the index
             index = 0  # overflow from 255 to 0
         self._dbusservice["/UpdateIndex"] = index
-        return True
 
     def _handlechangedvalue(self, path, value):
         logging.debug("someone else updated %s to %s" % (path, value))
         return True  # accept the change
 
+    def _handlereset(self, path, value):
+        if value != 1:
+            return value == 0
 
-def main():
-    _thread.daemon = True  # allow the program to quit
+        if self._onreset is not None:
+            self._onreset()
 
-    from dbus.mainloop.glib import (
-        DBusGMainLoop,
-    )  # pyright: ignore[reportMissingImports]
+        # the reset is a command, the path returns to 0 afterwards
+        GLib.idle_add(self.set_value, path, 0)
+        return True
 
-    # Have a mainloop, so we can send/receive asynchronous calls to and from dbus
-    DBusGMainLoop(set_as_default=True)
 
-    # MQTT setup
-    client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id="MqttSolarCharger_" + get_vrm_portal_id() + "_" + str(config["DEFAULT"]["device_instance"]))
+# MQTT requests
+# MQTT brokers
+def get_brokers(config):
+    """
+    Return the ordered list of brokers as (host, port). The broker_address can contain multiple brokers separated
+    by comma, optionally with port, e.g. "192.168.1.10, 192.168.1.11:1884". The first broker is the primary.
+    """
+    brokers = []
+    for broker in config["MQTT"]["broker_address"].split(","):
+        broker = broker.strip()
+        if broker.count(":") == 1:
+            host, port = broker.split(":")
+            brokers.append((host, int(port)))
+        else:
+            brokers.append((broker, int(config["MQTT"]["broker_port"])))
+    return brokers
+
+
+# get keepalive, a broker is declared dead, if no answer to the keepalive ping is received
+def get_keepalive(config):
+    if "keepalive" in config["MQTT"]:
+        return int(config["MQTT"]["keepalive"])
+    return 60
+
+
+# get broker fallback interval
+def get_broker_fallback_interval(config):
+    if "broker_fallback_interval" in config["MQTT"]:
+        return int(config["MQTT"]["broker_fallback_interval"])
+    return 60
+
+
+class BrokerList:
+    """
+    Ordered list of MQTT brokers with health tracking. A dead broker is replaced by the broker, which failed
+    longest ago, preferring the order of the list. Brokers after the primary are only used while it is dead.
+    """
+
+    def __init__(self, brokers):
+        self.brokers = brokers
+        self.index = 0
+        # time of the last failure of each broker, 0 = healthy
+        self.failed = [0] * len(brokers)
+        # protects the index against the failover in the network thread of the MQTT client, which is skipped
+        # while switching is set
+        self.lock = threading.Lock()
+        self.switching = False
+
+    @property
+    def current(self):
+        return self.brokers[self.index]
+
+    def mark_failed(self):
+        """Mark the current broker as dead and return the next broker to connect to."""
+        self.failed[self.index] = time()
+        self.index = min(range(len(self.brokers)), key=lambda index: (self.failed[index], index))
+        return self.current
+
+    def mark_connected(self):
+        self.failed[self.index] = 0
+
+    def use_primary(self):
+        self.index = 0
+        return self.current
+
+
+def failover(client):
+    """
+    Switch to the next broker. Called in the network thread of the MQTT client, which then reconnects to it.
+    """
+    if len(brokers.brokers) == 1:
+        return
+
+    # the fall back to the primary broker stops the network thread and chooses the broker itself
+    with brokers.lock:
+        if brokers.switching:
+            return
+        host, port = brokers.mark_failed()
+        logging.warning("MQTT client: Failing over to broker %s on port %i" % (host, port))
+        client.connect_async(host=host, port=port, keepalive=get_keepalive(config))
+
+
+def schedule_fallback():
+    """
+    Check regularly if the primary broker is reachable again, while connected to another broker.
+    """
+    global fallback_timer
+
+    if fallback_timer is None and brokers.index != 0:
+        fallback_timer = threading.Timer(get_broker_fallback_interval(config), fall_back_to_primary)
+        fallback_timer.daemon = True
+        fallback_timer.start()
+
+
+def fall_back_to_primary():
+    """
+    Runs in the thread of the fallback timer. The network thread of the MQTT client is stopped, before the client
+    connects to the primary broker, so that both threads never change the connection at the same time.
+    """
+    global fallback_timer
+
+    fallback_timer = None
+    if brokers.index == 0 or mqtt_client is None:
+        return
+
+    host, port = brokers.brokers[0]
+    try:
+        socket.create_connection((host, port), timeout=5).close()
+    except OSError:
+        schedule_fallback()
+        return
+
+    with mqtt_client_lock:
+        # the client may have been replaced by a reload meanwhile
+        client = mqtt_client
+        if brokers.index == 0 or client is None:
+            return
+
+        logging.warning("MQTT client: Primary broker %s on port %i is reachable again, falling back to it" % (host, port))
+        with brokers.lock:
+            brokers.switching = True
+        client.disconnect()
+        client.loop_stop()
+
+        with brokers.lock:
+            brokers.switching = False
+            brokers.use_primary()
+        client.connect_async(host=host, port=port, keepalive=get_keepalive(config))
+        client.loop_start()
+
+
+# TLS
+def get_tls_context(config):
+    """
+    Return the SSL context for the TLS settings of the config. The context is created once and kept, as long as the
+    TLS settings do not change, so that the TLS sessions of the previous connections can be resumed.
+    """
+    global tls_context, tls_context_settings
+
+    settings = (config["MQTT"].get("tls_path_to_ca", ""), config["MQTT"].get("tls_insecure", ""))
+    if tls_context is not None and tls_context_settings == settings:
+        return tls_context
+
+    import ssl
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if settings[0] != "":
+        logging.info('MQTT client: TLS: custom ca "%s" used' % settings[0])
+        context.load_verify_locations(settings[0])
+    else:
+        context.load_default_certs()
+
+    if settings[1] != "":
+        logging.info("MQTT client: TLS certificate server hostname verification disabled")
+        context.check_hostname = False
+
+    tls_context = context
+    tls_context_settings = settings
+    tls_sessions.clear()
+    return context
+
+
+def get_tls_handshake_values():
+    """
+    Return the number and the average time in milliseconds of the full and the resumed TLS handshakes by D-Bus path.
+    """
+    values = {}
+    for kind, (count, total) in list(tls_handshakes.items()):
+        name = kind.capitalize()
+        values["/Mqtt/TlsHandshakes/" + name] = count
+        values["/Mqtt/TlsHandshakes/" + name + "Time"] = round(total / count * 1000, 1) if count > 0 else None
+    return values
+
+
+def record_tls_handshake(host, port, duration, resumed):
+    kind = "resumed" if resumed else "full"
+    tls_handshakes[kind][0] += 1
+    tls_handshakes[kind][1] += duration
+
+    averages = ", ".join("%s %.1f ms (%i)" % (name, total / count * 1000, count) for name, (count, total) in tls_handshakes.items() if count > 0)
+    logging.info("MQTT client: TLS handshake with %s:%i took %.1f ms, %s. Average: %s" % (host, port, duration * 1000, kind, averages))
+
+
+def save_tls_session(client):
+    """
+    Keep the TLS session of the connection. With TLS 1.3 the session ticket is sent after the handshake, therefore
+    this is called again, when the broker accepted the connection.
+    """
+    session = getattr(client.socket(), "session", None)
+    if session is not None:
+        tls_sessions[(client.host, client.port)] = session
+
+
+def get_mqtt_client_class():
+    """
+    Return TlsSessionClient, if it was written for the installed paho-mqtt, which may change its private methods in any
+    release. Otherwise the plain client is returned, which does a full TLS handshake on each connect.
+    """
+    if paho_version.startswith(TLS_SESSION_PAHO_VERSIONS) and callable(getattr(mqtt.Client, "_ssl_wrap_socket", None)):
+        return TlsSessionClient
+
+    logging.warning("MQTT client: Resuming TLS sessions is not supported with paho-mqtt %s, each reconnect does a full TLS handshake" % paho_version)
+    return mqtt.Client
+
+
+class TlsSessionClient(mqtt.Client):
+    """
+    MQTT client, which resumes the TLS session of the last connection to the same broker. A resumed handshake skips
+    the certificate exchange and verification, which shortens the data gap of a reconnect on the GX device.
+    Replaces a private method of paho-mqtt, use get_mqtt_client_class().
+    """
+
+    def _ssl_wrap_socket(self, tcp_sock):
+        session = tls_sessions.get((self._host, self._port))
+
+        # same as paho.mqtt.client.Client._ssl_wrap_socket, but with the session of the last connection
+        ssl_sock = self._ssl_context.wrap_socket(tcp_sock, server_hostname=self._host, do_handshake_on_connect=False, session=session)
+        ssl_sock.settimeout(self._keepalive)
+
+        start = perf_counter()
+        try:
+            ssl_sock.do_handshake()
+        except Exception:
+            # the broker may not accept the session anymore, e.g. after a restart
+            tls_sessions.pop((self._host, self._port), None)
+            raise
+        record_tls_handshake(self._host, self._port, perf_counter() - start, ssl_sock.session_reused)
+
+        if ssl_sock.session is not None:
+            tls_sessions[(self._host, self._port)] = ssl_sock.session
+
+        return ssl_sock
+
+
+def on_disconnect(client, userdata, flags, reason_code, properties):
+    global connected
+    connected = 0
+    logging.warning("MQTT client: Got disconnected")
+    if reason_code != 0:
+        logging.warning("MQTT client: Unexpected MQTT disconnection. Will auto-reconnect")
+        failover(client)
+    else:
+        logging.warning("MQTT client: reason_code value:" + str(reason_code))
+
+
+def on_connect_fail(client, userdata):
+    host, port = brokers.current
+    logging.error("MQTT client: Error in connecting with broker (%s:%i)" % (host, port))
+    failover(client)
+
+
+def on_connect(client, userdata, flags, reason_code, properties):
+    global connected
+    if reason_code == 0:
+        logging.info("MQTT client: Connected to MQTT broker!")
+        connected = 1
+        if not isinstance(client, MultiplexerClient):
+            brokers.mark_connected()
+            schedule_fallback()
+            save_tls_session(client)
+        client.subscribe([(topic, 0) for topic in get_subscriptions()])
+    else:
+        logging.error("MQTT client: Failed to connect, return code %d\n", reason_code)
+
+
+def on_message(client, userdata, msg):
+    process_message(msg.topic, msg.payload)
+
+
+def get_sample_age(now, timestamp):
+    """
+    Return the seconds since a sample with the timestamp was measured. Timestamps in the future count as now.
+    """
+    if timestamp is None:
+        return 0
+    return max(0, now - timestamp)
+
+
+def process_message(topic, payload, timestamp=None):
+    """
+    Process a payload of a topic, received over MQTT or one of the local inputs.
+    Returns None, if no solar charger belongs to the topic, otherwise if the payload was valid.
+    """
+    try:
+        # get the solar charger of the topic
+        device = devices_by_topic.get(topic)
+        if device is None:
+            with discovery_lock:
+                device = devices_by_topic.get(topic)
+                if device is None:
+                    return discover_device(topic, payload, timestamp)
+
+        # get JSON from topic
+        if payload != "" and payload != b"":
+            with device.lock:
+                valid = device.process_payload(payload, topic, timestamp)
+
+            # publish the new values on D-Bus
+            if valid:
+                device.request_update()
+            return valid
+        else:
+            logging.warning("Received message was empty and therefore it was ignored")
+            logging.debug("MQTT payload: " + str(payload)[1:])
+
+    except TypeError as e:
+        logging.error("Received message is not valid. Check the README and sample payload. %s" % e)
+        logging.debug("MQTT payload: " + str(payload)[1:])
+
+    except ValueError as e:
+        logging.error("Received message is not a valid JSON. Check the README and sample payload. %s" % e)
+        logging.debug("MQTT payload: " + str(payload)[1:])
+
+    except Exception:
+        exception_type, exception_object, exception_traceback = sys.exc_info()
+        file = exception_traceback.tb_frame.f_code.co_filename
+        line = exception_traceback.tb_lineno
+        logging.error(f"Exception occurred: {repr(exception_object)} of type {exception_type} in {file} line #{line}")
+        logging.debug("MQTT payload: " + str(payload)[1:])
+
+    return False
+
+
+class MultiplexerClient:
+    """
+    Receives the MQTT messages from the local multiplexer (mqtt-multiplexer.py) over a Unix socket, instead of
+    connecting to the broker. Offers the part of the paho client interface, which is used by the driver.
+    A worker uses an already connected socket to its supervisor instead of a socket path.
+    """
+
+    # header of a forwarded message: topic length, payload length
+    HEADER = struct.Struct("!HI")
+
+    def __init__(self, socket_path, sock=None):
+        self.socket_path = socket_path
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self._socket = sock
+        self._send_lock = threading.Lock()
+        self._running = False
+
+    def connect(self):
+        if self.socket_path is None:
+            return
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        self._socket = sock
+
+    def disconnect(self):
+        self._running = False
+        if self._socket is not None:
+            try:
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def loop_start(self):
+        self._running = True
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def loop_stop(self):
+        self._running = False
+
+    def subscribe(self, topics):
+        self._send("SUB", topics)
+
+    def unsubscribe(self, topics):
+        self._send("UNSUB", topics)
+
+    def _send(self, command, topics):
+        # the supervisor routes the messages to its workers, they do not subscribe
+        if self.socket_path is None:
+            return
+
+        if isinstance(topics, str):
+            topics = [topics]
+        lines = "".join("%s %s\n" % (command, topic[0] if isinstance(topic, tuple) else topic) for topic in topics)
+
+        # a lost connection subscribes all topics again after reconnecting
+        with self._send_lock:
+            try:
+                if self._socket is not None:
+                    self._socket.sendall(lines.encode())
+            except OSError as e:
+                logging.warning("MQTT multiplexer: Could not send %s: %s" % (command, e))
+
+    def _loop(self):
+        while self._running:
+            if self._socket is None:
+                try:
+                    self.connect()
+                except OSError as e:
+                    logging.error('MQTT multiplexer: Could not connect to "%s": %s' % (self.socket_path, e))
+                    logging.error("MQTT multiplexer: Retrying in 15 seconds")
+                    sleep(15)
+                    continue
+
+            self.on_connect(self, None, None, 0, None)
+
+            try:
+                self._read(self._socket.makefile("rb"))
+            except OSError as e:
+                logging.error("MQTT multiplexer: Connection error: %s" % e)
+
+            with self._send_lock:
+                self._socket.close()
+                self._socket = None
+
+            # a worker without supervisor quits
+            if self.socket_path is None:
+                logging.error("Driver stopped. The connection to the supervisor was lost.")
+                os._exit(1)
+
+            if self._running:
+                logging.warning("MQTT multiplexer: Got disconnected, reconnecting")
+                sleep(1)
+
+    def _read(self, stream):
+        while True:
+            header = stream.read(self.HEADER.size)
+            if len(header) < self.HEADER.size:
+                return
+
+            topic_length, payload_length = self.HEADER.unpack(header)
+            msg = mqtt.MQTTMessage(topic=stream.read(topic_length))
+            msg.payload = stream.read(payload_length)
+            self.on_message(self, None, msg)
+
+
+def create_mqtt_client(config):
+    # a worker receives its messages from the supervisor
+    if worker_fd is not None:
+        client = MultiplexerClient(None, socket.socket(fileno=worker_fd))
+        client.on_connect = on_connect
+        client.on_message = on_message
+        return client
+
+    # receive the messages from the local multiplexer, which holds the connection to the broker
+    if "multiplexer_socket" in config["MQTT"] and config["MQTT"]["multiplexer_socket"] != "":
+        client = MultiplexerClient(config["MQTT"]["multiplexer_socket"])
+        client.on_connect = on_connect
+        client.on_message = on_message
+        return client
+
+    client_id = "MqttSolarCharger_" + get_vrm_portal_id() + "_" + str(next(iter((*device_settings.values(), *discovery_settings.values())))["device_instance"])
+    client_class = get_mqtt_client_class() if config["MQTT"].get("tls_enabled") == "1" else mqtt.Client
+    client = client_class(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
     client.on_disconnect = on_disconnect
     client.on_connect = on_connect
+    client.on_connect_fail = on_connect_fail
     client.on_message = on_message
 
+    # reconnect quickly, the broker list is handled in on_disconnect and on_connect_fail
+    client.reconnect_delay_set(min_delay=1, max_delay=15)
+
     # check tls and use settings, if provided
     if "tls_enabled" in config["MQTT"] and config["MQTT"]["tls_enabled"] == "1":
         logging.info("MQTT client: TLS is enabled")
-
-        if "tls_path_to_ca" in config["MQTT"] and config["MQTT"]["tls_path_to_ca"] != "":
-            logging.info('MQTT client: TLS: custom ca "%s" used' % config["MQTT"]["tls_path_to_ca"])
-            client.tls_set(config["MQTT"]["tls_path_to_ca"], tls_version=2)
-        else:
-            client.tls_set(tls_version=2)
-
-        if "tls_insecure" in config["MQTT"] and config["MQTT"]["tls_insecure"] != "":
-            logging.info("MQTT client: TLS certificate server hostname verification disabled")
-            client.tls_insecure_set(True)
+        client.tls_set_context(get_tls_context(config))
 
     # check if username and password are set
     if "username" in config["MQTT"] and "password" in config["MQTT"] and config["MQTT"]["username"] != "" and config["MQTT"]["password"] != "":
         logging.info('MQTT client: Using username "%s" and password to connect' % config["MQTT"]["username"])
         client.username_pw_set(username=config["MQTT"]["username"], password=config["MQTT"]["password"])
 
-    # connect to broker
-    logging.info(f"MQTT client: Connecting to broker {config['MQTT']['broker_address']} on port {config['MQTT']['broker_port']}")
-    client.connect(host=config["MQTT"]["broker_address"], port=int(config["MQTT"]["broker_port"]))
+    return client
+
+
+def connect_mqtt_client(client, config):
+    if isinstance(client, MultiplexerClient):
+        if client.socket_path is not None:
+            logging.info('MQTT client: Connecting to multiplexer on "%s"' % client.socket_path)
+        client.connect()
+        client.loop_start()
+        return
+
+    global brokers
+
+    brokers = BrokerList(get_brokers(config))
+
+    # connect to the first reachable broker, the driver is restarted, if none is reachable
+    while True:
+        host, port = brokers.current
+        logging.info(f"MQTT client: Connecting to broker {host} on port {port}")
+        try:
+            client.connect(host=host, port=port, keepalive=get_keepalive(config))
+            break
+        except Exception as e:
+            if 0 not in brokers.failed[: brokers.index] + brokers.failed[brokers.index + 1 :]:
+                raise
+            logging.error("MQTT client: Error in connecting with broker (%s:%i): %s" % (host, port, e))
+            brokers.mark_failed()
+
     client.loop_start()
 
-    # wait to receive first data, else the JSON is empty and phase setup won't work
-    i = 0
-    while solar_charger_dict["/Yield/Power"]["value"] is None:
-        if i % 12 != 0 or i == 0:
-            logging.info("Waiting 5 seconds for receiving first data...")
+
+class LocalInput:
+    """
+    Receives the payloads of publishers on the GX device over a Unix datagram socket, without the MQTT broker.
+    Each datagram contains the topic, a line break and the JSON payload and is processed like an MQTT message.
+    """
+
+    # maximum size of a datagram
+    MAX_SIZE = 65536
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(socket_path)
+        self.sock.setblocking(False)
+
+        # the payloads are processed in the main loop, like the D-Bus updates
+        self.watch = GLib.io_add_watch(self.sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._read)
+        logging.info('Local input: Listening on "%s"' % socket_path)
+
+    def close(self):
+        GLib.source_remove(self.watch)
+        self.sock.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def _read(self, fd, condition):
+        # process all queued datagrams, before returning to the main loop
+        while True:
+            try:
+                data = self.sock.recv(self.MAX_SIZE)
+            except BlockingIOError:
+                return True
+            except OSError as e:
+                logging.error("Local input: Could not receive: %s" % e)
+                return True
+
+            topic, separator, payload = data.partition(b"\n")
+            if separator == b"":
+                logging.warning("Local input: Received datagram without topic, it was ignored")
+                continue
+
+            # an exception would end the watch, a bad datagram may not stop the input
+            try:
+                topic = topic.decode()
+            except UnicodeDecodeError:
+                logging.warning("Local input: Received datagram with a topic, which is not UTF-8, it was ignored")
+                logging.debug("Topic: " + str(topic)[1:])
+                continue
+
+            process_message(topic, payload)
+
+
+def open_local_input(config):
+    global local_input
+
+    socket_path = get_input_socket(config)
+    if local_input is not None:
+        if local_input.socket_path == socket_path:
+            return
+        local_input.close()
+        local_input = None
+
+    if socket_path != "":
+        local_input = LocalInput(socket_path)
+
+
+class HttpInput:
+    """
+    Minimal HTTP/1.1 server for gateways, which can only send HTTP POST requests. The path of the request is the
+    topic and the body the JSON payload or a JSON array of payloads, which are processed in order. A payload can
+    contain the Unix time it was measured in "timestamp", otherwise the time of the request is used. Connections are
+    kept alive and served non-blocking in the main loop. There is no authentication, so the default address only
+    accepts local gateways.
+    """
+
+    # limits of a request and of the open connections
+    MAX_HEADER_SIZE = 8192
+    MAX_BODY_SIZE = 1048576
+    MAX_CONNECTIONS = 32
+
+    REASONS = {
+        204: "No Content",
+        400: "Bad Request",
+        404: "Not Found",
+        405: "Method Not Allowed",
+        411: "Length Required",
+        413: "Payload Too Large",
+    }
+
+    def __init__(self, address, port):
+        self.address = address
+        self.port = port
+
+        # connection -> [received data, watch]
+        self.connections = {}
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((address, port))
+        self.server.listen(self.MAX_CONNECTIONS)
+        self.server.setblocking(False)
+        self.watch = GLib.io_add_watch(self.server.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._accept)
+        logging.info("HTTP input: Listening on %s port %i" % (address if address != "" else "all addresses", port))
+
+    def close(self):
+        GLib.source_remove(self.watch)
+        self.server.close()
+        for conn, (data, watch) in self.connections.items():
+            GLib.source_remove(watch)
+            conn.close()
+        self.connections = {}
+
+    def _accept(self, fd, condition):
+        while True:
+            try:
+                conn, address = self.server.accept()
+            except BlockingIOError:
+                return True
+            except OSError as e:
+                logging.error("HTTP input: Could not accept connection: %s" % e)
+                return True
+
+            if len(self.connections) >= self.MAX_CONNECTIONS:
+                logging.warning("HTTP input: Too many connections, closing the connection from %s" % address[0])
+                conn.close()
+                continue
+
+            conn.setblocking(False)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            watch = GLib.io_add_watch(conn.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self._read, conn)
+            self.connections[conn] = [b"", watch]
+
+    def _read(self, fd, condition, conn):
+        try:
+            data = conn.recv(65536)
+        except BlockingIOError:
+            return True
+        except OSError:
+            data = b""
+
+        if not data:
+            return self._close(conn)
+
+        buffer = self.connections[conn][0] + data
+
+        # process all complete requests, a client may send the next requests without waiting for the responses
+        while True:
+            header_end = buffer.find(b"\r\n\r\n")
+            if header_end == -1:
+                if len(buffer) > self.MAX_HEADER_SIZE:
+                    self._respond(conn, 413, False)
+                    return self._close(conn)
+                break
+
+            request, *lines = buffer[:header_end].decode("latin-1").split("\r\n")
+            headers = {}
+            for line in lines:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip().lower()
+
+            try:
+                method, target, version = request.split(" ")
+                length = int(headers.get("content-length", "0" if method != "POST" else "-1"))
+            except ValueError:
+                self._respond(conn, 400, False)
+                return self._close(conn)
+
+            # without the length the end of the body is unknown
+            if length < 0:
+                self._respond(conn, 411, False)
+                return self._close(conn)
+            if length > self.MAX_BODY_SIZE:
+                self._respond(conn, 413, False)
+                return self._close(conn)
+
+            body_start = header_end + 4
+            if len(buffer) < body_start + length:
+                break
+
+            body = buffer[body_start : body_start + length]
+            buffer = buffer[body_start + length :]
+
+            if version == "HTTP/1.1":
+                keep_alive = headers.get("connection") != "close"
+            else:
+                keep_alive = headers.get("connection") == "keep-alive"
+
+            status = self._handle(method, target, body)
+            if not self._respond(conn, status, keep_alive) or not keep_alive:
+                return self._close(conn)
+
+        self.connections[conn][0] = buffer
+        return True
+
+    def _close(self, conn):
+        # the watch is removed by returning False from its callback
+        self.connections.pop(conn, None)
+        conn.close()
+        return False
+
+    def _handle(self, method, target, body):
+        from urllib.parse import unquote
+
+        if method != "POST":
+            return 405
+
+        topic = unquote(target.partition("?")[0]).lstrip("/")
+        try:
+            samples = json.loads(body)
+        except ValueError:
+            logging.error('HTTP input: Received body on topic "%s" is not a valid JSON' % topic)
+            return 400
+
+        if not isinstance(samples, list):
+            samples = [samples]
+
+        for sample in samples:
+            timestamp = None
+            if isinstance(sample, dict) and "timestamp" in sample:
+                timestamp = sample.pop("timestamp")
+                if type(timestamp) not in (int, float):
+                    logging.error('HTTP input: Received timestamp on topic "%s" is not a Unix time' % topic)
+                    return 400
+
+            valid = process_message(topic, sample, timestamp)
+            if valid is None:
+                return 404
+            if not valid:
+                return 400
+        return 204
+
+    def _respond(self, conn, status, keep_alive):
+        response = "HTTP/1.1 %i %s\r\nContent-Length: 0\r\nConnection: %s\r\n\r\n" % (status, self.REASONS[status], "keep-alive" if keep_alive else "close")
+        response = response.encode()
+        try:
+            # the response is small, a client, which does not read its responses, is disconnected
+            return conn.send(response) == len(response)
+        except OSError:
+            return False
+
+
+def open_http_input(config):
+    global http_input
+
+    address = get_http_address(config)
+    port = get_http_port(config)
+    if http_input is not None:
+        if http_input.address == address and http_input.port == port:
+            return
+        http_input.close()
+        http_input = None
+
+    if port != 0:
+        http_input = HttpInput(address, port)
+
+
+def add_device(key, settings):
+    device = SolarCharger(key, settings)
+    devices[key] = device
+    for topic in settings["topics"]:
+        devices_by_topic[topic] = device
+
+    # restore history from the last run, before the first message arrives
+    device.load_snapshot()
+    device.reschedule()
+
+    logging.info('%s: Waiting for first data on topic "%s"...' % (device.name, settings["topic"]))
+    return device
+
+
+def get_subscriptions():
+    """
+    Return the topics of the configured solar chargers and the topic patterns of the auto-discovery.
+    """
+    return {topic for settings in device_settings.values() for topic in settings["topics"]} | set(discovery_settings)
+
+
+def get_discovered_device_instance(settings, topic_id):
+    """
+    Derive a stable device instance from the topic segments matched by the wildcards. Numeric ids are added
+    to the device_instance, other ids are hashed. If the device instance is already used, the next free one is taken.
+    """
+    instance_range = settings["device_instance_range"]
+    if topic_id.isdigit():
+        offset = int(topic_id) % instance_range
+    else:
+        offset = zlib.crc32(topic_id.encode()) % instance_range
+
+    # the configured solar chargers of other workers are not in devices
+    used = {device.settings["device_instance"] for device in list(devices.values())}
+    used.update(int(config[section]["device_instance"]) for section in config.sections() if section.startswith("DEVICE"))
+    for i in range(instance_range):
+        device_instance = settings["device_instance"] + (offset + i) % instance_range
+        if device_instance not in used:
+            if i > 0:
+                logging.warning('Discovery: device instance %i is already used, "%s" uses %i' % (device_instance - i, topic_id, device_instance))
+            return device_instance
+
+    return None
+
+
+def get_discovered_settings(settings, topic, device_name, device_instance):
+    discovered_settings = {key: value for key, value in settings.items() if key not in ("section", "device_instance_range")}
+    discovered_settings.update(
+        {
+            "device_name": device_name,
+            "device_instance": device_instance,
+            "topic": topic,
+            "topics": [topic],
+            "discovery": settings["section"],
+        }
+    )
+    return discovered_settings
+
+
+def discover_device(topic, payload, timestamp=None):
+    """
+    Create a solar charger for a topic, which matches a topic pattern of the auto-discovery, with its first payload.
+    The solar charger is only kept, if the payload is valid, so invalid payloads do not use up device instances.
+    Returns None, if the topic does not match, otherwise if the payload was valid. Has to be called with the
+    discovery_lock held. The solar charger registers on D-Bus with its first update in the GLib main loop.
+    """
+    settings = next(discovery_matcher.iter_match(topic), None)
+    if settings is None:
+        return None
+
+    if payload == "" or payload == b"":
+        logging.warning("Received message was empty and therefore it was ignored")
+        return False
+
+    # the segments of the topic matched by the wildcards identify the solar charger
+    pattern = settings["topic"].split("/")
+    levels = topic.split("/")
+    topic_id = [levels[i] for i, part in enumerate(pattern) if part == "+"]
+    if pattern[-1] == "#":
+        topic_id.extend(levels[len(pattern) - 1 :])
+    topic_id = "/".join(topic_id) if topic_id else topic
+
+    device_instance = get_discovered_device_instance(settings, topic_id)
+    if device_instance is None:
+        logging.error('Discovery: no free device instance left in [%s] for topic "%s"' % (settings["section"], topic))
+        return None
+
+    if "{id}" in settings["device_name"]:
+        device_name = settings["device_name"].replace("{id}", topic_id)
+    else:
+        device_name = settings["device_name"] + " " + topic_id
+
+    key = "DISCOVERED_%i" % device_instance
+    device = SolarCharger(key, get_discovered_settings(settings, topic, device_name, device_instance))
+    device.load_snapshot()
+
+    valid = False
+    try:
+        with device.lock:
+            valid = device.process_payload(payload, topic, timestamp)
+    finally:
+        if not valid:
+            device.history_file.close()
+    if not valid:
+        return False
+
+    devices[key] = device
+    devices_by_topic[topic] = device
+    device.request_update()
+
+    logging.info('%s: Discovered on topic "%s" with device instance %i' % (device.name, topic, device_instance))
+    return True
+
+
+def remove_device(key):
+    device = devices.pop(key)
+    for topic in device.settings["topics"]:
+        devices_by_topic.pop(topic, None)
+    device.cancel_timers()
+    device.save_snapshot(force=True)
+    device.history_file.close()
+    device.unregister()
+
+
+def reload_config():
+    """
+    Apply a changed config.ini without restarting the driver. Triggered by SIGHUP.
+    Only the settings that changed are applied, the D-Bus services stay registered.
+    """
+    global config, device_settings, discovery_settings, discovery_matcher, snapshot_interval, mqtt_client
+
+    start = perf_counter()
+    logging.warning('Reload: reading "%s"' % config_file)
+
+    try:
+        new_config = configparser.ConfigParser()
+        new_config.read(config_file)
+        new_config["MQTT"]["broker_address"]
+        new_logging_level = get_logging_level(new_config)
+        new_snapshot_interval = get_snapshot_interval(new_config)
+        new_device_settings = get_device_settings(new_config)
+        new_discovery_settings = get_discovery_settings(new_config)
+        new_http_port = get_http_port(new_config)
+        new_http_address = get_http_address(new_config)
+    except Exception as e:
+        logging.error("Reload: config.ini is not valid, keeping the running config: %s" % repr(e))
+        return True
+
+    old_config = config
+    old_topics = get_subscriptions()
+    config = new_config
+    changes = []
+
+    if new_logging_level != logging.getLogger().level:
+        logging.getLogger().setLevel(new_logging_level)
+        changes.append("logging")
+
+    if new_snapshot_interval != snapshot_interval:
+        snapshot_interval = new_snapshot_interval
+        changes.append("snapshot_interval")
+
+    # remove, change and add solar chargers
+    for key in list(devices):
+        if key not in new_device_settings and "discovery" not in devices[key].settings:
+            remove_device(key)
+            changes.append("removed " + key)
+
+    for key, settings in new_device_settings.items():
+        if key in devices:
+            device = devices[key]
+            old_device_topics = device.settings["topics"]
+            device_changes = device.apply_settings(settings)
+            if old_device_topics != settings["topics"]:
+                for topic in old_device_topics:
+                    devices_by_topic.pop(topic, None)
+                for topic in settings["topics"]:
+                    devices_by_topic[topic] = device
+            changes.extend(key + " " + change for change in device_changes)
         else:
-            logging.warning("Waiting since %s seconds for receiving first data..." % str(i * 5))
+            add_device(key, settings)
+            changes.append("added " + key)
 
-        # check if timeout was exceeded
-        if timeout != 0 and timeout <= (i * 5):
-            logging.error("Driver stopped. Timeout of %i seconds exceeded, since no new MQTT message was received in this time." % timeout)
-            sys.exit()
+    # discovered solar chargers follow the changes of their topic pattern
+    matcher = MQTTMatcher()
+    for pattern, settings in new_discovery_settings.items():
+        matcher[pattern] = settings
 
-        sleep(5)
-        i += 1
+    for key, device in list(devices.items()):
+        if "discovery" not in device.settings:
+            continue
 
-    paths_dbus = {
-        "/UpdateIndex": {"value": 0, "textformat": _n},
-    }
-    paths_dbus.update(solar_charger_dict)
+        settings = next(matcher.iter_match(device.settings["topic"]), None)
+        if settings is None:
+            remove_device(key)
+            changes.append("removed " + key)
+            continue
+
+        settings = get_discovered_settings(settings, device.settings["topic"], device.settings["device_name"], device.settings["device_instance"])
+        changes.extend(key + " " + change for change in device.apply_settings(settings))
+
+    if new_discovery_settings != discovery_settings:
+        changes.append("discovery")
 
-    DbusMqttSolarChargerService(
-        servicename="com.victronenergy.solarcharger.mqtt_solarcharger_" + str(config["DEFAULT"]["device_instance"]),
-        deviceinstance=int(config["DEFAULT"]["device_instance"]),
-        customname=config["DEFAULT"]["device_name"],
-        paths=paths_dbus,
+    device_settings = new_device_settings
+    discovery_settings = new_discovery_settings
+    discovery_matcher = matcher
+    new_topics = get_subscriptions()
+
+    if get_input_socket(new_config) != get_input_socket(old_config) and worker_index is None:
+        try:
+            open_local_input(new_config)
+        except OSError as e:
+            logging.error("Reload: could not open the input socket: %s" % repr(e))
+        changes.append("input_socket")
+
+    if (new_http_port != get_http_port(old_config) or new_http_address != get_http_address(old_config)) and worker_index is None:
+        try:
+            open_http_input(new_config)
+        except OSError as e:
+            logging.error("Reload: could not open the HTTP port: %s" % repr(e))
+        changes.append("http_port")
+
+    # a worker is connected to its supervisor, which holds the MQTT connection
+    if worker_index is not None:
+        pass
+
+    elif any(old_config["MQTT"].get(key) != new_config["MQTT"].get(key) for key in MQTT_CONNECTION_KEYS):
+        # broker or TLS settings changed, a new connection is needed
+        logging.warning("Reload: MQTT connection settings changed, reconnecting")
+        with mqtt_client_lock:
+            old_client = mqtt_client
+            old_client.on_disconnect = None
+            old_client.disconnect()
+            old_client.loop_stop()
+
+            try:
+                mqtt_client = create_mqtt_client(new_config)
+                connect_mqtt_client(mqtt_client, new_config)
+            except Exception as e:
+                logging.error("Reload: could not connect with the new MQTT settings: %s" % repr(e))
+        changes.append("mqtt")
+
+    elif old_topics != new_topics:
+        if old_topics - new_topics:
+            mqtt_client.unsubscribe(list(old_topics - new_topics))
+        if new_topics - old_topics:
+            mqtt_client.subscribe([(topic, 0) for topic in new_topics - old_topics])
+
+    logging.warning("Reload: applied %s in %.1f ms" % (", ".join(changes) if changes else "no changes", (perf_counter() - start) * 1000))
+
+    # keep the signal handler installed
+    return True
+
+
+# seconds a worker may block the forwarding, before it is restarted
+WORKER_SEND_TIMEOUT = 5
+
+# messages queued for a worker, before it is restarted
+WORKER_QUEUE_SIZE = 10000
+
+
+class SupervisedWorker:
+    """
+    Worker process and the socket to it. The messages are queued and sent by a thread, so that a slow worker
+    does not block the MQTT network thread. A worker, which does not take its messages in time, is killed,
+    because a partially sent message breaks the framing, and restarted by the supervisor.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.failed = False
+        self.closed = False
+
+        parent, child = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.realpath(__file__), "--worker", str(index), "--worker-fd", str(child.fileno())],
+            pass_fds=(child.fileno(),),
+        )
+        child.close()
+        parent.settimeout(WORKER_SEND_TIMEOUT)
+        self.sock = parent
+
+        self.queue = queue.Queue(WORKER_QUEUE_SIZE)
+        threading.Thread(target=self._send, name="worker %i" % index, daemon=True).start()
+
+    def forward(self, topic, payload):
+        if self.failed:
+            return
+        topic = topic.encode()
+        try:
+            self.queue.put_nowait(MultiplexerClient.HEADER.pack(len(topic), len(payload)) + topic + payload)
+        except queue.Full:
+            self.fail("%i messages are queued" % WORKER_QUEUE_SIZE)
+
+    def _send(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None or self.closed:
+                return
+            try:
+                self.sock.sendall(frame)
+            except OSError as e:
+                if not self.closed:
+                    self.fail(repr(e))
+                return
+
+    def fail(self, reason):
+        if self.failed:
+            return
+        self.failed = True
+        logging.error("Supervisor: Worker %i does not take its messages, restarting it: %s" % (self.index, reason))
+        self.process.kill()
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+        try:
+            # wake up the sender thread
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class Supervisor:
+    """
+    Supervisor mode for many solar chargers: this process receives all MQTT messages and forwards them unparsed to
+    worker processes, partitioned by solar charger. Each worker runs this driver for its part of the solar chargers,
+    so JSON decoding and D-Bus updates are spread over multiple CPU cores. A crashed worker is restarted without
+    disturbing the others.
+    """
+
+    def __init__(self, workers):
+        self.workers = [None] * workers
+        self.topics = {}
+        self.update_topics()
+
+    def update_topics(self):
+        # configured solar chargers are routed by config section, discovered ones by topic
+        self.topics = {topic: get_worker_index(key, len(self.workers)) for key, settings in device_settings.items() for topic in settings["topics"]}
+
+    def start_worker(self, index):
+        self.workers[index] = SupervisedWorker(index)
+        logging.info("Supervisor: Started worker %i with pid %i" % (index, self.workers[index].process.pid))
+
+    def restart_workers(self):
+        for index, worker in enumerate(self.workers):
+            if worker.process.poll() is not None:
+                logging.error("Supervisor: Worker %i exited with code %i, restarting it" % (index, worker.process.returncode))
+                worker.close()
+                self.start_worker(index)
+
+    def on_message(self, client, userdata, msg):
+        index = self.topics.get(msg.topic)
+        if index is None:
+            index = get_worker_index(msg.topic, len(self.workers))
+
+        # runs in the network thread of the MQTT client, the message is only queued
+        self.workers[index].forward(msg.topic, msg.payload)
+
+    def reload(self, signum, frame):
+        global config, device_settings, discovery_settings
+
+        logging.warning('Reload: reading "%s"' % config_file)
+        try:
+            new_config = configparser.ConfigParser()
+            new_config.read(config_file)
+            new_device_settings = get_device_settings(new_config)
+            new_discovery_settings = get_discovery_settings(new_config)
+        except Exception as e:
+            logging.error("Reload: config.ini is not valid, keeping the running config: %s" % repr(e))
+            return
+
+        if get_workers(new_config) != len(self.workers):
+            logging.warning("Reload: changing workers requires a restart of the driver")
+        if any(config["MQTT"].get(key) != new_config["MQTT"].get(key) for key in MQTT_CONNECTION_KEYS):
+            logging.warning("Reload: changing the MQTT connection in supervisor mode requires a restart of the driver")
+
+        old_topics = get_subscriptions()
+        config = new_config
+        device_settings = new_device_settings
+        discovery_settings = new_discovery_settings
+        self.update_topics()
+        new_topics = get_subscriptions()
+
+        if old_topics - new_topics:
+            mqtt_client.unsubscribe(list(old_topics - new_topics))
+        if new_topics - old_topics:
+            mqtt_client.subscribe([(topic, 0) for topic in new_topics - old_topics])
+
+        # each worker applies the changes of its solar chargers
+        for worker in self.workers:
+            worker.process.send_signal(signal.SIGHUP)
+
+    def run(self):
+        global mqtt_client
+
+        for index in range(len(self.workers)):
+            self.start_worker(index)
+
+        mqtt_client = create_mqtt_client(config)
+        mqtt_client.on_message = self.on_message
+        connect_mqtt_client(mqtt_client, config)
+
+        signal.signal(signal.SIGHUP, self.reload)
+
+        # restart crashed and stuck workers
+        while True:
+            sleep(1)
+            self.restart_workers()
+
+
+def backfill(file, key):
+    """
+    Aggregate a log file to the daily history of a configured solar charger and write it to its history file. The
+    values of the logged days replace the stored ones, days older than history_days are skipped. The driver has to be
+    stopped, otherwise it overwrites the history file with its own history.
+    """
+    if key is None:
+        if len(device_settings) != 1:
+            raise ValueError("select the solar charger with --device, one of: %s" % ", ".join(device_settings))
+        key = next(iter(device_settings))
+    if key not in device_settings:
+        raise ValueError('the solar charger "%s" is not configured, one of: %s' % (key, ", ".join(device_settings)))
+    if snapshot_interval == 0:
+        raise ValueError("the history file is disabled with snapshot_interval = 0")
+    if device_settings[key]["history_days"] == 0:
+        raise ValueError("the daily history is disabled with history_days = 0")
+
+    start = perf_counter()
+    aggregator = DailyAggregator()
+    for timestamps, columns in read_backfill_chunks(file):
+        aggregator.add(timestamps, columns)
+    duration = perf_counter() - start
+
+    device = SolarCharger(key, device_settings[key])
+    device.load_history_file()
+    device.add_trackers(aggregator.trackers)
+
+    today = get_day(time())
+    written = 0
+    for day, values in aggregator.days.items():
+        if not 0 <= today - day < device.history.days:
+            continue
+        for name, value in values.items():
+            device.history.set(today - day, name, round(value) if name in STATE_COLUMNS else value)
+        written += 1
+
+    history = device.history
+    device.history_file.write(int(time()), history.head, list(history.columns), history.get_rows())
+    device.history_file.close()
+
+    print(
+        "%s: Backfill: aggregated %i samples in %.1f s (%i samples/s%s), wrote %i days to \"%s\", skipped %i days older than history_days"
+        % (
+            device.name,
+            aggregator.samples,
+            duration,
+            aggregator.samples / duration if duration > 0 else 0,
+            ", NumPy" if aggregator.numpy is not None else "",
+            written,
+            device.history_file.path,
+            len(aggregator.days) - written,
+        )
     )
 
-    logging.info("Connected to dbus and switching over to GLib.MainLoop() (= event based)")
+
+def main():
+    global mqtt_client, scheduler
+
+    _thread.daemon = True  # allow the program to quit
+
+    if backfill_file is not None:
+        try:
+            backfill(backfill_file, backfill_key)
+        except Exception as e:
+            print('ERROR:Backfill of "%s" failed: %s' % (backfill_file, e))
+            sys.exit(1)
+        return
+
+    if workers > 0 and worker_index is None:
+        logging.info("Supervisor: Starting %i workers" % workers)
+        Supervisor(workers).run()
+        return
+
+    from dbus.mainloop.glib import (
+        DBusGMainLoop,
+    )  # pyright: ignore[reportMissingImports]
+
+    # Have a mainloop, so we can send/receive asynchronous calls to and from dbus
+    DBusGMainLoop(set_as_default=True)
+
+    # all timers of all solar chargers run on a single GLib timer
+    scheduler = Scheduler()
+
+    # each solar charger registers on D-Bus, as soon as it receives its first data
+    for key, settings in device_settings.items():
+        add_device(key, settings)
+
+    # MQTT setup
+    mqtt_client = create_mqtt_client(config)
+    connect_mqtt_client(mqtt_client, config)
+    startup_phase("MQTT connect")
+
+    # local publishers, the workers receive all messages from the supervisor
+    if worker_index is None:
+        open_local_input(config)
+        open_http_input(config)
+
+    # reload config.ini on SIGHUP
+    GLib.unix_signal_add(GLib.PRIORITY_HIGH, signal.SIGHUP, reload_config)
+
+    logging.info("Switching over to GLib.MainLoop() (= event based)")
     mainloop = GLib.MainLoop()
     mainloop.run()
 
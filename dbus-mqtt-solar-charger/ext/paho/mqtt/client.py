@@ -18,10 +18,8 @@ protocol that is easy to implement and suitable for low powered devices.
 """
 from __future__ import annotations
 
-import base64
 import collections
 import errno
-import hashlib
 import logging
 import os
 import platform
@@ -31,9 +29,6 @@ import string
 import struct
 import threading
 import time
-import urllib.parse
-import urllib.request
-import uuid
 import warnings
 from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, NamedTuple, Sequence, Tuple, Union, cast
 
@@ -94,16 +89,44 @@ if TYPE_CHECKING:
             ...
 
 
-try:
-    import ssl
-except ImportError:
-    ssl = None  # type: ignore[assignment]
+# The modules below are only needed for TLS, proxies and SRV lookups. They are
+# imported on first use to keep the import of this module fast.
+class _SSLNotImported(Exception):
+    """Placeholder for the ssl exceptions, never raised while ssl is not imported."""
 
 
-try:
-    import socks  # type: ignore[import-untyped]
-except ImportError:
-    socks = None  # type: ignore[assignment]
+ssl = None  # type: ignore[assignment]
+_SSLWantReadError: type[Exception] = _SSLNotImported
+_SSLWantWriteError: type[Exception] = _SSLNotImported
+
+
+def _import_ssl() -> bool:
+    global ssl, _SSLWantReadError, _SSLWantWriteError
+    if ssl is None:
+        try:
+            import ssl as _ssl
+        except ImportError:
+            return False
+        ssl = _ssl
+        _SSLWantReadError = _ssl.SSLWantReadError
+        _SSLWantWriteError = _ssl.SSLWantWriteError
+    return True
+
+
+socks = None  # type: ignore[assignment]
+_socks_checked = False
+
+
+def _import_socks() -> bool:
+    global socks, _socks_checked
+    if not _socks_checked:
+        _socks_checked = True
+        try:
+            import socks as _socks  # type: ignore[import-untyped]
+        except ImportError:
+            return False
+        socks = _socks
+    return socks is not None
 
 
 try:
@@ -112,12 +135,12 @@ try:
 except AttributeError:
     time_func = time.time
 
-try:
-    import dns.resolver
-
-    HAVE_DNS = True
-except ImportError:
-    HAVE_DNS = False
+def _import_dns() -> bool:
+    try:
+        import dns.resolver  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
 
 if platform.system() == 'Windows':
@@ -791,6 +814,7 @@ class Client:
         # [MQTT-3.1.3-4] Client Id must be UTF-8 encoded string.
         if client_id == "" or client_id is None:
             if protocol == MQTTv31:
+                import uuid
                 self._client_id = _base62(uuid.uuid4().int, padding=22).encode("utf8")
             else:
                 self._client_id = b""
@@ -1095,9 +1119,9 @@ class Client:
             raise ConnectionError("self._sock is None")
         try:
             return self._sock.recv(bufsize)
-        except ssl.SSLWantReadError as err:
+        except _SSLWantReadError as err:
             raise BlockingIOError() from err
-        except ssl.SSLWantWriteError as err:
+        except _SSLWantWriteError as err:
             self._call_socket_register_write()
             raise BlockingIOError() from err
         except AttributeError as err:
@@ -1111,9 +1135,9 @@ class Client:
 
         try:
             return self._sock.send(buf)
-        except ssl.SSLWantReadError as err:
+        except _SSLWantReadError as err:
             raise BlockingIOError() from err
-        except ssl.SSLWantWriteError as err:
+        except _SSLWantWriteError as err:
             self._call_socket_register_write()
             raise BlockingIOError() from err
         except BlockingIOError as err:
@@ -1192,6 +1216,7 @@ class Client:
         if self._ssl_context is not None:
             raise ValueError('SSL/TLS has already been configured.')
 
+        _import_ssl()
         if context is None:
             context = ssl.create_default_context()
 
@@ -1255,7 +1280,7 @@ class Client:
             more information.
 
         Must be called before `connect()`, `connect_async()` or `connect_srv()`."""
-        if ssl is None:
+        if not _import_ssl():
             raise ValueError('This platform has no SSL/TLS.')
 
         if not hasattr(ssl, 'SSLContext'):
@@ -1361,7 +1386,7 @@ class Client:
 
             mqttc.proxy_set(proxy_type=socks.HTTP, proxy_addr='1.2.3.4', proxy_port=4231)
         """
-        if socks is None:
+        if not _import_socks():
             raise ValueError("PySocks must be installed for proxy support.")
         elif not self._proxy_is_valid(proxy_args):
             raise ValueError("proxy_type and/or proxy_addr are invalid.")
@@ -1450,7 +1475,7 @@ class Client:
         :param keepalive, bind_address, clean_start and properties: see `connect()`
         """
 
-        if HAVE_DNS is False:
+        if not _import_dns():
             raise ValueError(
                 'No DNS resolver library found, try "pip install dnspython".')
 
@@ -1463,6 +1488,7 @@ class Client:
             if self._ssl:
                 # IANA specifies secure-mqtt (not mqtts) for port 8883
                 rr = f'_secure-mqtt._tcp.{domain}'
+            import dns.resolver
             answers = []
             for answer in dns.resolver.query(rr, dns.rdatatype.SRV):
                 addr = answer.target.to_text()[:-1]
@@ -3885,6 +3911,7 @@ class Client:
                     "Received CONNACK (%s, %s), attempting to use non-empty CID",
                     flags, result,
                 )
+                import uuid
                 self._client_id = _base62(uuid.uuid4().int, padding=22).encode("utf8")
                 return self.reconnect()
 
@@ -4560,9 +4587,12 @@ class Client:
             return False
 
     def _get_proxy(self) -> dict[str, Any] | None:
-        if socks is None:
+        if not _import_socks():
             return None
 
+        import urllib.parse
+        import urllib.request
+
         # First, check if the user explicitly passed us a proxy to use
         if self._proxy_is_valid(self._proxy):
             return self._proxy
@@ -4717,6 +4747,9 @@ class _WebsocketWrapper:
         self._readbuffer = bytearray()
 
     def _do_handshake(self, extra_headers: WebSocketHeaders | None) -> None:
+        import base64
+        import hashlib
+        import uuid
 
         sec_websocket_key = uuid.uuid4().bytes
         sec_websocket_key = base64.b64encode(sec_websocket_key)
@@ -8,11 +8,16 @@ echo "Installing $SERVICE_NAME..."
 # set permissions for script files
 echo "Setting permissions..."
 chmod 755 $SCRIPT_DIR/$SERVICE_NAME.py
+chmod 755 $SCRIPT_DIR/backfill.sh
 chmod 755 $SCRIPT_DIR/install.sh
+chmod 755 $SCRIPT_DIR/reload.sh
 chmod 755 $SCRIPT_DIR/restart.sh
 chmod 755 $SCRIPT_DIR/uninstall.sh
 chmod 755 $SCRIPT_DIR/service/run
 chmod 755 $SCRIPT_DIR/service/log/run
+chmod 755 $SCRIPT_DIR/mqtt-multiplexer.py
+chmod 755 $SCRIPT_DIR/service-multiplexer/run
+chmod 755 $SCRIPT_DIR/service-multiplexer/log/run
 
 # check dependencies
 python -c "import paho.mqtt.client"
@@ -37,6 +42,12 @@ else
     echo "Service already exists."
 fi
 
+# create sym-link to run the multiplexer in deamon, if enabled
+if grep -q "^\[MULTIPLEXER\]" $SCRIPT_DIR/config.ini && [ ! -L /service/$SERVICE_NAME-multiplexer ]; then
+    echo "Creating multiplexer service..."
+    ln -s $SCRIPT_DIR/service-multiplexer /service/$SERVICE_NAME-multiplexer
+fi
+
 # add install-script to rc.local to be ready for firmware update
 filename=/data/rc.local
 if [ ! -f $filename ]
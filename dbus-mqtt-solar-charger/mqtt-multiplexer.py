@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+
+# Local MQTT multiplexer
+# Holds a single connection to the MQTT broker and forwards the messages to the driver instances, which
+# are connected over a Unix socket. Each driver instance receives only the topics it subscribed.
+#
+# Protocol on the Unix socket:
+# driver -> multiplexer: one command per line, "SUB <topic>" or "UNSUB <topic>", wildcards are allowed
+# multiplexer -> driver: one frame per message, header (topic length, payload length), topic, payload
+
+import logging
+import sys
+import os
+import socket
+import selectors
+import struct
+import threading
+import configparser  # for config/ini file
+from time import sleep
+
+# import external packages
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "ext"))
+import paho.mqtt.client as mqtt  # noqa: E402
+from paho.mqtt.matcher import MQTTMatcher  # noqa: E402
+
+
+# get values from config.ini file
+try:
+    config_file = (os.path.dirname(os.path.realpath(__file__))) + "/config.ini"
+    if os.path.exists(config_file):
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        if config["MQTT"]["broker_address"] == "IP_ADDR_OR_FQDN":
+            print('ERROR:The "config.ini" is using invalid default values like IP_ADDR_OR_FQDN. The multiplexer restarts in 60 seconds.')
+            sleep(60)
+            sys.exit()
+        if "MULTIPLEXER" not in config:
+            print('ERROR:The "config.ini" has no [MULTIPLEXER] section. The multiplexer restarts in 60 seconds.')
+            sleep(60)
+            sys.exit()
+    else:
+        print('ERROR:The "' + config_file + '" is not found. Did you copy or rename the "config.sample.ini" to "config.ini"? The multiplexer restarts in 60 seconds.')
+        sleep(60)
+        sys.exit()
+
+except Exception:
+    exception_type, exception_object, exception_traceback = sys.exc_info()
+    file = exception_traceback.tb_frame.f_code.co_filename
+    line = exception_traceback.tb_lineno
+    print(f"Exception occurred: {repr(exception_object)} of type {exception_type} in {file} line #{line}")
+    print("ERROR:The multiplexer restarts in 60 seconds.")
+    sleep(60)
+    sys.exit()
+
+
+# Get logging level from config.ini
+# ERROR = shows errors only
+# WARNING = shows ERROR and warnings
+# INFO = shows WARNING and running functions
+# DEBUG = shows INFO and data/values
+if "DEFAULT" in config and "logging" in config["DEFAULT"]:
+    if config["DEFAULT"]["logging"] == "DEBUG":
+        logging.basicConfig(level=logging.DEBUG)
+    elif config["DEFAULT"]["logging"] == "INFO":
+        logging.basicConfig(level=logging.INFO)
+    elif config["DEFAULT"]["logging"] == "ERROR":
+        logging.basicConfig(level=logging.ERROR)
+    else:
+        logging.basicConfig(level=logging.WARNING)
+else:
+    logging.basicConfig(level=logging.WARNING)
+
+
+# header of a forwarded message: topic length, payload length
+HEADER = struct.Struct("!HI")
+
+# seconds a driver instance may block the forwarding, before it is disconnected
+SEND_TIMEOUT = 5
+
+
+# ordered list of brokers as (host, port), see the broker_address in the config.sample.ini
+brokers = []
+for broker in config["MQTT"]["broker_address"].split(","):
+    broker = broker.strip()
+    if broker.count(":") == 1:
+        brokers.append((broker.split(":")[0], int(broker.split(":")[1])))
+    else:
+        brokers.append((broker, int(config["MQTT"]["broker_port"])))
+broker_index = 0
+
+# protects the broker_index against the failover in the network thread, which is skipped while switching is set
+broker_lock = threading.Lock()
+switching = False
+
+keepalive = int(config["MQTT"]["keepalive"]) if "keepalive" in config["MQTT"] else 60
+fallback_interval = int(config["MQTT"]["broker_fallback_interval"]) if "broker_fallback_interval" in config["MQTT"] else 60
+
+
+class Multiplexer:
+    """
+    Forwards the messages of the MQTT client to the connected driver instances. The broker subscriptions are
+    reference counted, a topic is subscribed with the first and unsubscribed with the last driver instance.
+    """
+
+    def __init__(self, client, socket_path):
+        self.client = client
+        self.socket_path = socket_path
+
+        # topic filter -> connections, protected by lock. The matcher contains the same sets for the lookup by topic
+        self.lock = threading.Lock()
+        self.filters = {}
+        self.matcher = MQTTMatcher()
+        self.subscriptions = {}
+        self.buffers = {}
+
+        self.selector = selectors.DefaultSelector()
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(socket_path)
+        self.server.listen()
+        self.selector.register(self.server, selectors.EVENT_READ)
+
+        logging.info('Multiplexer: Listening on "%s"' % socket_path)
+
+    def serve_forever(self):
+        while True:
+            for key, events in self.selector.select():
+                if key.fileobj is self.server:
+                    self._accept()
+                else:
+                    self._read(key.fileobj)
+
+    def _accept(self):
+        conn, _ = self.server.accept()
+        conn.settimeout(SEND_TIMEOUT)
+        with self.lock:
+            self.subscriptions[conn] = set()
+        self.buffers[conn] = b""
+        self.selector.register(conn, selectors.EVENT_READ)
+        logging.info("Multiplexer: Driver instance connected, %i connected" % len(self.subscriptions))
+
+    def _read(self, conn):
+        try:
+            data = conn.recv(4096)
+        except OSError:
+            data = b""
+
+        if not data:
+            self._close(conn)
+            return
+
+        self.buffers[conn] += data
+        *lines, self.buffers[conn] = self.buffers[conn].split(b"\n")
+        for line in lines:
+            command, _, topic = line.decode().partition(" ")
+            if command == "SUB" and topic != "":
+                self.subscribe(conn, topic)
+            elif command == "UNSUB" and topic != "":
+                self.unsubscribe(conn, topic)
+            else:
+                logging.warning('Multiplexer: Received invalid command "%s"' % line)
+
+    def _close(self, conn):
+        with self.lock:
+            topics = self.subscriptions.get(conn, set())
+        for topic in list(topics):
+            self.unsubscribe(conn, topic)
+
+        with self.lock:
+            self.subscriptions.pop(conn, None)
+        self.buffers.pop(conn, None)
+        self.selector.unregister(conn)
+        conn.close()
+        logging.info("Multiplexer: Driver instance disconnected, %i connected" % len(self.subscriptions))
+
+    def subscribe(self, conn, topic):
+        with self.lock:
+            first = topic not in self.filters
+            if first:
+                self.filters[topic] = set()
+                self.matcher[topic] = self.filters[topic]
+            self.filters[topic].add(conn)
+            self.subscriptions[conn].add(topic)
+
+        if first:
+            logging.info('Multiplexer: Subscribing to "%s"' % topic)
+            self.client.subscribe(topic)
+
+    def unsubscribe(self, conn, topic):
+        with self.lock:
+            if conn not in self.filters.get(topic, ()):
+                return
+            self.filters[topic].discard(conn)
+            self.subscriptions[conn].discard(topic)
+            last = len(self.filters[topic]) == 0
+            if last:
+                del self.filters[topic]
+                del self.matcher[topic]
+
+        if last:
+            logging.info('Multiplexer: Unsubscribing from "%s"' % topic)
+            self.client.unsubscribe(topic)
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code == 0:
+            logging.info("MQTT client: Connected to MQTT broker!")
+            # subscribe again, e.g. after a reconnect
+            with self.lock:
+                topics = list(self.filters)
+            if topics:
+                client.subscribe([(topic, 0) for topic in topics])
+        else:
+            logging.error("MQTT client: Failed to connect, return code %d\n", reason_code)
+
+    def on_message(self, client, userdata, msg):
+        with self.lock:
+            conns = set()
+            for filter_conns in self.matcher.iter_match(msg.topic):
+                conns.update(filter_conns)
+
+        if not conns:
+            return
+
+        topic = msg.topic.encode()
+        frame = HEADER.pack(len(topic), len(msg.payload)) + topic + msg.payload
+        for conn in conns:
+            try:
+                conn.sendall(frame)
+            except OSError as e:
+                # the selector sees the closed connection and removes its subscriptions
+                logging.warning("Multiplexer: Could not forward to driver instance, disconnecting it: %s" % e)
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def failover(client):
+    """
+    Switch to the next broker of the list. Called in the network thread of the MQTT client, which then reconnects to it.
+    """
+    global broker_index
+
+    if len(brokers) == 1:
+        return
+
+    # the fall back to the primary broker stops the network thread and chooses the broker itself
+    with broker_lock:
+        if switching:
+            return
+        broker_index = (broker_index + 1) % len(brokers)
+        host, port = brokers[broker_index]
+        logging.warning("MQTT client: Failing over to broker %s on port %i" % (host, port))
+        client.connect_async(host=host, port=port, keepalive=keepalive)
+
+
+def fall_back_to_primary(client):
+    """
+    Check regularly if the primary broker is reachable again, while connected to another broker, and reconnect to it.
+    Runs in its own thread, the network thread of the MQTT client is stopped before the broker is changed.
+    """
+    global broker_index, switching
+
+    host, port = brokers[0]
+    while True:
+        sleep(fallback_interval)
+        if broker_index == 0:
+            continue
+
+        try:
+            socket.create_connection((host, port), timeout=5).close()
+        except OSError:
+            continue
+
+        logging.warning("MQTT client: Primary broker %s on port %i is reachable again, falling back to it" % (host, port))
+        with broker_lock:
+            switching = True
+        client.disconnect()
+        client.loop_stop()
+
+        with broker_lock:
+            switching = False
+            broker_index = 0
+        client.connect_async(host=host, port=port, keepalive=keepalive)
+        client.loop_start()
+
+
+def on_disconnect(client, userdata, flags, reason_code, properties):
+    logging.warning("MQTT client: Got disconnected")
+    if reason_code != 0:
+        failover(client)
+
+
+def on_connect_fail(client, userdata):
+    logging.error("MQTT client: Error in connecting with broker (%s:%i)" % brokers[broker_index])
+    failover(client)
+
+
+def create_mqtt_client():
+    client_id = "MqttSolarChargerMultiplexer_" + socket.gethostname()
+    client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+    client.on_disconnect = on_disconnect
+    client.on_connect_fail = on_connect_fail
+    client.reconnect_delay_set(min_delay=1, max_delay=15)
+
+    # check tls and use settings, if provided
+    if "tls_enabled" in config["MQTT"] and config["MQTT"]["tls_enabled"] == "1":
+        logging.info("MQTT client: TLS is enabled")
+
+        if "tls_path_to_ca" in config["MQTT"] and config["MQTT"]["tls_path_to_ca"] != "":
+            logging.info('MQTT client: TLS: custom ca "%s" used' % config["MQTT"]["tls_path_to_ca"])
+            client.tls_set(config["MQTT"]["tls_path_to_ca"], tls_version=2)
+        else:
+            client.tls_set(tls_version=2)
+
+        if "tls_insecure" in config["MQTT"] and config["MQTT"]["tls_insecure"] != "":
+            logging.info("MQTT client: TLS certificate server hostname verification disabled")
+            client.tls_insecure_set(True)
+
+    # check if username and password are set
+    if "username" in config["MQTT"] and "password" in config["MQTT"] and config["MQTT"]["username"] != "" and config["MQTT"]["password"] != "":
+        logging.info('MQTT client: Using username "%s" and password to connect' % config["MQTT"]["username"])
+        client.username_pw_set(username=config["MQTT"]["username"], password=config["MQTT"]["password"])
+
+    return client
+
+
+def main():
+    socket_path = config["MULTIPLEXER"].get("socket", "/var/run/dbus-mqtt-solar-charger.sock")
+
+    client = create_mqtt_client()
+    multiplexer = Multiplexer(client, socket_path)
+    client.on_connect = multiplexer.on_connect
+    client.on_message = multiplexer.on_message
+
+    # the MQTT client reconnects by itself in its network thread, also if the first connection fails
+    host, port = brokers[broker_index]
+    logging.info(f"MQTT client: Connecting to broker {host} on port {port}")
+    client.connect_async(host=host, port=port, keepalive=keepalive)
+    client.loop_start()
+
+    if len(brokers) > 1:
+        threading.Thread(target=fall_back_to_primary, args=(client,), daemon=True).start()
+
+    multiplexer.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
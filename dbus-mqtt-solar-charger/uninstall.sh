@@ -25,6 +25,13 @@ sleep 1
 echo "Removing driver from services..."
 rm /service/$SERVICE_NAME
 
+# Remove multiplexer service, if installed
+if [ -L /service/$SERVICE_NAME-multiplexer ]; then
+    echo "Removing multiplexer from services..."
+    svc -d /service/$SERVICE_NAME-multiplexer
+    rm /service/$SERVICE_NAME-multiplexer
+fi
+
 # kill
 pkill -f "supervise .*$SERVICE_NAME"
 pkill -f "multilog .*$SERVICE_NAME"
@@ -143,6 +143,15 @@ if [ -f ${driver_path}/${driver_name_instance}/config.ini ]; then
 fi
 
 
+# If updating: backup the history and snapshot files, the yield counters and the daily history are kept
+if ls ${driver_path}/${driver_name_instance}/history*.bin ${driver_path}/${driver_name_instance}/snapshot*.json > /dev/null 2>&1; then
+    echo ""
+    echo "Backing up existing history and snapshot files..."
+    mkdir -p ${driver_path}/${driver_name_instance}_data
+    mv ${driver_path}/${driver_name_instance}/history*.bin ${driver_path}/${driver_name_instance}/snapshot*.json ${driver_path}/${driver_name_instance}_data/ 2> /dev/null
+fi
+
+
 # If updating: cleanup existing driver
 if [ -d ${driver_path}/${driver_name_instance} ]; then
     echo ""
@@ -173,6 +182,9 @@ if [ "$driver_name" != "$driver_name_instance" ]; then
     sed -i 's:'${driver_name}':'${driver_name_instance}':g' ${driver_path}/${driver_name_instance}/service/run
     # rename the driver_name in the log run file to driver_name_instance
     sed -i 's:'${driver_name}':'${driver_name_instance}':g' ${driver_path}/${driver_name_instance}/service/log/run
+    # rename the driver_name in the multiplexer run files to driver_name_instance
+    sed -i 's:'${driver_name}':'${driver_name_instance}':g' ${driver_path}/${driver_name_instance}/service-multiplexer/run
+    sed -i 's:'${driver_name}':'${driver_name_instance}':g' ${driver_path}/${driver_name_instance}/service-multiplexer/log/run
 
     # add device_instance to the end of the line where device_name is found in the config sample file
     sed -i '/device_name/s/$/ '${driver_instance}'/' ${driver_path}/${driver_name_instance}/config.sample.ini
@@ -193,15 +205,28 @@ if [ -f ${driver_path}/${driver_name_instance}_config.ini ]; then
 fi
 
 
+# If updating: restore the history and snapshot files
+if [ -d ${driver_path}/${driver_name_instance}_data ]; then
+    echo ""
+    echo "Restoring existing history and snapshot files..."
+    mv ${driver_path}/${driver_name_instance}_data/* ${driver_path}/${driver_name_instance}/ 2> /dev/null
+    rmdir ${driver_path}/${driver_name_instance}_data
+fi
+
+
 # set permissions for files
 echo ""
 echo "Setting permissions for files..."
 chmod 755 ${driver_path}/${driver_name_instance}/${driver_name_instance}.py
 chmod 755 ${driver_path}/${driver_name_instance}/install.sh
+chmod 755 ${driver_path}/${driver_name_instance}/reload.sh
 chmod 755 ${driver_path}/${driver_name_instance}/restart.sh
 chmod 755 ${driver_path}/${driver_name_instance}/uninstall.sh
 chmod 755 ${driver_path}/${driver_name_instance}/service/run
 chmod 755 ${driver_path}/${driver_name_instance}/service/log/run
+chmod 755 ${driver_path}/${driver_name_instance}/mqtt-multiplexer.py
+chmod 755 ${driver_path}/${driver_name_instance}/service-multiplexer/run
+chmod 755 ${driver_path}/${driver_name_instance}/service-multiplexer/log/run
 
 
 # copy default config file
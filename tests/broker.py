@@ -0,0 +1,210 @@
+"""
+MQTT 3.1.1 broker stand-in for the tests, optionally with TLS. Supports QoS 0 only.
+"""
+
+import socket
+import ssl
+import struct
+import subprocess
+import threading
+import time
+
+from paho.mqtt.client import topic_matches_sub
+
+CONNECT, CONNACK, PUBLISH, SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 1, 2, 3, 8, 9, 10, 11, 12, 13, 14
+
+
+def encode_length(length):
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 0x80 if length > 0 else byte)
+        if length == 0:
+            return bytes(encoded)
+
+
+def encode_string(value):
+    value = value.encode() if isinstance(value, str) else value
+    return struct.pack("!H", len(value)) + value
+
+
+def publish_packet(topic, payload):
+    body = encode_string(topic) + (payload.encode() if isinstance(payload, str) else payload)
+    return bytes([PUBLISH << 4]) + encode_length(len(body)) + body
+
+
+def make_certificate(directory):
+    """Create a self-signed certificate for localhost with openssl and return the paths of certificate and key."""
+    cert = str(directory / "broker.crt")
+    key = str(directory / "broker.key")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1", "-keyout", key, "-out", cert],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+class Broker:
+    """
+    Accepts MQTT clients on a port of 127.0.0.1 and forwards the published messages to the subscribers.
+    stop() closes the port and all connections like a crashed broker, start() opens the same port again.
+    """
+
+    def __init__(self, port=0, certificate=None):
+        self.port = port
+        self.context = None
+        if certificate is not None:
+            self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.context.load_cert_chain(*certificate)
+        self.server = None
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.handshakes = []
+        self.subscribed = threading.Event()
+
+    def start(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("127.0.0.1", self.port))
+        self.port = self.server.getsockname()[1]
+        self.server.listen(16)
+        threading.Thread(target=self._accept, args=(self.server,), daemon=True).start()
+        return self
+
+    def stop(self):
+        server, self.server = self.server, None
+        if server is not None:
+            # wakes up the accept() of the thread, the port keeps accepting connections otherwise
+            try:
+                server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            server.close()
+        with self.lock:
+            clients, self.clients = self.clients, {}
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        self.subscribed.clear()
+
+    def disconnect_clients(self):
+        """Close the connections, the port stays open."""
+        with self.lock:
+            clients, self.clients = self.clients, {}
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        self.subscribed.clear()
+
+    def publish(self, topic, payload):
+        """Send a message to the clients, which subscribed to a matching topic. Returns the number of receivers."""
+        packet = publish_packet(topic, payload)
+        receivers = 0
+        with self.lock:
+            clients = list(self.clients.items())
+        for conn, subscriptions in clients:
+            if any(topic_matches_sub(subscription, topic) for subscription in list(subscriptions)):
+                try:
+                    conn.sendall(packet)
+                    receivers += 1
+                except OSError:
+                    pass
+        return receivers
+
+    def _accept(self, server):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.context is not None:
+            try:
+                conn = self.context.wrap_socket(conn, server_side=True)
+            except (OSError, ssl.SSLError):
+                conn.close()
+                return
+            self.handshakes.append(conn.session_reused)
+
+        subscriptions = set()
+        with self.lock:
+            self.clients[conn] = subscriptions
+        stream = conn.makefile("rb")
+        try:
+            while True:
+                header = stream.read(1)
+                if not header:
+                    break
+                length = 0
+                multiplier = 1
+                while True:
+                    byte = stream.read(1)[0]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    if byte & 0x80 == 0:
+                        break
+                body = stream.read(length)
+                packet_type = header[0] >> 4
+
+                if packet_type == CONNECT:
+                    self.connects += 1
+                    conn.sendall(bytes([CONNACK << 4, 2, 0, 0]))
+                elif packet_type == SUBSCRIBE:
+                    packet_id = body[:2]
+                    index = 2
+                    granted = bytearray()
+                    while index < len(body):
+                        (size,) = struct.unpack("!H", body[index : index + 2])
+                        subscriptions.add(body[index + 2 : index + 2 + size].decode())
+                        index += 2 + size + 1
+                        granted.append(0)
+                    conn.sendall(bytes([SUBACK << 4 | 0]) + encode_length(2 + len(granted)) + packet_id + bytes(granted))
+                    self.subscribed.set()
+                elif packet_type == UNSUBSCRIBE:
+                    packet_id = body[:2]
+                    index = 2
+                    while index < len(body):
+                        (size,) = struct.unpack("!H", body[index : index + 2])
+                        subscriptions.discard(body[index + 2 : index + 2 + size].decode())
+                        index += 2 + size
+                    conn.sendall(bytes([UNSUBACK << 4, 2]) + packet_id)
+                elif packet_type == PUBLISH:
+                    (size,) = struct.unpack("!H", body[:2])
+                    self.publish(body[2 : 2 + size].decode(), body[2 + size :])
+                elif packet_type == PINGREQ:
+                    conn.sendall(bytes([PINGRESP << 4, 0]))
+                elif packet_type == DISCONNECT:
+                    break
+        except (OSError, IndexError, ValueError):
+            pass
+        finally:
+            with self.lock:
+                self.clients.pop(conn, None)
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+
+def wait_for(condition, timeout=10, interval=0.01, step=None):
+    """Wait until the condition is true, step is called while waiting, e.g. to run the GLib stand-in."""
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if step is not None:
+            step()
+        if condition():
+            return True
+        time.sleep(interval)
+    return False
@@ -0,0 +1,58 @@
+import importlib.util
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import stubs  # noqa: E402
+from helpers import DRIVER_DIR, DRIVER_FILE, copy_driver  # noqa: E402
+
+# the vendored paho-mqtt, which the broker stand-in uses as well
+sys.path.insert(1, os.path.join(DRIVER_DIR, "ext"))
+
+
+def no_sleep(seconds):
+    raise RuntimeError("the driver waits %i seconds, the config.ini is not valid" % seconds)
+
+
+@pytest.fixture
+def driver_dir(tmp_path):
+    """Directory with a copy of the driver, its config.ini and files are written there."""
+    copy_driver(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def load_driver(driver_dir, monkeypatch):
+    """
+    Return a function, which writes the config.ini and loads a fresh instance of the driver with the GLib and D-Bus
+    stand-ins. The clock of the driver is the clock of the GLib stand-in, see driver.GLib.run().
+    """
+    monkeypatch.setattr(sys, "path", list(sys.path))
+
+    def load(config, argv=(), scheduler=True):
+        (driver_dir / "config.ini").write_text(config)
+        monkeypatch.setattr(sys, "argv", [str(driver_dir / DRIVER_FILE), *argv])
+
+        glib = stubs.FakeGLib()
+        stubs.install(glib)
+
+        spec = importlib.util.spec_from_file_location("dbus_mqtt_solar_charger", driver_dir / DRIVER_FILE)
+        driver = importlib.util.module_from_spec(spec)
+
+        # the driver waits 60 seconds before it quits with an invalid config.ini
+        with monkeypatch.context() as m:
+            m.setattr(time, "sleep", no_sleep)
+            spec.loader.exec_module(driver)
+        driver.sleep = time.sleep
+
+        driver.time = glib.time
+        driver.monotonic = glib.monotonic
+        if scheduler:
+            driver.scheduler = driver.Scheduler()
+        return driver
+
+    return load
@@ -0,0 +1,145 @@
+"""
+Helpers for the tests of the driver.
+"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+
+import stubs
+
+DRIVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dbus-mqtt-solar-charger")
+DRIVER_FILE = "dbus-mqtt-solar-charger.py"
+
+DEFAULT = {
+    "logging": "WARNING",
+    "device_name": "MQTT Solar Charger",
+    "device_instance": "100",
+    "timeout": "60",
+    "history_days": "0",
+    "snapshot_interval": "0",
+}
+
+MQTT = {
+    "broker_address": "127.0.0.1",
+    "broker_port": "1883",
+    "topic": "enphase/solarcharger",
+}
+
+
+def make_section(name, options, lines):
+    """Return a config section, the lines "key = value" replace or extend the options."""
+    options = dict(options)
+    for line in lines.strip().splitlines():
+        key, _, value = line.partition("=")
+        options[key.strip()] = None if value.strip() == "None" else value.strip()
+    return "[%s]\n%s\n" % (name, "".join("%s = %s\n" % (key, value) for key, value in options.items() if value is not None))
+
+
+def make_config(default="", mqtt="", sections=""):
+    """
+    Return a config.ini. default and mqtt are lines, which replace or extend the options of these sections, a value
+    "None" removes the option. sections is appended as is.
+    """
+    default_options = make_section("DEFAULT", DEFAULT, default)
+    mqtt_options = make_section("MQTT", MQTT, mqtt)
+    return default_options + "\n" + mqtt_options + "\n" + sections
+
+
+def payload(power=100.0, voltage=52.0, current=None, **values):
+    """Return a minimal valid payload as JSON, further values are passed as nested dicts."""
+    data = {"Pv": {"V": 80.0}, "Yield": {"Power": power}, "Dc": {"0": {"Voltage": voltage, "Current": power / voltage if current is None else current}}}
+    for key, value in values.items():
+        if isinstance(value, dict) and isinstance(data.get(key), dict):
+            data[key].update(value)
+        else:
+            data[key] = value
+    return json.dumps(data)
+
+
+def add_devices(driver):
+    """Add the configured solar chargers like main() does."""
+    for key, settings in driver.device_settings.items():
+        driver.add_device(key, settings)
+
+
+def service(driver, device_instance=100):
+    """Return the D-Bus service of the solar charger with the device instance."""
+    return stubs.FakeVeDbusService.services.get("com.victronenergy.solarcharger.mqtt_solarcharger_%i" % device_instance)
+
+
+class FakeMqttClient:
+    """Records the subscriptions of the driver."""
+
+    def __init__(self, topics=()):
+        self.topics = set(topics)
+
+    def subscribe(self, topics):
+        self.topics.update(topic for topic, qos in topics)
+
+    def unsubscribe(self, topics):
+        self.topics.difference_update(topics)
+
+
+def copy_driver(directory, config=None):
+    """Copy the driver to the directory, with the config.ini, if given. Returns the path of the driver."""
+    os.makedirs(directory, exist_ok=True)
+    shutil.copy(os.path.join(DRIVER_DIR, DRIVER_FILE), os.path.join(directory, DRIVER_FILE))
+    if not os.path.exists(os.path.join(directory, "ext")):
+        os.symlink(os.path.join(DRIVER_DIR, "ext"), os.path.join(directory, "ext"))
+    if config is not None:
+        with open(os.path.join(directory, "config.ini"), "w") as f:
+            f.write(config)
+    return os.path.join(directory, DRIVER_FILE)
+
+
+def start_driver(directory, config, publish_socket, args=()):
+    """Start the driver in its own process with the stand-ins, the values it publishes are sent to the socket."""
+    driver = copy_driver(directory, config)
+    env = dict(os.environ, STUB_PUBLISH_SOCKET=publish_socket)
+    return subprocess.Popen([sys.executable, stubs.__file__, driver, *args], env=env)
+
+
+class PublishReceiver:
+    """Receives the values, which drivers in other processes publish on D-Bus, see stubs.report_publishes()."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.values = {}
+        self.received = 0
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def _receive(self):
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                return
+            servicename, path, value = data.decode().split(" ", 2)
+            with self.lock:
+                self.values[(servicename, path)] = value
+                self.received += 1
+
+    def get(self, device_instance, path):
+        with self.lock:
+            return self.values.get(("com.victronenergy.solarcharger.mqtt_solarcharger_%i" % device_instance, path))
+
+    def close(self):
+        self.sock.close()
+
+
+def get_process_usage(pid):
+    """Return the resident memory in KiB and the CPU time in seconds of a process."""
+    with open("/proc/%i/status" % pid) as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    with open("/proc/%i/stat" % pid) as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return rss, (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
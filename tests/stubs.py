@@ -0,0 +1,332 @@
+"""
+Stand-ins for the GLib main loop, D-Bus and velib_python, which are only available on Venus OS.
+The GLib stand-in runs on its own clock, so timers can be replayed at accelerated time.
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+import types
+
+
+class FakeGLib:
+    """
+    GLib main loop with a clock, which only moves when the test advances it. Idle callbacks and timers run in the
+    thread, which calls run(). With realtime=True the clock follows the wall clock, e.g. in worker processes.
+    """
+
+    PRIORITY_HIGH = -100
+    PRIORITY_DEFAULT = 0
+    IO_IN = 1
+    IO_ERR = 8
+    IO_HUP = 16
+
+    def __init__(self, now=1767261600.0, realtime=False):
+        self.realtime = realtime
+        self._now = now
+        self._monotonic_offset = 1000.0 - now
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._timeouts = {}
+        self._watches = {}
+        self._signals = {}
+        self._next_id = 1
+        # set, when a source is added from another thread, see MainLoop()
+        self._wakeup = threading.Event()
+
+    # clock, which replaces time.time() and time.monotonic() of the driver
+    def time(self):
+        return time.time() if self.realtime else self._now
+
+    def monotonic(self):
+        return time.monotonic() if self.realtime else self._now + self._monotonic_offset
+
+    def _add_source(self, sources, value):
+        with self._lock:
+            source_id = self._next_id
+            self._next_id += 1
+            sources[source_id] = value
+        self._wakeup.set()
+        return source_id
+
+    def idle_add(self, callback, *args):
+        return self._add_source(self._idle, (callback, args))
+
+    def timeout_add_seconds(self, interval, callback, *args):
+        return self._add_source(self._timeouts, (self.time() + interval, interval, callback, args))
+
+    def io_add_watch(self, fd, priority, condition, callback, *args):
+        return self._add_source(self._watches, (fd, callback, args))
+
+    def unix_signal_add(self, priority, signum, callback):
+        return self._add_source(self._signals, (signum, callback))
+
+    def source_remove(self, source_id):
+        with self._lock:
+            for sources in (self._idle, self._timeouts, self._watches, self._signals):
+                if sources.pop(source_id, None) is not None:
+                    return True
+        return False
+
+    @property
+    def timers(self):
+        return len(self._timeouts)
+
+    def run_idle(self):
+        """Run the idle callbacks, including the ones added by them."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return
+                source_id = min(self._idle)
+                callback, args = self._idle.pop(source_id)
+            if callback(*args):
+                self._add_source(self._idle, (callback, args))
+
+    def run_watches(self, timeout=0):
+        """Run the callbacks of the file descriptors, which are readable."""
+        import select
+
+        with self._lock:
+            watches = dict(self._watches)
+        if not watches:
+            return
+        readable, _, _ = select.select([fd for fd, _, _ in watches.values()], [], [], timeout)
+        for source_id, (fd, callback, args) in watches.items():
+            if fd in readable and source_id in self._watches:
+                if not callback(fd, self.IO_IN, *args):
+                    self.source_remove(source_id)
+
+    def run(self, seconds=0):
+        """
+        Advance the clock by the seconds and run the idle callbacks and the timers, which expire meanwhile, in order.
+        """
+        end = self.time() + seconds
+        while True:
+            self.run_idle()
+            with self._lock:
+                due = [(expires, source_id) for source_id, (expires, _, _, _) in self._timeouts.items() if expires <= end]
+                if not due:
+                    break
+                expires, source_id = min(due)
+                _, interval, callback, args = self._timeouts.pop(source_id)
+            if not self.realtime:
+                self._now = max(self._now, expires)
+            if callback(*args):
+                self._timeouts[source_id] = (self.time() + interval, interval, callback, args)
+        if not self.realtime:
+            self._now = max(self._now, end)
+
+    def raise_signal(self, signum):
+        for signal_signum, callback in list(self._signals.values()):
+            if signal_signum == signum:
+                callback()
+        self.run_idle()
+
+    def MainLoop(self):
+        glib = self
+
+        class MainLoop:
+            def run(self):
+                while True:
+                    glib._wakeup.clear()
+                    glib.run()
+                    if glib._watches:
+                        glib.run_watches(0.01)
+                        continue
+                    with glib._lock:
+                        expires = min((timeout[0] for timeout in glib._timeouts.values()), default=None)
+                    glib._wakeup.wait(None if expires is None else max(0, expires - glib.time()))
+
+        return MainLoop()
+
+
+class FakeBus:
+    """Private D-Bus connection."""
+
+    opened = []
+
+    def __init__(self, private=False):
+        self.private = private
+        self.closed = False
+        FakeBus.opened.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeObject:
+    """dbus.service.Object, which only remembers where it is exported."""
+
+    def __init__(self, bus=None, path=None):
+        self.bus = bus
+        self.path = path
+        self.exported = True
+
+    def remove_from_connection(self):
+        self.exported = False
+
+
+def method(interface, in_signature=None, out_signature=None):
+    return lambda function: function
+
+
+class FakeVeDbusService:
+    """
+    VeDbusService, which keeps the values in a dict. All services and the values published on them are recorded in
+    the class attributes, which the tests inspect.
+    """
+
+    services = {}
+    on_publish = None
+
+    def __init__(self, servicename, bus=None, register=True):
+        self.servicename = servicename
+        self.dbusconn = bus if bus is not None else FakeBus()
+        self.values = {}
+        self.textformats = {}
+        self.callbacks = {}
+        self.registered = False
+        self.publishes = []
+        self.items_changed = []
+        if register:
+            self.register()
+
+    def add_path(self, path, value, description="", writeable=False, onchangecallback=None, gettextcallback=None, valuetype=None, itemtype=None):
+        if path in self.values:
+            raise Exception("adding the same path twice: %s" % path)
+        self.values[path] = value
+        self.textformats[path] = gettextcallback
+        self.callbacks[path] = onchangecallback
+        if FakeVeDbusService.on_publish is not None:
+            FakeVeDbusService.on_publish(self.servicename, path, value)
+
+    def register(self):
+        if self.servicename in FakeVeDbusService.services and FakeVeDbusService.services[self.servicename].registered:
+            raise Exception("service %s is already registered" % self.servicename)
+        self.registered = True
+        FakeVeDbusService.services[self.servicename] = self
+
+    def __del__(self):
+        if getattr(self, "registered", False):
+            self.registered = False
+
+    def __enter__(self):
+        return FakeServiceContext(self)
+
+    def __exit__(self, *exc):
+        pass
+
+    def __contains__(self, path):
+        return path in self.values
+
+    def __getitem__(self, path):
+        return self.values[path]
+
+    def __setitem__(self, path, value):
+        self.values[path] = value
+        self.publishes.append((path, value))
+        if FakeVeDbusService.on_publish is not None:
+            FakeVeDbusService.on_publish(self.servicename, path, value)
+
+    def __delitem__(self, path):
+        del self.values[path]
+
+    def write(self, path, value):
+        """Write a value like another D-Bus client, the change is passed to the onchangecallback."""
+        callback = self.callbacks.get(path)
+        if callback is None or callback(path, value):
+            self.values[path] = value
+            return True
+        return False
+
+
+class FakeServiceContext:
+    """ServiceContext of VeDbusService, the added paths are recorded as one ItemsChanged signal of the service."""
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.changes = {}
+        parent.items_changed.append(self.changes)
+
+    def add_path(self, path, value, *args, **kwargs):
+        self.parent.add_path(path, value, *args, **kwargs)
+        self.changes[path] = value
+
+
+def install(glib=None):
+    """
+    Install the stand-ins as modules and return them by name. Installed modules, which are replaced, have to be restored
+    by the caller.
+    """
+    glib = glib if glib is not None else FakeGLib()
+    FakeVeDbusService.services = {}
+    FakeVeDbusService.on_publish = None
+    FakeBus.opened = []
+
+    gi = types.ModuleType("gi")
+    gi_repository = types.ModuleType("gi.repository")
+    gi_repository.GLib = glib
+    gi.repository = gi_repository
+
+    dbus = types.ModuleType("dbus")
+    dbus.SessionBus = FakeBus
+    dbus.SystemBus = FakeBus
+    dbus_service = types.ModuleType("dbus.service")
+    dbus_service.Object = FakeObject
+    dbus_service.method = method
+    dbus.service = dbus_service
+    dbus_mainloop = types.ModuleType("dbus.mainloop")
+    dbus_mainloop_glib = types.ModuleType("dbus.mainloop.glib")
+    dbus_mainloop_glib.DBusGMainLoop = lambda set_as_default=False: None
+    dbus_mainloop.glib = dbus_mainloop_glib
+    dbus.mainloop = dbus_mainloop
+
+    vedbus = types.ModuleType("vedbus")
+    vedbus.VeDbusService = FakeVeDbusService
+    ve_utils = types.ModuleType("ve_utils")
+    ve_utils.get_vrm_portal_id = lambda: "c0619ab00000"
+
+    modules = {
+        "gi": gi,
+        "gi.repository": gi_repository,
+        "dbus": dbus,
+        "dbus.service": dbus_service,
+        "dbus.mainloop": dbus_mainloop,
+        "dbus.mainloop.glib": dbus_mainloop_glib,
+        "vedbus": vedbus,
+        "ve_utils": ve_utils,
+    }
+    sys.modules.update(modules)
+    return modules
+
+
+def report_publishes(socket_path):
+    """
+    Send each value published on D-Bus as datagram "<servicename> <path> <value>" to a socket, so that a test can
+    observe the D-Bus of another process.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def on_publish(servicename, path, value):
+        try:
+            sock.sendto(("%s %s %s" % (servicename, path, value)).encode(), socket_path)
+        except OSError:
+            pass
+
+    FakeVeDbusService.on_publish = on_publish
+
+
+if __name__ == "__main__":
+    # run the driver with the stand-ins, e.g. as worker process: python stubs.py <driver> <arguments>
+    import runpy
+
+    glib = FakeGLib(realtime=True)
+    install(glib)
+    if "STUB_PUBLISH_SOCKET" in os.environ:
+        report_publishes(os.environ["STUB_PUBLISH_SOCKET"])
+    driver = sys.argv[1]
+    sys.argv = sys.argv[1:]
+    runpy.run_path(driver, run_name="__main__")
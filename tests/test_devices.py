@@ -0,0 +1,94 @@
+from broker import Broker, wait_for
+from helpers import PublishReceiver, add_devices, get_process_usage, make_config, payload, service, start_driver
+from stubs import FakeBus
+
+DEVICES = "".join("[DEVICE_%i]\ntopic = solar/%i\ndevice_instance = %i\ndevice_name = Charger %i\n\n" % (index, index, 100 + index, index) for index in range(1, 4))
+
+
+def test_each_device_has_its_own_service_and_timeout(load_driver):
+    driver = load_driver(make_config(sections=DEVICES))
+    add_devices(driver)
+
+    for index in range(1, 4):
+        driver.process_message("solar/%i" % index, payload(power=100.0 * index))
+    driver.GLib.run(1)
+    assert [service(driver, 100 + index)["/Yield/Power"] for index in range(1, 4)] == [100.0, 200.0, 300.0]
+    assert service(driver, 102)["/CustomName"] == "Charger 2"
+
+    # only DEVICE_1 keeps sending
+    for _ in range(10):
+        driver.process_message("solar/1", payload())
+        driver.GLib.run(10)
+    assert service(driver, 101).registered
+    assert not service(driver, 102).registered and not service(driver, 103).registered
+
+
+def test_unregister_closes_the_private_connection(load_driver):
+    driver = load_driver(make_config(sections=DEVICES))
+    add_devices(driver)
+
+    # each timeout and re-registration of a device opens a new connection
+    for _ in range(5):
+        for index in range(1, 4):
+            driver.process_message("solar/%i" % index, payload())
+        driver.GLib.run(100)
+
+    assert len(FakeBus.opened) == 15
+    assert all(bus.private and bus.closed for bus in FakeBus.opened)
+
+
+def test_benchmark_one_process_against_separate_processes(tmp_path):
+    """
+    Memory and CPU time of 6 solar chargers in one process against 6 processes with one solar charger each, without
+    the D-Bus connections of the stand-ins. Each process connects to the broker stand-in.
+    """
+    count = 6
+    messages = 200
+    broker = Broker().start()
+    receiver = PublishReceiver(tmp_path / "publish.sock")
+    mqtt = "broker_address = 127.0.0.1\nbroker_port = %i" % broker.port
+
+    def run(configs):
+        processes = [start_driver(tmp_path / name, config, receiver.path) for name, config in configs]
+        try:
+            assert wait_for(lambda: sum(len(subscriptions) for subscriptions in broker.clients.values()) == count)
+            for number in range(messages):
+                for index in range(count):
+                    broker.publish("solar/%i" % index, payload(power=1000.0 + number))
+            assert wait_for(lambda: all(receiver.get(100 + index, "/Yield/Power") == str(1000.0 + messages - 1) for index in range(count)), timeout=60)
+            usage = [get_process_usage(process.pid) for process in processes]
+            return sum(rss for rss, cpu in usage), sum(cpu for rss, cpu in usage)
+        finally:
+            for process in processes:
+                process.kill()
+                process.wait()
+            broker.disconnect_clients()
+
+    sections = "".join("[DEVICE_%i]\ntopic = solar/%i\ndevice_instance = %i\n\n" % (index, index, 100 + index) for index in range(count))
+    one_rss, one_cpu = run([("one", make_config(mqtt=mqtt, sections=sections))])
+    separate_rss, separate_cpu = run([("separate_%i" % index, make_config(default="device_instance = %i" % (100 + index), mqtt=mqtt + "\ntopic = solar/%i" % index)) for index in range(count)])
+
+    broker.stop()
+    receiver.close()
+    print(
+        "\n%i solar chargers, %i messages each: one process %.1f MiB RSS, %.2f s CPU; separate processes %.1f MiB RSS, %.2f s CPU"
+        % (count, messages, one_rss / 1024, one_cpu, separate_rss / 1024, separate_cpu)
+    )
+    assert one_rss < separate_rss
+
+
+def test_trackers_added_after_registration_are_announced(load_driver):
+    driver = load_driver(make_config(default="trackers = 1\ntimeout = 0"))
+    add_devices(driver)
+
+    driver.process_message("enphase/solarcharger", payload())
+    driver.GLib.run(1)
+    assert service(driver).registered and "/Pv/5/V" not in service(driver)
+
+    pv = {str(tracker): {"V": 80.0, "P": 10.0} for tracker in range(6)}
+    driver.process_message("enphase/solarcharger", payload(power=60.0, Pv=pv))
+    driver.GLib.run(1)
+    assert service(driver)["/Pv/5/P"] == 10.0
+    # one signal with the paths of the new trackers
+    assert len(service(driver).items_changed) == 1
+    assert {"/Pv/1/V", "/Pv/5/P"} <= set(service(driver).items_changed[0])
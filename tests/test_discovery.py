@@ -0,0 +1,84 @@
+from time import perf_counter
+
+from helpers import make_config, payload, service
+
+DISCOVERY = "[DISCOVERY_1]\ntopic = solar/+/state\ndevice_name = Inverter {id}\ndevice_instance = 100\ndevice_instance_range = 1000\n"
+
+
+def discovery_config(default=""):
+    return make_config(default=default, mqtt="topic = None", sections=DISCOVERY)
+
+
+def test_discovered_device_has_stable_device_instance(load_driver):
+    driver = load_driver(discovery_config())
+
+    assert driver.process_message("solar/42/state", payload()) is True
+    assert driver.process_message("other/42/state", payload()) is None
+    driver.GLib.run(1)
+
+    assert service(driver, 142)["/CustomName"] == "Inverter 42"
+    assert list(driver.devices) == ["DISCOVERED_142"]
+    assert ("DISCOVERED_142", "timeout") in driver.scheduler
+
+
+def test_invalid_payloads_do_not_create_devices(load_driver):
+    driver = load_driver(discovery_config())
+
+    for index in range(5):
+        assert driver.process_message("solar/%i/state" % index, '{"junk": 1}') is False
+    assert driver.process_message("solar/5/state", "no json") is False
+    assert driver.process_message("solar/6/state", b"") is False
+    driver.GLib.run(1)
+    assert driver.devices == {} and driver.devices_by_topic == {}
+
+    # the device instance is still free
+    assert driver.process_message("solar/0/state", payload()) is True
+    driver.GLib.run(1)
+    assert service(driver, 100)["/Yield/Power"] == 100.0
+
+
+def test_idle_device_is_retired_and_discovered_again(load_driver):
+    driver = load_driver(discovery_config(default="timeout = 30"))
+
+    driver.process_message("solar/7/state", payload())
+    driver.GLib.run(1)
+    assert service(driver, 107).registered
+
+    driver.GLib.run(60)
+    assert driver.devices == {}
+    assert not service(driver, 107).registered
+
+    driver.process_message("solar/7/state", payload(power=50.0))
+    driver.GLib.run(1)
+    assert service(driver, 107).registered
+    assert service(driver, 107)["/Yield/Power"] == 50.0
+
+
+def test_benchmark_hundreds_of_discovered_devices(load_driver):
+    """Discovery latency and dispatch cost per message with 500 topics."""
+    driver = load_driver(discovery_config())
+    count = 500
+    sample = payload()
+
+    start = perf_counter()
+    for index in range(count):
+        assert driver.process_message("solar/%i/state" % index, sample)
+    discovery = (perf_counter() - start) / count
+
+    start = perf_counter()
+    for _ in range(4):
+        for index in range(count):
+            driver.process_message("solar/%i/state" % index, sample)
+    dispatch = (perf_counter() - start) / (4 * count)
+
+    # the dispatch alone, without decoding the payload
+    start = perf_counter()
+    for _ in range(20):
+        for index in range(count):
+            driver.devices_by_topic.get("solar/%i/state" % index)
+    lookup = (perf_counter() - start) / (20 * count)
+
+    driver.GLib.run(1)
+    print("\n%i discovered devices: discovery %.1f us, message %.1f us, topic lookup %.3f us" % (count, discovery * 1e6, dispatch * 1e6, lookup * 1e6))
+    assert len(driver.devices) == count
+    assert all(service(driver, 100 + index)["/CustomName"] == "Inverter %i" % index for index in range(count))
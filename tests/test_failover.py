@@ -0,0 +1,167 @@
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from broker import Broker, wait_for
+from helpers import DRIVER_DIR, PublishReceiver, make_config, payload, start_driver
+
+
+class Publisher:
+    """Publishes an increasing power to both brokers, like a publisher, whose messages are bridged to both."""
+
+    def __init__(self, brokers, topic, interval=0.02):
+        self.brokers = brokers
+        self.topic = topic
+        self.interval = interval
+        self.number = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            self.number += 1
+            for broker in self.brokers:
+                if broker.server is not None:
+                    broker.publish(self.topic, payload(power=float(self.number)))
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+
+class GapMonitor:
+    """Records the longest time between two received values."""
+
+    def __init__(self, get):
+        self.get = get
+        self.gap = 0
+        self.last = None
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        value = None
+        changed = time.monotonic()
+        while self.running:
+            current = self.get()
+            now = time.monotonic()
+            if current != value:
+                if value is not None:
+                    self.gap = max(self.gap, now - changed)
+                value = current
+                changed = now
+            self.last = current
+            time.sleep(0.005)
+
+    def reset(self):
+        gap, self.gap = self.gap, 0
+        return gap
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+
+def run_failover(primary, secondary, subscribers, monitor):
+    """Stop the primary broker, start it again and return the outages of the failover and the fall back."""
+    assert wait_for(lambda: subscribers(primary) == 1 and monitor.last is not None)
+    monitor.reset()
+
+    primary.stop()
+    assert wait_for(lambda: subscribers(secondary) == 1, timeout=30)
+    time.sleep(1)
+    failover = monitor.reset()
+
+    primary.start()
+    assert wait_for(lambda: subscribers(primary) == 1 and subscribers(secondary) == 0, timeout=30)
+    time.sleep(1)
+    fallback = monitor.reset()
+    return failover, fallback
+
+
+def subscribed_clients(topic):
+    def subscribers(broker):
+        with broker.lock:
+            return sum(1 for subscriptions in broker.clients.values() if topic in subscriptions)
+
+    return subscribers
+
+
+def test_driver_fails_over_and_falls_back(tmp_path):
+    primary = Broker().start()
+    secondary = Broker().start()
+    receiver = PublishReceiver(tmp_path / "publish.sock")
+    mqtt = "broker_address = 127.0.0.1:%i, 127.0.0.1:%i\nbroker_fallback_interval = 1\ntopic = solar/1" % (primary.port, secondary.port)
+    process = start_driver(tmp_path / "driver", make_config(default="timeout = 0", mqtt=mqtt), receiver.path)
+    publisher = Publisher([primary, secondary], "solar/1")
+    monitor = GapMonitor(lambda: receiver.get(100, "/Yield/Power"))
+    try:
+        failover, fallback = run_failover(primary, secondary, subscribed_clients("solar/1"), monitor)
+    finally:
+        monitor.stop()
+        publisher.stop()
+        process.kill()
+        process.wait()
+        primary.stop()
+        secondary.stop()
+        receiver.close()
+
+    print("\nOutage on D-Bus: failover %.2f s, fall back to the primary broker %.2f s" % (failover, fallback))
+
+
+def test_multiplexer_fails_over_and_falls_back(tmp_path):
+    primary = Broker().start()
+    secondary = Broker().start()
+    shutil.copy(os.path.join(DRIVER_DIR, "mqtt-multiplexer.py"), tmp_path / "mqtt-multiplexer.py")
+    os.symlink(os.path.join(DRIVER_DIR, "ext"), tmp_path / "ext")
+    socket_path = str(tmp_path / "multiplexer.sock")
+    mqtt = "broker_address = 127.0.0.1:%i, 127.0.0.1:%i\nbroker_fallback_interval = 1" % (primary.port, secondary.port)
+    (tmp_path / "config.ini").write_text(make_config(mqtt=mqtt) + "[MULTIPLEXER]\nsocket = %s\n" % socket_path)
+    process = subprocess.Popen([sys.executable, str(tmp_path / "mqtt-multiplexer.py")])
+
+    received = {}
+
+    def receive(conn):
+        buffer = b""
+        while True:
+            try:
+                data = conn.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+            while len(buffer) >= 6:
+                topic_length, payload_length = struct.unpack("!HI", buffer[:6])
+                if len(buffer) < 6 + topic_length + payload_length:
+                    break
+                received["payload"] = buffer[6 + topic_length : 6 + topic_length + payload_length]
+                buffer = buffer[6 + topic_length + payload_length :]
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    publisher = Publisher([primary, secondary], "solar/1")
+    monitor = GapMonitor(lambda: received.get("payload"))
+    try:
+        assert wait_for(lambda: os.path.exists(socket_path))
+        conn.connect(socket_path)
+        conn.sendall(b"SUB solar/1\n")
+        threading.Thread(target=receive, args=(conn,), daemon=True).start()
+        failover, fallback = run_failover(primary, secondary, subscribed_clients("solar/1"), monitor)
+    finally:
+        monitor.stop()
+        publisher.stop()
+        conn.close()
+        process.kill()
+        process.wait()
+        primary.stop()
+        secondary.stop()
+
+    print("\nOutage of the multiplexer: failover %.2f s, fall back to the primary broker %.2f s" % (failover, fallback))
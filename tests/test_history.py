@@ -0,0 +1,76 @@
+from helpers import add_devices, make_config, payload, service
+
+CONFIG = make_config(default="calculate_history = 1\nhistory_days = 2\ntimeout = 0")
+
+
+def replay(driver, states, interval=10):
+    """Send a message with each state every interval seconds at accelerated time."""
+    for state in states:
+        driver.process_message("enphase/solarcharger", payload(power=100.0 if state != 0 else 0.0, State=state))
+        driver.GLib.run(interval)
+
+
+def times(driver, day=0):
+    # the history is published delayed
+    driver.GLib.run(10)
+    return [service(driver)["/History/Daily/%i/%s" % (day, name)] for name in ("TimeInBulk", "TimeInAbsorption", "TimeInFloat")]
+
+
+def test_time_in_state_counts_the_intervals_between_messages(load_driver):
+    driver = load_driver(CONFIG)
+    add_devices(driver)
+
+    # the interval after a message counts to its state
+    replay(driver, [3] * 60 + [4] * 30 + [5] * 90 + [0])
+    assert times(driver) == [600, 300, 900]
+
+
+def test_time_in_state_skips_data_gaps(load_driver):
+    driver = load_driver(CONFIG)
+    add_devices(driver)
+
+    replay(driver, [3] * 30)
+    # no message for 2 minutes, longer than INTEGRATION_MAX_INTERVAL
+    driver.GLib.run(120)
+    replay(driver, [3] * 30 + [5] * 10 + [0])
+    # 290 s before the gap, 300 s after it, no absorption today
+    assert times(driver) == [590, None, 100]
+
+    # a gap up to INTEGRATION_MAX_INTERVAL is counted
+    replay(driver, [5], interval=60)
+    replay(driver, [0])
+    assert times(driver) == [590, None, 160]
+
+
+def test_time_in_state_starts_again_after_midnight(load_driver):
+    driver = load_driver(CONFIG)
+    add_devices(driver)
+
+    midnight = driver.get_next_midnight(driver.time())
+    driver.GLib.run(midnight - 300 - driver.time())
+    replay(driver, [5] * 60 + [0])
+
+    yesterday = times(driver, 1)[2]
+    today = times(driver, 0)[2]
+    # the interval, which spans midnight, counts to the new day
+    assert yesterday + today == 600
+    assert 290 <= yesterday <= 300
+
+
+def test_time_in_state_of_a_replayed_day(load_driver):
+    """A day of a charger: bulk in the morning, absorption, float in the afternoon, with a few lost messages."""
+    driver = load_driver(CONFIG)
+    add_devices(driver)
+    midnight = driver.get_next_midnight(driver.time())
+    driver.GLib.run(midnight + 6 * 3600 - driver.time())
+
+    states = [0] * 360 + [3] * 1440 + [4] * 360 + [5] * 1800 + [0] * 360
+    # lost messages are bridged, if the gap is not longer than INTEGRATION_MAX_INTERVAL
+    for index in range(500, 4000, 97):
+        states[index] = None
+    for state in states:
+        if state is not None:
+            driver.process_message("enphase/solarcharger", payload(power=100.0 if state != 0 else 0.0, State=state))
+        driver.GLib.run(5)
+
+    assert times(driver) == [1440 * 5, 360 * 5, 1800 * 5]
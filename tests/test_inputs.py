@@ -0,0 +1,86 @@
+import json
+import socket
+
+from helpers import add_devices, make_config, payload, service
+
+
+def test_local_input_drops_datagrams_with_invalid_topics(load_driver, tmp_path):
+    socket_path = str(tmp_path / "input.sock")
+    driver = load_driver(make_config(default="input_socket = %s\ntimeout = 0" % socket_path))
+    add_devices(driver)
+    driver.open_local_input(driver.config)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.sendto(b"\xff\xfe\n" + payload().encode(), socket_path)
+    sock.sendto(b"no topic", socket_path)
+    sock.sendto(b"enphase/solarcharger\n" + payload(power=42.0).encode(), socket_path)
+    driver.GLib.run_watches(1)
+    driver.GLib.run(1)
+    assert service(driver)["/Yield/Power"] == 42.0
+
+    # the input keeps running
+    sock.sendto(b"\xc3\n{}", socket_path)
+    sock.sendto(b"enphase/solarcharger\n" + payload(power=43.0).encode(), socket_path)
+    driver.GLib.run_watches(1)
+    driver.GLib.run(1)
+    assert service(driver)["/Yield/Power"] == 43.0
+    sock.close()
+    driver.local_input.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def post(driver, port, topic, body):
+    """Send a HTTP POST request and return the status, the driver serves it in the watches of the GLib stand-in."""
+    conn = socket.create_connection(("127.0.0.1", port))
+    conn.sendall(("POST /%s HTTP/1.1\r\nContent-Length: %i\r\nConnection: close\r\n\r\n%s" % (topic, len(body), body)).encode())
+    response = b""
+    while b"\r\n\r\n" not in response:
+        driver.GLib.run_watches(0.1)
+        conn.setblocking(False)
+        try:
+            response += conn.recv(4096)
+        except BlockingIOError:
+            pass
+    conn.close()
+    return int(response.split(b" ")[1])
+
+
+def test_http_input_listens_on_the_configured_address(load_driver):
+    port = free_port()
+    driver = load_driver(make_config(default="http_port = %i" % port))
+    driver.open_http_input(driver.config)
+    assert driver.http_input.server.getsockname() == ("127.0.0.1", port)
+    driver.http_input.close()
+
+    driver = load_driver(make_config(default="http_port = %i\nhttp_address = 0.0.0.0" % port))
+    driver.open_http_input(driver.config)
+    assert driver.http_input.server.getsockname() == ("0.0.0.0", port)
+    driver.http_input.close()
+
+
+def test_http_batch_is_integrated_over_the_timestamps_of_the_samples(load_driver):
+    port = free_port()
+    driver = load_driver(make_config(default="http_port = %i\ntimeout = 0" % port))
+    add_devices(driver)
+    driver.open_http_input(driver.config)
+    now = driver.time()
+
+    # one minute at 1200 W, sent at once
+    samples = [dict(json.loads(payload(power=1200.0)), timestamp=now - 60 + second) for second in range(61)]
+    assert post(driver, port, "enphase/solarcharger", json.dumps(samples)) == 204
+    driver.GLib.run(1)
+    assert round(service(driver)["/Yield/User"], 6) == 0.02
+    assert "/timestamp" not in service(driver)
+
+    # the samples of a late batch, which are older than the last sample, do not count again
+    assert post(driver, port, "enphase/solarcharger", json.dumps(samples[:30])) == 204
+    driver.GLib.run(1)
+    assert round(service(driver)["/Yield/User"], 6) == 0.02
+
+    assert post(driver, port, "enphase/solarcharger", json.dumps(dict(samples[0], timestamp="yesterday"))) == 400
+    driver.http_input.close()
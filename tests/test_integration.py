@@ -0,0 +1,50 @@
+import math
+import random
+
+from helpers import add_devices, make_config, payload, service
+
+
+def replay(driver, samples):
+    """Send the samples (seconds since the last sample, power) at accelerated time."""
+    for interval, power in samples:
+        driver.GLib.run(interval)
+        driver.process_message("enphase/solarcharger", payload(power=power))
+    driver.GLib.run(1)
+
+
+def test_integrated_yield_is_kept_at_night_with_path_timeout(load_driver):
+    driver = load_driver(make_config(default="path_timeout = 30\ntimeout = 0"))
+    add_devices(driver)
+
+    replay(driver, [(1, 360.0)] * 61 + [(1, 0.0)] * 120)
+    # 360 W for 60 s and the ramp to 0 W in 1 s, the counters were not invalidated in the 2 minutes without yield
+    assert round(service(driver)["/Yield/User"], 9) == 0.00605
+    assert round(service(driver)["/Yield/System"], 9) == 0.00605
+
+    # the counters continue in the morning, the ramp from 0 W takes 2 s
+    replay(driver, [(1, 360.0)] * 61)
+    assert round(service(driver)["/Yield/User"], 9) == 0.01215
+    assert service(driver)["/Yield/Power"] == 360.0
+
+
+def test_yield_of_a_synthetic_day_matches_the_exact_energy(load_driver):
+    """A half sine from sunrise to sunset, sampled about every 5 seconds with jitter and a few lost messages."""
+    driver = load_driver(make_config(default="timeout = 0"))
+    add_devices(driver)
+    rng = random.Random(1)
+    peak = 5000.0
+    day = 8 * 3600
+
+    samples = []
+    last = 0
+    t = 0
+    while t < day:
+        t = min(day, t + rng.choice((4, 5, 5, 5, 6, 15)))
+        samples.append((t - last, peak * math.sin(math.pi * t / day)))
+        last = t
+    replay(driver, [(0, 0.0)] + samples)
+
+    exact = 2 * peak * day / math.pi / 3600000
+    error = abs(service(driver)["/Yield/User"] - exact) / exact
+    print("\nSynthetic day of %.3f kWh from %i samples: error %.6f %%" % (exact, len(samples), error * 100))
+    assert error < 0.0001
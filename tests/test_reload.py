@@ -0,0 +1,68 @@
+import logging
+import random
+
+from helpers import FakeMqttClient, add_devices, make_config, payload, service
+
+DEVICES = "[DEVICE_1]\ntopic = solar/1\ndevice_instance = 101\n\n[DEVICE_2]\ntopic = solar/2\ndevice_instance = 102\n\n"
+
+
+def load(load_driver, config):
+    driver = load_driver(config)
+    add_devices(driver)
+    driver.mqtt_client = FakeMqttClient(driver.get_subscriptions())
+    return driver
+
+
+def reload(driver, config):
+    with open(driver.config_file, "w") as f:
+        f.write(config)
+    assert driver.reload_config() is True
+
+
+def test_reload_keeps_the_running_device(load_driver):
+    driver = load(load_driver, make_config())
+    driver.process_message("enphase/solarcharger", payload())
+    driver.GLib.run(1)
+
+    reload(driver, make_config(default="logging = INFO\ntimeout = 120"))
+    assert logging.getLogger().level == logging.INFO
+    assert driver.devices["DEFAULT"].settings["timeout"] == 120
+    assert service(driver).registered
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def test_reload_changes_the_settings_of_each_device(load_driver):
+    driver = load(load_driver, make_config(sections=DEVICES))
+
+    reload(driver, make_config(default="timeout = 300", sections=DEVICES))
+    assert [device.settings["timeout"] for device in driver.devices.values()] == [300, 300]
+
+
+def test_reload_changes_the_subscriptions(load_driver):
+    driver = load(load_driver, make_config(sections=DEVICES))
+    device = driver.devices["DEVICE_2"]
+
+    reload(driver, make_config(sections=DEVICES.replace("solar/2", "solar/22") + "[DEVICE_3]\ntopic = solar/3\ndevice_instance = 103\n"))
+    assert driver.mqtt_client.topics == {"solar/1", "solar/22", "solar/3"}
+    assert driver.devices_by_topic["solar/22"] is device
+    assert "solar/2" not in driver.devices_by_topic
+
+    driver.process_message("solar/22", payload(power=50.0))
+    driver.GLib.run(1)
+    assert service(driver, 102)["/Yield/Power"] == 50.0
+
+
+def test_aggregated_power_returns_to_zero(load_driver):
+    driver = load(load_driver, make_config(mqtt="topic = solar/a, solar/b, solar/c"))
+    rng = random.Random(1)
+    topics = ["solar/a", "solar/b", "solar/c"]
+
+    for _ in range(50):
+        driver.process_message(rng.choice(topics), payload(power=round(rng.uniform(0, 500), 1)))
+    for topic in topics:
+        driver.process_message(topic, payload(power=0.0, current=0.0))
+    driver.GLib.run(1)
+
+    assert service(driver)["/Yield/Power"] == 0
+    assert service(driver)["/Dc/0/Current"] == 0
+    assert service(driver)["/State"] == 0
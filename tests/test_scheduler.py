@@ -0,0 +1,116 @@
+import random
+from time import perf_counter
+
+from helpers import add_devices, make_config, payload, service
+
+START = 1767261600
+
+
+def test_timers_expire_in_order(load_driver):
+    driver = load_driver(make_config())
+    wheel = driver.TimerWheel(START)
+    fired = []
+    for key, delay in (("a", 1), ("b", 70), ("c", 5000), ("d", 300000), ("e", 70)):
+        wheel.schedule(key, START + delay, lambda key: fired.append((key, wheel._tick - START)))
+
+    wheel.advance(START + 1000000)
+    assert fired == [("a", 1), ("b", 70), ("e", 70), ("c", 5000), ("d", 300000)]
+    assert len(wheel) == 0
+
+
+def test_callback_cancels_and_reschedules_timers_of_the_same_tick(load_driver):
+    driver = load_driver(make_config())
+    wheel = driver.TimerWheel(START)
+    fired = []
+
+    def on_a(key):
+        fired.append(key)
+        wheel.cancel("b")
+        wheel.schedule("c", START + 20, on_timer)
+
+    def on_timer(key):
+        fired.append(key)
+
+    wheel.schedule("a", START + 10, on_a)
+    wheel.schedule("b", START + 10, on_timer)
+    wheel.schedule("c", START + 10, on_timer)
+
+    wheel.advance(START + 10)
+    assert fired == ["a"]
+    assert "b" not in wheel and "c" in wheel
+    assert len(wheel) == 1
+
+    wheel.advance(START + 20)
+    assert fired == ["a", "c"]
+    assert len(wheel) == 0
+
+
+def test_timeout_removes_a_device_in_the_tick_of_its_stale_deadline(load_driver):
+    config = make_config(
+        default="path_timeout = 60",
+        sections="[DEVICE_1]\ntopic = solar/1\ndevice_instance = 101\n\n[DEVICE_2]\ntopic = solar/2\ndevice_instance = 102\n",
+    )
+    driver = load_driver(config)
+    add_devices(driver)
+
+    driver.process_message("solar/1", payload())
+    driver.process_message("solar/2", payload())
+    driver.GLib.run(1)
+    driver.process_message("solar/2", payload())
+    driver.GLib.run(120)
+
+    # the timeout and the stale deadlines of DEVICE_1 expire together, DEVICE_2 is kept
+    assert driver.devices["DEVICE_1"].service is None
+    assert service(driver, 102)["/Yield/Power"] is None
+
+
+def test_stale_path_increments_update_index(load_driver):
+    driver = load_driver(make_config(default="path_timeout = 30\ntimeout = 0"))
+    add_devices(driver)
+
+    driver.process_message("enphase/solarcharger", payload())
+    driver.GLib.run(1)
+    index = service(driver)["/UpdateIndex"]
+    published = len(service(driver).publishes)
+
+    driver.GLib.run(40)
+    assert service(driver)["/Yield/Power"] is None
+    # each path, which goes stale, is a change
+    stale = [path for path, value in service(driver).publishes[published:] if value is None]
+    assert service(driver)["/UpdateIndex"] == index + len(stale)
+
+
+def test_benchmark_10k_deadlines(load_driver):
+    """Schedule, reschedule and expire 10000 deadlines spread over a day."""
+    driver = load_driver(make_config())
+    wheel = driver.TimerWheel(START)
+    count = 10000
+    rng = random.Random(1)
+    deadlines = {key: START + rng.randint(1, 86400) for key in range(count)}
+    fired = {}
+
+    def on_timer(key):
+        fired[key] = wheel._tick
+
+    start = perf_counter()
+    for key, expires in deadlines.items():
+        wheel.schedule(key, expires, on_timer)
+    schedule = perf_counter() - start
+
+    # half of the deadlines move, like the timeout of a device with new data
+    start = perf_counter()
+    for key in range(0, count, 2):
+        deadlines[key] += 3600
+        wheel.schedule(key, deadlines[key], on_timer)
+    reschedule = perf_counter() - start
+
+    start = perf_counter()
+    wheel.advance(START + 2 * 86400)
+    advance = perf_counter() - start
+
+    print(
+        "\nTimer wheel with %i deadlines: schedule %.2f us, reschedule %.2f us, expire all %.1f ms"
+        % (count, schedule / count * 1e6, reschedule / (count // 2) * 1e6, advance * 1000)
+    )
+    assert fired == deadlines
+    assert len(wheel) == 0
@@ -0,0 +1,102 @@
+import json
+from time import perf_counter
+
+from helpers import add_devices, make_config, payload, service
+
+SNAPSHOT_CONFIG = make_config(default="snapshot_interval = 300\nhistory_days = 31")
+
+
+def test_snapshot_restores_values_as_stale_until_refreshed(load_driver):
+    driver = load_driver(SNAPSHOT_CONFIG)
+    add_devices(driver)
+    device = driver.devices["DEFAULT"]
+
+    driver.process_message("enphase/solarcharger", payload(Yield={"User": 5.5}, History={"Daily": {"0": {"Yield": 1.2}, "1": {"Yield": 3.4}}}))
+    driver.GLib.run(10)
+    assert service(driver)["/Snapshot/StaleValues"] == 0
+    device.save_snapshot(force=True)
+
+    # restart
+    driver = load_driver(SNAPSHOT_CONFIG)
+    add_devices(driver)
+    device = driver.devices["DEFAULT"]
+    assert device.stale_paths == {"/Yield/User", "/Yield/System", "/History/Daily/0/Yield"}
+
+    # the restored values are published with the first message, the yield counter is continued by the integration
+    driver.process_message("enphase/solarcharger", payload())
+    driver.GLib.run(10)
+    assert service(driver)["/Yield/User"] == 5.5
+    assert service(driver)["/History/Daily/1/Yield"] == 3.4
+    assert service(driver)["/Snapshot/StaleValues"] == 1
+
+    driver.process_message("enphase/solarcharger", payload(History={"Daily": {"0": {"Yield": 1.3}}}))
+    driver.GLib.run(10)
+    assert service(driver)["/Snapshot/StaleValues"] == 0
+
+
+def test_snapshot_of_today_is_not_stale_after_midnight(load_driver):
+    config = make_config(default="snapshot_interval = 300\nhistory_days = 31\ncalculate_history = 1")
+    driver = load_driver(config)
+    add_devices(driver)
+    driver.process_message("enphase/solarcharger", payload())
+    driver.GLib.run(10)
+    driver.devices["DEFAULT"].save_snapshot(force=True)
+
+    driver = load_driver(config)
+    driver.GLib._now += 86400
+    add_devices(driver)
+    device = driver.devices["DEFAULT"]
+    assert device.history.get(1, "MaxPower") == 100.0
+    assert not any(path.startswith("/History/Daily/") for path in device.stale_paths)
+
+
+def test_snapshot_is_only_written_when_changed(load_driver, driver_dir):
+    driver = load_driver(make_config(default="snapshot_interval = 300\nhistory_days = 31\ntimeout = 0"))
+    add_devices(driver)
+    device = driver.devices["DEFAULT"]
+
+    driver.process_message("enphase/solarcharger", payload(Yield={"User": 5.5}))
+    driver.GLib.run(400)
+    with open(driver_dir / "snapshot.json") as f:
+        assert json.load(f)["values"]["/Yield/User"] == 5.5
+
+    written = device.last_snapshot
+    driver.GLib.run(400)
+    assert device.last_snapshot == written
+    assert not (driver_dir / "snapshot.json.tmp").exists()
+
+
+def test_benchmark_snapshot_write_and_load(load_driver):
+    """Cost of writing and loading the snapshot and the history file with history_days = 31."""
+    config = make_config(default="snapshot_interval = 300\nhistory_days = 31\ntrackers = 4")
+    driver = load_driver(config)
+    add_devices(driver)
+    device = driver.devices["DEFAULT"]
+
+    for day in range(31):
+        for name in device.history.columns:
+            device.history.set(day, name, day + 0.5)
+    device.paths["/Yield/User"]["value"] = 1234.5
+
+    runs = 50
+    start = perf_counter()
+    for _ in range(runs):
+        device.snapshot_dirty = True
+        device.save_snapshot(force=True)
+    write = (perf_counter() - start) / runs
+
+    start = perf_counter()
+    for _ in range(runs):
+        device.load_snapshot()
+    load = (perf_counter() - start) / runs
+
+    print("\nSnapshot with history_days = 31 and %i values per day: write %.2f ms, load %.2f ms" % (len(device.history.columns), write * 1000, load * 1000))
+
+    # all days survive the round trip, unchanged days are not written again
+    assert device.history.get(0, "Yield") == 0.5
+    assert device.history.get(30, "Pv/3/MaxPower") == 30.5
+    assert device.paths["/Yield/User"]["value"] == 1234.5
+    device.history.set(3, "Yield", 99.0)
+    device.snapshot_dirty = True
+    device.save_snapshot(force=True)
+    assert device.history_file.write(int(driver.time()), device.history.head, list(device.history.columns), device.history.get_rows()) == 1
@@ -0,0 +1,153 @@
+import os
+import subprocess
+import sys
+import types
+import zlib
+from time import perf_counter
+
+import pytest
+
+import stubs
+from broker import wait_for
+from helpers import PublishReceiver, get_process_usage, make_config, payload
+
+DEVICES = "".join("[DEVICE_%i]\ntopic = solar/%i\ndevice_instance = %i\n\n" % (index, index, 100 + index) for index in range(8))
+DISCOVERY = "[DISCOVERY_1]\ntopic = solar/+/state\ndevice_instance = 100\ndevice_instance_range = 100\n"
+
+
+def use_popen(monkeypatch, driver, command=None, publish_socket=None):
+    """Start the workers of the supervisor with the stand-ins, or start the command instead of the driver."""
+    started = []
+
+    def popen(args, **kwargs):
+        env = dict(os.environ)
+        if publish_socket is not None:
+            env["STUB_PUBLISH_SOCKET"] = publish_socket
+        process = subprocess.Popen(command or [args[0], stubs.__file__, *args[1:]], env=env, **kwargs)
+        started.append(process)
+        return process
+
+    monkeypatch.setattr(driver, "subprocess", types.SimpleNamespace(Popen=popen))
+    return started
+
+
+def stop(processes):
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def message(topic, data):
+    return types.SimpleNamespace(topic=topic, payload=data.encode() if isinstance(data, str) else data)
+
+
+def test_default_device_belongs_to_the_first_worker(load_driver):
+    driver = load_driver(make_config(default="workers = 4"), argv=["--worker", "0"])
+    assert list(driver.device_settings) == ["DEFAULT"]
+
+    for index in range(1, 4):
+        driver = load_driver(make_config(default="workers = 4"), argv=["--worker", str(index)])
+        assert driver.device_settings == {}
+
+
+def test_each_worker_discovers_in_its_part_of_the_device_instance_range(load_driver):
+    config = make_config(default="workers = 4", mqtt="topic = None", sections=DISCOVERY)
+    ranges = []
+    for index in range(4):
+        driver = load_driver(config, argv=["--worker", str(index)])
+        settings = driver.discovery_settings["solar/+/state"]
+        ranges.append((settings["device_instance"], settings["device_instance_range"]))
+    assert ranges == [(100, 25), (125, 25), (150, 25), (175, 25)]
+
+    # the workers discover the same id in different device instances
+    assert driver.process_message("solar/3/state", payload())
+    assert list(driver.devices) == ["DISCOVERED_178"]
+
+    with pytest.raises(RuntimeError):
+        load_driver(make_config(default="workers = 4", mqtt="topic = None", sections=DISCOVERY.replace("range = 100", "range = 3")))
+
+
+def test_discovery_skips_the_device_instances_of_other_workers(load_driver):
+    # the worker, which does not own DEVICE_1, discovers a solar charger in the device instance of DEVICE_1
+    index = 1 - zlib.crc32(b"DEVICE_1") % 2
+    device_instance = 100 + index * 50 + 7
+    config = make_config(default="workers = 2", mqtt="topic = None", sections="[DEVICE_1]\ntopic = solar/1\ndevice_instance = %i\n\n" % device_instance + DISCOVERY)
+    driver = load_driver(config, argv=["--worker", str(index)])
+    assert driver.device_settings == {}
+
+    assert driver.process_message("solar/7/state", payload())
+    assert list(driver.devices) == ["DISCOVERED_%i" % (device_instance + 1)]
+
+
+def test_stuck_worker_is_restarted_without_blocking(load_driver, monkeypatch):
+    driver = load_driver(make_config(default="workers = 2", sections=DEVICES))
+    # the worker keeps its socket open, but never reads it
+    started = use_popen(monkeypatch, driver, command=[sys.executable, "-c", "import time; time.sleep(60)"])
+    driver.WORKER_SEND_TIMEOUT = 0.2
+    supervisor = driver.Supervisor(2)
+    try:
+        for index in range(2):
+            supervisor.start_worker(index)
+        stuck = supervisor.topics["solar/0"]
+        other = supervisor.workers[1 - stuck]
+
+        large = b"x" * 1024 * 1024
+        for _ in range(20):
+            supervisor.on_message(None, None, message("solar/0", large))
+        assert wait_for(lambda: supervisor.workers[stuck].process.poll() is not None)
+        assert other.process.poll() is None and not other.failed
+
+        pid = supervisor.workers[stuck].process.pid
+        supervisor.restart_workers()
+        assert supervisor.workers[stuck].process.pid != pid
+        assert supervisor.workers[1 - stuck] is other
+    finally:
+        stop(started)
+
+
+def test_worker_with_full_queue_is_restarted(load_driver, monkeypatch):
+    driver = load_driver(make_config(default="workers = 1", sections=DEVICES))
+    started = use_popen(monkeypatch, driver, command=[sys.executable, "-c", "import time; time.sleep(60)"])
+    driver.WORKER_QUEUE_SIZE = 3
+    supervisor = driver.Supervisor(1)
+    try:
+        supervisor.start_worker(0)
+        worker = supervisor.workers[0]
+        for _ in range(100):
+            supervisor.on_message(None, None, message("solar/0", b"x" * 1024 * 1024))
+        assert worker.failed
+        assert wait_for(lambda: worker.process.poll() is not None)
+    finally:
+        stop(started)
+
+
+def test_benchmark_1_2_4_workers(load_driver, monkeypatch, tmp_path):
+    """Time and CPU to forward and process 400 messages for each of 8 solar chargers with 1, 2 and 4 workers."""
+    messages = 400
+    receiver = PublishReceiver(tmp_path / "publish.sock")
+    results = []
+    for workers in (1, 2, 4):
+        driver = load_driver(make_config(default="workers = %i" % workers, sections=DEVICES))
+        started = use_popen(monkeypatch, driver, publish_socket=receiver.path)
+        supervisor = driver.Supervisor(workers)
+        try:
+            for index in range(workers):
+                supervisor.start_worker(index)
+            samples = [[message("solar/%i" % index, payload(power=1000.0 * workers + number)) for index in range(8)] for number in range(messages)]
+
+            start = perf_counter()
+            for sample in samples:
+                for msg in sample:
+                    supervisor.on_message(None, None, msg)
+            forward = perf_counter() - start
+            last = str(1000.0 * workers + messages - 1)
+            assert wait_for(lambda: all(receiver.get(100 + index, "/Yield/Power") == last for index in range(8)), timeout=120)
+            duration = perf_counter() - start
+            cpu = sum(get_process_usage(process.pid)[1] for process in started)
+            results.append("%i workers %.2f s (forward %.1f us/message), %.2f s CPU" % (workers, duration, forward / (8 * messages) * 1e6, cpu))
+        finally:
+            stop(started)
+            for worker in supervisor.workers:
+                worker.close()
+    receiver.close()
+    print("\n%i messages for 8 solar chargers, %i CPU cores: %s" % (8 * messages, os.cpu_count(), "; ".join(results)))
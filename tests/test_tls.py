@@ -0,0 +1,50 @@
+import threading
+import time
+
+from broker import Broker, make_certificate, wait_for
+from helpers import PublishReceiver, make_config, payload, start_driver
+
+
+def test_reconnects_resume_the_tls_session(tmp_path):
+    certificate = make_certificate(tmp_path)
+    broker = Broker(certificate=certificate).start()
+    receiver = PublishReceiver(tmp_path / "publish.sock")
+    mqtt = "broker_port = %i\ntls_enabled = 1\ntls_path_to_ca = %s" % (broker.port, certificate[0])
+    process = start_driver(tmp_path / "driver", make_config(default="timeout = 0", mqtt=mqtt), receiver.path)
+
+    running = True
+
+    def publish():
+        while running:
+            broker.publish("enphase/solarcharger", payload())
+            time.sleep(0.05)
+
+    publisher = threading.Thread(target=publish, daemon=True)
+    publisher.start()
+    try:
+        assert wait_for(lambda: broker.subscribed.is_set() and receiver.get(100, "/Mqtt/TlsHandshakes/Full") == "1")
+        for reconnect in range(1, 4):
+            broker.disconnect_clients()
+            assert wait_for(lambda: receiver.get(100, "/Mqtt/TlsHandshakes/Resumed") == str(reconnect), timeout=30)
+    finally:
+        running = False
+        publisher.join()
+        process.kill()
+        process.wait()
+        broker.stop()
+        receiver.close()
+
+    # the broker stand-in sees the same handshakes
+    assert broker.handshakes == [False, True, True, True]
+    print(
+        "\nTLS handshakes on D-Bus: full %s ms, resumed %s ms"
+        % (receiver.get(100, "/Mqtt/TlsHandshakes/FullTime"), receiver.get(100, "/Mqtt/TlsHandshakes/ResumedTime"))
+    )
+
+
+def test_unknown_paho_version_uses_the_plain_client(load_driver):
+    driver = load_driver(make_config())
+    assert driver.get_mqtt_client_class() is driver.TlsSessionClient
+
+    driver.paho_version = "3.0.0"
+    assert driver.get_mqtt_client_class() is driver.mqtt.Client